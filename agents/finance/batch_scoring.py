@@ -0,0 +1,122 @@
+"""
+批量风险评估和资产配置：输入按列组织的数组（每个元素是一个用户），一次算出所有用户的
+风险评分、风险等级和每个资产类别的月投资金额。规则与 assess_risk_profile / generate_allocation_plan
+共用 rules.py 中的规则表，结果与逐个调用一致（金额同样保留两位小数）。
+
+适合阈值调整后对全部用户重新打分，例如：
+    result = score_and_allocate(df["age"], df["income_level"], df["experience"], df["drawdown"], df["monthly"])
+    df["risk_level"] = risk_level_names(result["risk_level"])
+"""
+
+import numpy as np
+
+from .rules import (
+    AGE_RULE,
+    ALLOCATION_PERCENTS,
+    CATEGORIES,
+    DEFAULT_ALLOCATION,
+    DEFAULT_DRAWDOWN,
+    DRAWDOWN_RULE,
+    EXPERIENCE_RULE,
+    RISK_LEVEL_THRESHOLDS,
+    RISK_LEVELS,
+    TierRule,
+    income_points,
+    parse_drawdown,
+)
+
+# 风险等级编码 -> 各类别配置比例（%），行顺序同 RISK_LEVELS，列顺序同 CATEGORIES
+_PERCENT_TABLE = np.array([ALLOCATION_PERCENTS[level] for level in RISK_LEVELS], dtype=np.float64)
+_DEFAULT_LEVEL_CODE = RISK_LEVELS.index(DEFAULT_ALLOCATION)
+
+
+def _tier_points(rule: TierRule, values: np.ndarray) -> np.ndarray:
+    """与 TierRule.score 相同的分档：searchsorted(side="right") 等价于 bisect_right"""
+    tiers = np.searchsorted(np.asarray(rule.thresholds), values, side="right")
+    return np.asarray(rule.points, dtype=np.int16)[tiers]
+
+
+def _map_labels(values, mapper, dtype) -> np.ndarray:
+    """字符串列：只对不同的取值调用一次 mapper，再按索引展开（收入水平、回撤这类列的取值很少）"""
+    values = np.asarray(values)
+    if values.dtype.kind not in "US":
+        values = values.astype(str)
+    uniques, inverse = np.unique(values, return_inverse=True)
+    mapped = np.array([mapper(value) for value in uniques], dtype=dtype)
+    return mapped[inverse.reshape(-1)]
+
+
+def _drawdown_values(max_drawdown_tolerance) -> np.ndarray:
+    """回撤容忍度：数字列直接取整数部分（NaN 按默认值），字符串列（"15%"）按 parse_drawdown 解析"""
+    values = np.asarray(max_drawdown_tolerance)
+    if values.dtype.kind in "iub":
+        return values.astype(np.int64)
+    if values.dtype.kind == "f":
+        return np.where(np.isfinite(values), np.trunc(np.nan_to_num(values)), DEFAULT_DRAWDOWN)
+    return _map_labels(values, parse_drawdown, np.int64)
+
+
+def score_risk_profiles(age, income_level, investment_experience_years, max_drawdown_tolerance) -> dict:
+    """
+    批量风险评估，参数是等长的一维数组（或列表、pandas Series）。
+    返回 {"score": int16 数组, "risk_level": int8 编码数组}，编码对应 RISK_LEVELS 中的下标。
+    """
+    score = (
+        _tier_points(AGE_RULE, np.asarray(age))
+        + _map_labels(income_level, income_points, np.int16)
+        + _tier_points(EXPERIENCE_RULE, np.asarray(investment_experience_years))
+        + _tier_points(DRAWDOWN_RULE, _drawdown_values(max_drawdown_tolerance))
+    )
+    risk_level = np.searchsorted(np.asarray(RISK_LEVEL_THRESHOLDS), score, side="right").astype(np.int8)
+    return {"score": score, "risk_level": risk_level}
+
+
+def allocate(risk_level, monthly_invest_amount) -> np.ndarray:
+    """
+    批量生成资产配置：risk_level 为编码数组（score_risk_profiles 的结果）或风险等级名称数组。
+    返回 (用户数, len(CATEGORIES)) 的金额数组，列顺序同 CATEGORIES，保留两位小数。
+    """
+    codes = np.asarray(risk_level)
+    if codes.dtype.kind not in "iu":
+        codes = _map_labels(codes, _level_code, np.int8)
+    amounts = np.asarray(monthly_invest_amount, dtype=np.float64)
+    return _round_cents(amounts[:, None] * _PERCENT_TABLE[codes] / 100)
+
+
+def score_and_allocate(age, income_level, investment_experience_years, max_drawdown_tolerance,
+                       monthly_invest_amount) -> dict:
+    """
+    批量评估并生成配置方案，返回：
+        score        int16 数组，风险评分
+        risk_level   int8 数组，RISK_LEVELS 中的下标（risk_level_names 可转换成名称）
+        amounts      (用户数, len(CATEGORIES)) float64 数组，每个资产类别的月投资金额
+        categories   资产类别名称（amounts 的列）
+    """
+    result = score_risk_profiles(age, income_level, investment_experience_years, max_drawdown_tolerance)
+    result["amounts"] = allocate(result["risk_level"], monthly_invest_amount)
+    result["categories"] = CATEGORIES
+    return result
+
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    保留两位小数，结果与内置 round(x, 2) 完全一致。
+    np.round 先乘 100 再取整，恰好在半分附近的值可能和 round 不同，这些值改用 round 逐个计算。
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= np.abs(scaled) * 1e-12 + 1e-9
+    if near_half.any():
+        rounded[near_half] = [round(value, 2) for value in values[near_half].tolist()]
+    return rounded
+
+
+def risk_level_names(codes) -> np.ndarray:
+    """把风险等级编码转换成名称数组"""
+    return np.asarray(RISK_LEVELS)[np.asarray(codes)]
+
+
+def _level_code(risk_level: str) -> int:
+    """与 generate_allocation_plan 一致：名称不区分大小写，未知的风险等级按默认等级配置"""
+    level = risk_level.lower()
+    return RISK_LEVELS.index(level) if level in RISK_LEVELS else _DEFAULT_LEVEL_CODE
@@ -1,77 +1,58 @@
+import asyncio
 import json
+import re
 
-from agents.shared.llm_client import client
+from agents.shared.messages import AgentPrompt, tool_call, tool_result
+from agents.shared.response_mode import contains_any, record_template_reply, use_template
+from agents.shared.session_store import SessionStore
+from agents.shared.tool_exec import execute_tool_calls
+from agents.shared.tracing import trace_turn
+from config.settings import (
+    FINANCE_SESSION_MAX_MESSAGES,
+    FINANCE_SESSION_IDLE_TTL,
+    FINANCE_SESSION_MAX_TOTAL_BYTES,
+    FINANCE_HISTORY_TOKEN_BUDGET,
+)
 from .prompts import FINANCE_SYSTEM_PROMPT
 from .tools import finance_tools
 from .handlers import assess_risk_profile, generate_allocation_plan
+from .simulation import simulate_plan_outcomes
+from .profile import UserProfile, extract_user_info
+from .history import assemble_history
 
 FINANCE_TOOL_FUNC_MAP = {
     "assess_risk_profile": assess_risk_profile,
     "generate_allocation_plan": generate_allocation_plan,
+    "simulate_plan_outcomes": simulate_plan_outcomes,
 }
 
+# 所有请求共享 system 提示和工具定义组成的前缀
+_prompt = AgentPrompt("finance", FINANCE_SYSTEM_PROMPT, finance_tools)
 
-# 维护对话历史（简单版本，实际应用中可以使用更复杂的会话管理）
-_conversation_history = []
+
+# 按 session id 隔离的对话历史，单会话条数、空闲时间和总内存都有上限
+_sessions = SessionStore(
+    max_messages=FINANCE_SESSION_MAX_MESSAGES,
+    idle_ttl=FINANCE_SESSION_IDLE_TTL,
+    max_total_bytes=FINANCE_SESSION_MAX_TOTAL_BYTES,
+)
+
+DEFAULT_SESSION_ID = "default"
+
+# 追问类输入（方案细节、原因等）需要模型结合上下文回答，模板只能重复方案
+_COMPLEX_KEYWORDS = ("?", "？", "吗", "怎么", "为什么", "如何", "多久", "能不能", "是否", "区别")
+
+
+def _is_complex_turn(user_input: str, tool_results_data: list = None) -> bool:
+    """用户在追问，或者工具没有产生可以套模板的结果"""
+    if tool_results_data is not None and not tool_results_data:
+        return True
+    return contains_any(user_input, _COMPLEX_KEYWORDS)
 
 
 def _extract_user_info(conversation_history):
     """从对话历史中提取用户信息"""
-    import re
-    
-    user_info = {
-        "age": None,
-        "income_level": None,
-        "investment_experience_years": None,
-        "max_drawdown_tolerance": None,
-        "monthly_invest_amount": None,
-    }
-    
-    # 合并所有用户输入
-    all_user_input = " ".join([
-        msg.get("content", "") 
-        for msg in conversation_history 
-        if msg.get("role") == "user"
-    ])
-    
-    # 提取年龄
-    age_match = re.search(r'(\d+)\s*岁', all_user_input)
-    if age_match:
-        user_info["age"] = int(age_match.group(1))
-    
-    # 提取收入水平
-    if re.search(r'年收入\s*10\s*w|年薪\s*10\s*万|10\s*万年薪|中等收入|中等', all_user_input, re.I):
-        user_info["income_level"] = "medium"
-    elif re.search(r'低收入|月收入\s*5000\s*以下', all_user_input, re.I):
-        user_info["income_level"] = "low"
-    elif re.search(r'高收入|月收入\s*15000\s*以上', all_user_input, re.I):
-        user_info["income_level"] = "high"
-    
-    # 提取投资经验
-    if re.search(r'没有.*经验|没有投资|0\s*年', all_user_input, re.I):
-        user_info["investment_experience_years"] = 0
-    else:
-        exp_match = re.search(r'(\d+)\s*年.*经验', all_user_input)
-        if exp_match:
-            user_info["investment_experience_years"] = int(exp_match.group(1))
-    
-    # 提取风险承受
-    if re.search(r'较小.*亏损|10\s*%|能接受\s*10\s*%', all_user_input, re.I):
-        user_info["max_drawdown_tolerance"] = "10%"
-    else:
-        tol_match = re.search(r'(\d+)\s*%', all_user_input)
-        if tol_match:
-            user_info["max_drawdown_tolerance"] = f"{tol_match.group(1)}%"
-    
-    # 提取每月投资金额
-    if re.search(r'1\s*k|1000|每月\s*1\s*k|每月\s*1000', all_user_input, re.I):
-        user_info["monthly_invest_amount"] = 1000
-    else:
-        amount_match = re.search(r'每月.*?(\d+)\s*[元块]', all_user_input)
-        if amount_match:
-            user_info["monthly_invest_amount"] = float(amount_match.group(1))
-    
-    return user_info
+    return extract_user_info(conversation_history)
 
 
 def _format_finance_result(risk_assessment, allocation_plan):
@@ -113,125 +94,123 @@ def _format_finance_result(risk_assessment, allocation_plan):
     return ""
 
 
-def call_finance_agent(user_input: str) -> str:
+def _format_simulation_result(simulation):
+    """格式化定投模拟结果：期末资产分位数和回撤概率"""
+    final = simulation["wealth_percentiles"][-1]
+    assumptions = simulation["assumptions"]
+    drawdowns = "、".join(
+        f"超过 {level} 的概率约 {probability:.0%}"
+        for level, probability in simulation["max_drawdown_probability"].items()
+    )
+    return f"""📈 定投模拟（每月 {simulation['monthly_invest_amount']} 元，{simulation['years']} 年，模拟 {simulation['paths']} 种情况）：
+
+• 累计投入：{final['contributed']} 元
+• 大多数情况（p25~p75）：{final['p25']} ~ {final['p75']} 元，中位数约 {final['p50']} 元
+• 较差情况（p10）：约 {final['p10']} 元；较好情况（p90）：约 {final['p90']} 元
+• 期末低于累计投入的概率约 {simulation['loss_probability']:.0%}
+• 期间最大回撤：{drawdowns}
+
+⚠️ 模拟假设组合年化收益约 {assumptions['expected_annual_return']}%、年化波动约 {assumptions['annual_volatility']}%，{simulation['note']}"""
+
+
+def _prepare_turn(session, user_input: str):
+    """记录用户输入并提取用户信息，返回 (user_info, has_enough_info)"""
     # 将用户输入添加到对话历史
-    _conversation_history.append({"role": "user", "content": user_input})
-    
-    # 尝试从对话历史中提取用户信息
-    user_info = _extract_user_info(_conversation_history)
-    
+    _sessions.append(session, {"role": "user", "content": user_input})
+
+    # 增量更新用户画像：只解析本轮新消息
+    profile = session.data.get("profile")
+    if profile is None:
+        profile = session.data["profile"] = UserProfile()
+    profile.update(user_input)
+    user_info = profile.as_dict()
+
     # 检查信息完整度，如果信息足够（至少3个），就可以给出建议
     info_count = sum(1 for v in user_info.values() if v is not None)
     has_enough_info = info_count >= 3  # 至少需要3个信息就可以给出建议
-    
-    # 如果信息足够，直接调用工具（使用默认值填充缺失信息）
-    if has_enough_info:
-        # 为缺失的信息设置默认值
-        if user_info["age"] is None:
-            user_info["age"] = 30  # 默认年龄
-        if user_info["income_level"] is None:
-            user_info["income_level"] = "medium"  # 默认中等收入
-        if user_info["investment_experience_years"] is None:
-            user_info["investment_experience_years"] = 0  # 默认无经验
-        if user_info["max_drawdown_tolerance"] is None:
-            user_info["max_drawdown_tolerance"] = "10%"  # 默认10%
-        if user_info["monthly_invest_amount"] is None:
-            user_info["monthly_invest_amount"] = 1000  # 默认1000元
-        # 先评估风险
-        risk_assessment = assess_risk_profile(
-            age=user_info["age"],
-            income_level=user_info["income_level"],
-            investment_experience_years=user_info["investment_experience_years"],
-            max_drawdown_tolerance=user_info["max_drawdown_tolerance"],
-        )
-        
-        # 再生成资产配置方案
-        allocation_plan = generate_allocation_plan(
-            risk_level=risk_assessment["risk_level"],
-            monthly_invest_amount=user_info["monthly_invest_amount"],
-        )
-        
-        # 格式化结果
-        result = _format_finance_result(risk_assessment, allocation_plan)
-        
-        # 用模型生成更友好的回答
-        messages = [
-            {"role": "system", "content": FINANCE_SYSTEM_PROMPT},
-            {"role": "user", "content": user_input},
-            {
-                "role": "assistant",
-                "content": None,
-                "tool_calls": [
-                    {
-                        "id": "auto_assess",
-                        "type": "function",
-                        "function": {
-                            "name": "assess_risk_profile",
-                            "arguments": json.dumps({
-                                "age": user_info["age"],
-                                "income_level": user_info["income_level"],
-                                "investment_experience_years": user_info["investment_experience_years"],
-                                "max_drawdown_tolerance": user_info["max_drawdown_tolerance"],
-                            }, ensure_ascii=False)
-                        }
-                    },
-                    {
-                        "id": "auto_plan",
-                        "type": "function",
-                        "function": {
-                            "name": "generate_allocation_plan",
-                            "arguments": json.dumps({
-                                "risk_level": risk_assessment["risk_level"],
-                                "monthly_invest_amount": user_info["monthly_invest_amount"],
-                            }, ensure_ascii=False)
-                        }
-                    }
-                ]
-            },
-            {
-                "role": "tool",
-                "tool_call_id": "auto_assess",
-                "content": json.dumps(risk_assessment, ensure_ascii=False)
-            },
-            {
-                "role": "tool",
-                "tool_call_id": "auto_plan",
-                "content": json.dumps(allocation_plan, ensure_ascii=False)
-            }
-        ]
-        
-        final_resp = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-        )
-        final_message = final_resp.choices[0].message.content or result
-        
-        # 如果模型回答为空或太短，使用格式化结果
-        if not final_message or len(final_message.strip()) < 50:
-            final_message = result
-        
-        _conversation_history.append({"role": "assistant", "content": final_message})
-        return final_message
-    
-    # 如果信息不足，让模型继续询问
-    messages = [
-        {"role": "system", "content": FINANCE_SYSTEM_PROMPT},
-    ] + _conversation_history[-10:]
-
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        tools=finance_tools,
-        tool_choice="auto",
+    return user_info, has_enough_info
+
+
+def _prompt_messages(session) -> list:
+    """系统提示 + 按 token 预算截取的对话历史，更早的对话折叠成用户画像摘要"""
+    profile = session.data.get("profile")
+    user_info = profile.as_dict() if profile is not None else {}
+    history = assemble_history(session.history, FINANCE_HISTORY_TOKEN_BUDGET, user_info, session.data)
+    return _prompt.messages(history)
+
+
+def _build_auto_plan(user_input: str, user_info: dict):
+    """信息足够时本地完成评估和规划，返回 (给模型的 messages, 格式化结果)"""
+    # 为缺失的信息设置默认值
+    if user_info["age"] is None:
+        user_info["age"] = 30  # 默认年龄
+    if user_info["income_level"] is None:
+        user_info["income_level"] = "medium"  # 默认中等收入
+    if user_info["investment_experience_years"] is None:
+        user_info["investment_experience_years"] = 0  # 默认无经验
+    if user_info["max_drawdown_tolerance"] is None:
+        user_info["max_drawdown_tolerance"] = "10%"  # 默认10%
+    if user_info["monthly_invest_amount"] is None:
+        user_info["monthly_invest_amount"] = 1000  # 默认1000元
+    # 先评估风险
+    risk_assessment = assess_risk_profile(
+        age=user_info["age"],
+        income_level=user_info["income_level"],
+        investment_experience_years=user_info["investment_experience_years"],
+        max_drawdown_tolerance=user_info["max_drawdown_tolerance"],
     )
-    message = response.choices[0].message
 
+    # 再生成资产配置方案
+    allocation_plan = generate_allocation_plan(
+        risk_level=risk_assessment["risk_level"],
+        monthly_invest_amount=user_info["monthly_invest_amount"],
+    )
+
+    # 格式化结果
+    result = _format_finance_result(risk_assessment, allocation_plan)
+
+    # 用模型生成更友好的回答
+    messages = _prompt.messages([
+        {"role": "user", "content": user_input},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                tool_call("auto_assess", "assess_risk_profile", {
+                    "age": user_info["age"],
+                    "income_level": user_info["income_level"],
+                    "investment_experience_years": user_info["investment_experience_years"],
+                    "max_drawdown_tolerance": user_info["max_drawdown_tolerance"],
+                }),
+                tool_call("auto_plan", "generate_allocation_plan", {
+                    "risk_level": risk_assessment["risk_level"],
+                    "monthly_invest_amount": user_info["monthly_invest_amount"],
+                }),
+            ]
+        },
+        tool_result("auto_assess", risk_assessment),
+        tool_result("auto_plan", allocation_plan),
+    ])
+    return messages, result
+
+
+def _finish_auto_plan(session, final_message: str, result: str) -> str:
+    """收尾自动规划分支：模型回答为空或太短时使用格式化结果"""
+    if not final_message or len(final_message.strip()) < 50:
+        final_message = result
+
+    _sessions.append(session, {"role": "assistant", "content": final_message})
+    return final_message
+
+
+def _record_tool_call(session, message, messages: list) -> None:
+    """把模型的回复和工具调用请求写入 messages 与对话历史"""
     # 将助手回复添加到对话历史
     if message.content:
-        _conversation_history.append({"role": "assistant", "content": message.content})
+        _sessions.append(session, {"role": "assistant", "content": message.content})
 
     if not getattr(message, "tool_calls", None):
-        return message.content or ""
+        return
 
     # 记录工具调用
     tool_call_message = {
@@ -240,136 +219,267 @@ def call_finance_agent(user_input: str) -> str:
         "tool_calls": [tc.model_dump() for tc in message.tool_calls],
     }
     messages.append(tool_call_message)
-    _conversation_history.append(tool_call_message)
+    _sessions.append(session, tool_call_message)
 
-    # 执行工具调用
+
+def _execute_tool_calls(session, tool_calls, messages: list) -> list:
+    """并发执行工具调用，按原顺序写入 messages 与对话历史，返回成功的工具结果对象列表"""
     tool_results_data = []  # 保存工具结果，用于后续格式化
-    for tool_call in message.tool_calls:
-        func_name = tool_call.function.name
-        args = json.loads(tool_call.function.arguments)
-
-        func = FINANCE_TOOL_FUNC_MAP.get(func_name)
-        if func is None:
-            result = f"未找到名为 {func_name} 的工具。"
-        else:
-            result_obj = func(**args)
-            result = json.dumps(result_obj, ensure_ascii=False)
-            tool_results_data.append(result_obj)  # 保存结果对象
-
-        tool_result = {
-            "role": "tool",
-            "tool_call_id": tool_call.id,
-            "content": result,
-        }
-        messages.append(tool_result)
-        _conversation_history.append(tool_result)
+    for call, result, error in execute_tool_calls(tool_calls, FINANCE_TOOL_FUNC_MAP):
+        if error is None:
+            tool_results_data.append(result)  # 保存结果对象
 
-    # 生成最终回答
-    final_resp = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-    )
-    final_message = final_resp.choices[0].message.content or ""
-    
-    # 清理工具调用标记（如果存在）
-    if final_message:
-        import re
-        # 移除工具调用相关的标记
-        final_message = re.sub(r'<\|redacted_tool_calls.*?\|>', '', final_message, flags=re.DOTALL)
-        final_message = re.sub(r'<\|.*?\|>', '', final_message, flags=re.DOTALL)
-        final_message = final_message.strip()
-    
-    # 如果最终回答为空、太短或包含工具调用标记，从工具结果中生成详细回答
-    should_use_fallback = (
-        not final_message or 
-        len(final_message.strip()) < 50 or 
+        tool_message = tool_result(call.id, result if error is None else error)
+        messages.append(tool_message)
+        _sessions.append(session, tool_message)
+    return tool_results_data
+
+
+def _clean_tool_markers(text: str) -> str:
+    """移除模型回答中泄露的工具调用标记"""
+    text = re.sub(r'<\|redacted_tool_calls.*?\|>', '', text, flags=re.DOTALL)
+    return re.sub(r'<\|.*?\|>', '', text, flags=re.DOTALL)
+
+
+def _should_use_fallback(final_message: str) -> bool:
+    """最终回答为空、太短或包含工具调用标记时，需要从工具结果生成详细回答"""
+    return (
+        not final_message or
+        len(final_message.strip()) < 50 or
         'tool_call' in final_message.lower() or
         'redacted' in final_message.lower()
     )
-    
-    if should_use_fallback:
-        # 优先使用保存的工具结果对象
-        risk_assessment = None
-        allocation_plan = None
-        
-        for result_obj in tool_results_data:
-            if "plan" in result_obj:
-                allocation_plan = result_obj
-            elif "risk_level" in result_obj and "plan" not in result_obj:
-                risk_assessment = result_obj
-        
-        # 如果工具结果对象中没有，再从 messages 中提取
-        if not allocation_plan and not risk_assessment:
-            tool_results = [msg for msg in messages if msg.get("role") == "tool"]
-            for tool_result in tool_results:
-                try:
-                    result_data = json.loads(tool_result.get("content", "{}"))
-                    if "plan" in result_data:
-                        allocation_plan = result_data
-                    elif "risk_level" in result_data:
-                        risk_assessment = result_data
-                except Exception:
-                    continue
-        
-        # 生成详细的回答
-        if allocation_plan:
-            plan = allocation_plan["plan"]
-            risk_level = allocation_plan.get("risk_level", "balanced")
-            monthly_amount = allocation_plan.get("monthly_invest_amount", 0)
-            
-            # 风险等级中文映射
-            risk_level_map = {
-                "conservative": "保守型",
-                "balanced": "平衡型",
-                "aggressive": "激进型"
-            }
-            risk_level_cn = risk_level_map.get(risk_level, risk_level)
-            
-            final_message = f"""根据您的风险承受能力评估，您属于【{risk_level_cn}】投资者。
 
-📊 资产配置方案（每月投资 {monthly_amount} 元）：
 
-"""
-            for item in plan:
-                final_message += f"• {item['category']}：{item['percent']}%（每月约 {item['amount']} 元）\n"
-            
-            final_message += f"""
+def _finish_tool_reply(session, final_message: str, tool_results_data: list, messages: list) -> str:
+    """清理模型最终回答，必要时从工具结果生成详细回答，并写入对话历史"""
+    # 清理工具调用标记（如果存在）
+    if final_message:
+        final_message = _clean_tool_markers(final_message).strip()
 
-💡 方案说明：
-- 此方案基于您的风险承受能力（{risk_level_cn}）制定
-- 建议采用定投方式，长期坚持
-- 可根据市场情况和个人需求适当调整
+    if _should_use_fallback(final_message):
+        final_message = _fallback_reply(tool_results_data, messages)
 
-⚠️ 风险提示：
-- 投资有风险，入市需谨慎
-- 本方案仅供参考，不构成投资建议
-- 请根据自身情况谨慎决策"""
-        
-        elif risk_assessment:
-            risk_level = risk_assessment.get("risk_level", "balanced")
-            score = risk_assessment.get("score", 0)
-            explanation = risk_assessment.get("explanation", "")
-            
-            risk_level_map = {
-                "conservative": "保守型",
-                "balanced": "平衡型",
-                "aggressive": "激进型"
-            }
-            risk_level_cn = risk_level_map.get(risk_level, risk_level)
-            
-            final_message = f"""✅ 风险评估完成
+    # 将最终回答添加到对话历史
+    _sessions.append(session, {"role": "assistant", "content": final_message})
+
+    return final_message
+
+
+def _fallback_reply(tool_results_data: list, messages: list) -> str:
+    """模型回答不可用时，根据工具结果生成详细回答"""
+    # 优先使用保存的工具结果对象
+    risk_assessment = None
+    allocation_plan = None
+    simulation = None
+
+    for result_obj in tool_results_data:
+        if "wealth_percentiles" in result_obj:
+            simulation = result_obj
+        elif "plan" in result_obj:
+            allocation_plan = result_obj
+        elif "risk_level" in result_obj and "plan" not in result_obj:
+            risk_assessment = result_obj
+
+    # 如果工具结果对象中没有，再从 messages 中提取
+    if not allocation_plan and not risk_assessment and not simulation:
+        tool_results = [msg for msg in messages if msg.get("role") == "tool"]
+        for tool_message in tool_results:
+            try:
+                result_data = json.loads(tool_message.get("content", "{}"))
+                if "wealth_percentiles" in result_data:
+                    simulation = result_data
+                elif "plan" in result_data:
+                    allocation_plan = result_data
+                elif "risk_level" in result_data:
+                    risk_assessment = result_data
+            except Exception:
+                continue
+
+    # 生成详细的回答
+    if allocation_plan:
+        result = _format_finance_result(risk_assessment, allocation_plan)
+        if simulation:
+            result += "\n\n" + _format_simulation_result(simulation)
+        return result
+
+    if simulation:
+        return _format_simulation_result(simulation)
+
+    if risk_assessment:
+        risk_level = risk_assessment.get("risk_level", "balanced")
+        score = risk_assessment.get("score", 0)
+        explanation = risk_assessment.get("explanation", "")
+
+        risk_level_map = {
+            "conservative": "保守型",
+            "balanced": "平衡型",
+            "aggressive": "激进型"
+        }
+        risk_level_cn = risk_level_map.get(risk_level, risk_level)
+
+        return f"""✅ 风险评估完成
 
 {explanation}
 
 风险等级：{risk_level_cn}（评分：{score}分）
 
 请继续提供每月可投资金额，我将为您生成具体的资产配置方案。"""
-        
-        if not final_message:
-            final_message = "已为您完成评估，请查看上述配置方案。"
-    
-    # 将最终回答添加到对话历史
-    _conversation_history.append({"role": "assistant", "content": final_message})
-    
-    return final_message
 
+    return "已为您完成评估，请查看上述配置方案。"
+
+
+@trace_turn("finance")
+def call_finance_agent(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    session = _sessions.get(session_id)
+    with session.lock:
+        return _run_turn(session, user_input)
+
+
+def _run_turn(session, user_input: str) -> str:
+    user_info, has_enough_info = _prepare_turn(session, user_input)
+
+    # 如果信息足够，直接调用工具（使用默认值填充缺失信息）
+    if has_enough_info:
+        messages, result = _build_auto_plan(user_input, user_info)
+        if use_template(_is_complex_turn(user_input)):
+            record_template_reply("finance")
+            return _finish_auto_plan(session, result, result)
+        final_resp = _prompt.create(messages)
+        final_message = final_resp.choices[0].message.content or result
+        return _finish_auto_plan(session, final_message, result)
+
+    # 如果信息不足，让模型继续询问
+    messages = _prompt_messages(session)
+
+    response = _prompt.create(messages, tool_choice="auto")
+    message = response.choices[0].message
+    _record_tool_call(session, message, messages)
+
+    if not getattr(message, "tool_calls", None):
+        return message.content or ""
+
+    # 执行工具调用
+    tool_results_data = _execute_tool_calls(session, message.tool_calls, messages)
+
+    # 工具结果是确定性的，模板模式下直接渲染
+    if use_template(_is_complex_turn(user_input, tool_results_data)):
+        record_template_reply("finance")
+        return _finish_tool_reply(session, "", tool_results_data, messages)
+
+    # 生成最终回答
+    final_resp = _prompt.create(messages)
+    final_message = final_resp.choices[0].message.content or ""
+    return _finish_tool_reply(session, final_message, tool_results_data, messages)
+
+
+@trace_turn("finance")
+def stream_finance_agent(user_input: str, session_id: str = DEFAULT_SESSION_ID):
+    """call_finance_agent 的流式版本：逐段返回最终回答的文本"""
+    session = _sessions.get(session_id)
+    with session.lock:
+        yield from _stream_turn(session, user_input)
+
+
+def _stream_turn(session, user_input: str):
+    user_info, has_enough_info = _prepare_turn(session, user_input)
+
+    if has_enough_info:
+        messages, result = _build_auto_plan(user_input, user_info)
+        if use_template(_is_complex_turn(user_input)):
+            record_template_reply("finance")
+            yield _finish_auto_plan(session, result, result)
+            return
+        streamed = yield from _stream_final(messages)
+        # 已输出的内容无法撤回：回答太短时在后面补上格式化结果
+        if _should_use_fallback(streamed):
+            extra = f"\n\n{result}" if streamed.strip() else result
+            yield extra
+            streamed += extra
+        _sessions.append(session, {"role": "assistant", "content": streamed.strip()})
+        return
+
+    messages = _prompt_messages(session)
+
+    response = _prompt.create(messages, tool_choice="auto")
+    message = response.choices[0].message
+    _record_tool_call(session, message, messages)
+
+    if not getattr(message, "tool_calls", None):
+        if message.content:
+            yield message.content
+        return
+
+    tool_results_data = _execute_tool_calls(session, message.tool_calls, messages)
+
+    if use_template(_is_complex_turn(user_input, tool_results_data)):
+        record_template_reply("finance")
+        yield _finish_tool_reply(session, "", tool_results_data, messages)
+        return
+
+    streamed = yield from _stream_final(messages, clean=True)
+    if _should_use_fallback(streamed.strip()):
+        fallback = _fallback_reply(tool_results_data, messages)
+        yield f"\n\n{fallback}" if streamed.strip() else fallback
+        streamed = fallback
+    _sessions.append(session, {"role": "assistant", "content": streamed.strip()})
+
+
+def _stream_final(messages: list, clean: bool = False):
+    """流式请求最终回答，逐段 yield 文本，返回完整文本"""
+    full_text = ""
+    for text in _prompt.stream_text(messages):
+        if clean:
+            # 按段清理完整出现在同一段中的工具调用标记
+            text = _clean_tool_markers(text)
+            if not text:
+                continue
+        full_text += text
+        yield text
+    return full_text
+
+
+@trace_turn("finance")
+async def acall_finance_agent(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """call_finance_agent 的异步版本，LLM 请求走 async_client"""
+    session = _sessions.get(session_id)
+    async with session.async_lock:
+        return await _arun_turn(session, user_input)
+
+
+async def _arun_turn(session, user_input: str) -> str:
+    user_info, has_enough_info = _prepare_turn(session, user_input)
+
+    if has_enough_info:
+        messages, result = _build_auto_plan(user_input, user_info)
+        if use_template(_is_complex_turn(user_input)):
+            record_template_reply("finance")
+            return _finish_auto_plan(session, result, result)
+        final_resp = await _prompt.acreate(messages)
+        final_message = final_resp.choices[0].message.content or result
+        return _finish_auto_plan(session, final_message, result)
+
+    messages = _prompt_messages(session)
+
+    response = await _prompt.acreate(messages, tool_choice="auto")
+    message = response.choices[0].message
+    _record_tool_call(session, message, messages)
+
+    if not getattr(message, "tool_calls", None):
+        return message.content or ""
+
+    # simulate_plan_outcomes 的蒙特卡洛模拟要几十毫秒以上，放到线程中执行，不阻塞其他请求
+    tool_results_data = await asyncio.to_thread(_execute_tool_calls, session, message.tool_calls, messages)
+
+    if use_template(_is_complex_turn(user_input, tool_results_data)):
+        record_template_reply("finance")
+        return _finish_tool_reply(session, "", tool_results_data, messages)
+
+    final_resp = await _prompt.acreate(messages)
+    final_message = final_resp.choices[0].message.content or ""
+    return _finish_tool_reply(session, final_message, tool_results_data, messages)
+
+
+def get_session_stats() -> dict:
+    """返回理财会话存储的统计信息"""
+    return _sessions.stats()
@@ -0,0 +1,95 @@
+from agents.shared.tokens import message_tokens
+
+_INCOME_LABELS = {"low": "低", "medium": "中等", "high": "高"}
+
+# 重新截断时保留的 token 数占预算的比例，留出余量让之后几轮不必再截断
+_COMPACT_LOW_WATER = 0.6
+
+
+def group_turns(history: list) -> list:
+    """
+    把对话历史切分成不可拆分的片段：带 tool_calls 的 assistant 消息和它后面的 tool 结果是一个片段，
+    其他消息各自成为一个片段。开头没有对应调用的 tool 消息直接丢弃。
+    """
+    groups = []
+    for message in history:
+        if message.get("role") == "tool":
+            if groups and (groups[-1][0].get("tool_calls")):
+                groups[-1].append(message)
+            continue
+        groups.append([message])
+    return groups
+
+
+def profile_summary(user_info: dict, dropped: int) -> dict:
+    """把用户画像折叠成一条 system 消息，代替被省略的早期对话"""
+    fields = []
+    if user_info.get("age") is not None:
+        fields.append(f"年龄 {user_info['age']} 岁")
+    if user_info.get("income_level") is not None:
+        fields.append(f"收入水平 {_INCOME_LABELS.get(user_info['income_level'], user_info['income_level'])}")
+    if user_info.get("investment_experience_years") is not None:
+        fields.append(f"投资经验 {user_info['investment_experience_years']} 年")
+    if user_info.get("max_drawdown_tolerance") is not None:
+        fields.append(f"可承受最大亏损 {user_info['max_drawdown_tolerance']}")
+    if user_info.get("monthly_invest_amount") is not None:
+        fields.append(f"每月可投资 {user_info['monthly_invest_amount']} 元")
+
+    content = f"更早的 {dropped} 条对话已省略。"
+    if fields:
+        content += "已了解的用户信息：" + "；".join(fields) + "。"
+    return {"role": "system", "content": content}
+
+
+def _group_tokens(groups: list) -> int:
+    return sum(message_tokens(m) for group in groups for m in group)
+
+
+def _compact(groups: list, token_budget: int) -> list:
+    """从最新的片段往前取，直到用完 token_budget；最新的一个片段总会保留"""
+    kept = []
+    used = 0
+    for group in reversed(groups):
+        tokens = sum(message_tokens(m) for m in group)
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(group)
+        used += tokens
+    kept.reverse()
+    return kept
+
+
+def assemble_history(history: list, token_budget: int, user_info: dict, state: dict = None) -> list:
+    """
+    从最新的消息往前取，直到用完 token_budget；工具调用和它的结果要么一起保留、要么一起省略。
+    最新的一个片段（通常是本轮用户输入）总会保留。有消息被省略时，在开头加一条用户画像摘要。
+
+    传入 state（会话的 data）时，截断位置和摘要会记在 state 里，后续几轮沿用同一个起点，
+    只在超出预算时才重新截断，并且一次截到预算的 60%。这样两次截断之间发给模型的前缀保持不变，
+    可以命中前缀缓存；这期间新了解到的用户信息都在保留的对话里，摘要不需要更新。
+    """
+    groups = group_turns(history)
+
+    if state is not None:
+        anchor = state.get("history_anchor")
+        start = next((i for i, group in enumerate(groups) if group[0] is anchor), None)
+        if start is not None:
+            summary = state["history_summary"]
+            kept = groups[start:]
+            if message_tokens(summary) + _group_tokens(kept) <= token_budget:
+                return [summary] + [m for group in kept for m in group]
+
+    if _group_tokens(groups) <= token_budget:
+        if state is not None:
+            state.pop("history_anchor", None)
+            state.pop("history_summary", None)
+        return [m for group in groups for m in group]
+
+    low_water = token_budget if state is None else int(token_budget * _COMPACT_LOW_WATER)
+    kept = _compact(groups, low_water)
+    dropped = sum(len(group) for group in groups[:len(groups) - len(kept)])
+    summary = profile_summary(user_info, dropped)
+    if state is not None:
+        state["history_anchor"] = kept[0][0]
+        state["history_summary"] = summary
+    return [summary] + [m for group in kept for m in group]
@@ -0,0 +1,145 @@
+import re
+
+from agents.shared.tracing import traced
+
+# 预编译的提取规则（与原先在整段历史上执行的正则一致）
+_AGE_RE = re.compile(r'(\d+)\s*岁')
+
+# 收入水平按优先级排列：只要出现过优先级更高的描述，就不会被后面的描述覆盖
+_INCOME_RULES = [
+    ("medium", re.compile(r'年收入\s*10\s*w|年薪\s*10\s*万|10\s*万年薪|中等收入|中等', re.I)),
+    ("low", re.compile(r'低收入|月收入\s*5000\s*以下', re.I)),
+    ("high", re.compile(r'高收入|月收入\s*15000\s*以上', re.I)),
+]
+
+_NO_EXPERIENCE_RE = re.compile(r'没有.*经验|没有投资|0\s*年', re.I)
+_EXPERIENCE_RE = re.compile(r'(\d+)\s*年.*经验')
+
+_TOLERANCE_10_RE = re.compile(r'较小.*亏损|10\s*%|能接受\s*10\s*%', re.I)
+_TOLERANCE_RE = re.compile(r'(\d+)\s*%')
+
+_MONTHLY_1K_RE = re.compile(r'1\s*k|1000|每月\s*1\s*k|每月\s*1000', re.I)
+_MONTHLY_AMOUNT_RE = re.compile(r'每月.*?(\d+)\s*[元块]')
+
+# 跨消息匹配上面带 .* 的规则时，分别检查前缀和后缀
+_YEARS_RE = re.compile(r'(\d+)\s*年')
+_AMOUNT_RE = re.compile(r'(\d+)\s*[元块]')
+
+
+def _head(text: str) -> str:
+    """第一个换行之前的部分：能与上一条消息的末尾连成一行"""
+    return text.split("\n", 1)[0]
+
+
+def _tail(text: str) -> str:
+    """最后一个换行之后的部分：能与下一条消息的开头连成一行"""
+    return text.rsplit("\n", 1)[-1]
+
+
+def _carry(pending: bool, text: str, prefix: str) -> bool:
+    """这条消息之后，是否还有一个没有被换行隔断的前缀可以与后面的消息匹配"""
+    if "\n" in text:
+        return prefix in _tail(text)
+    return pending or prefix in text
+
+
+class UserProfile:
+    """
+    增量维护的用户画像：每轮只解析新的用户消息，单轮开销与对话长度无关。
+
+    结果与"把所有用户消息用空格拼起来再匹配"一致：普通字段取最早出现的值，
+    带优先级的规则（如"没有经验"、"1k"）一旦出现就覆盖普通匹配。
+    带 .* 的规则（"没有.*经验"、"N年.*经验"、"较小.*亏损"、"每月.*N元"）可能跨消息匹配，
+    这里记录上一条消息末尾尚未被换行隔断的前缀，与后面消息的第一行一起判断。
+    唯一的差别是数字和单位恰好被拆在两条消息的首尾（如 "27" 和 "岁"）时不会拼起来匹配。
+    """
+
+    def __init__(self):
+        self.age = None
+        self.income_level = None
+        self._income_rank = None
+        self._no_experience = False
+        self._experience_years = None
+        self._tolerance_10 = False
+        self._tolerance = None
+        self._monthly_1k = False
+        self._monthly_amount = None
+        # 前面消息中尚未匹配完的前缀
+        self._no_pending = False
+        self._years_pending = None
+        self._small_pending = False
+        self._monthly_pending = False
+
+    @traced("profile.extract")
+    def update(self, text: str) -> None:
+        """解析一条新的用户消息"""
+        if not text:
+            return
+
+        if self.age is None:
+            age_match = _AGE_RE.search(text)
+            if age_match:
+                self.age = int(age_match.group(1))
+
+        for rank, (level, pattern) in enumerate(_INCOME_RULES):
+            if self._income_rank is not None and rank >= self._income_rank:
+                break
+            if pattern.search(text):
+                self._income_rank = rank
+                self.income_level = level
+                break
+
+        head = _head(text)
+
+        if not self._no_experience:
+            if _NO_EXPERIENCE_RE.search(text) or (self._no_pending and "经验" in head):
+                self._no_experience = True
+            elif self._experience_years is None:
+                if self._years_pending is not None and "经验" in head:
+                    self._experience_years = self._years_pending
+                else:
+                    exp_match = _EXPERIENCE_RE.search(text)
+                    if exp_match:
+                        self._experience_years = int(exp_match.group(1))
+        self._no_pending = _carry(self._no_pending, text, "没有")
+        if "\n" in text or self._years_pending is None:
+            years_match = _YEARS_RE.search(_tail(text))
+            self._years_pending = int(years_match.group(1)) if years_match else None
+
+        if not self._tolerance_10:
+            if _TOLERANCE_10_RE.search(text) or (self._small_pending and "亏损" in head):
+                self._tolerance_10 = True
+            elif self._tolerance is None:
+                tol_match = _TOLERANCE_RE.search(text)
+                if tol_match:
+                    self._tolerance = f"{tol_match.group(1)}%"
+        self._small_pending = _carry(self._small_pending, text, "较小")
+
+        if not self._monthly_1k:
+            if _MONTHLY_1K_RE.search(text):
+                self._monthly_1k = True
+            elif self._monthly_amount is None:
+                amount_match = _AMOUNT_RE.search(head) if self._monthly_pending else None
+                amount_match = amount_match or _MONTHLY_AMOUNT_RE.search(text)
+                if amount_match:
+                    self._monthly_amount = float(amount_match.group(1))
+        self._monthly_pending = _carry(self._monthly_pending, text, "每月")
+
+    def as_dict(self) -> dict:
+        """返回与 _extract_user_info 相同结构的字典（每次返回新副本）"""
+        return {
+            "age": self.age,
+            "income_level": self.income_level,
+            "investment_experience_years": 0 if self._no_experience else self._experience_years,
+            "max_drawdown_tolerance": "10%" if self._tolerance_10 else self._tolerance,
+            "monthly_invest_amount": 1000 if self._monthly_1k else self._monthly_amount,
+        }
+
+
+def extract_user_info(conversation_history) -> dict:
+    """从完整对话历史中重新提取用户信息（O(历史长度)，仅用于重建画像和基准对比）"""
+    profile = UserProfile()
+    for msg in conversation_history:
+        if msg.get("role") == "user":
+            profile.update(msg.get("content", ""))
+    return profile.as_dict()
@@ -40,6 +40,8 @@ FINANCE_SYSTEM_PROMPT = """
      * 为什么这样配置
      * 注意事项和建议
    - 不要只返回工具结果的原始数据，必须转换成用户能理解的文字说明
+   - 用户想知道定投几年后大概有多少钱、最差会怎样、亏损的可能性时，调用 simulate_plan_outcomes（需要：risk_level, monthly_invest_amount，可选 years），
+     用"大多数情况（p25~p75）""较差情况（p10）"这样的说法解释分位数，并强调结果基于假设、不代表未来收益
 
 5. 注意事项：
    - 回答仅用于学习和参考，不构成任何投资建议或保证收益
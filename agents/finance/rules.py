@@ -0,0 +1,76 @@
+"""
+风险评估和资产配置的规则表，单个用户的工具函数（handlers.py）和批量打分（batch_scoring.py）共用。
+
+分档规则用 (阈值, 分数) 表示：阈值升序排列，取值落在第 i 档时得 points[i]，
+单个用户用 bisect_right 查档，批量用 numpy.searchsorted(side="right")，两者结果一致。
+"""
+
+from bisect import bisect_right
+
+
+class TierRule:
+    """按阈值分档打分：value < thresholds[0] 得 points[0]，thresholds[i-1] <= value < thresholds[i] 得 points[i]"""
+
+    def __init__(self, thresholds: tuple, points: tuple):
+        if len(points) != len(thresholds) + 1:
+            raise ValueError("points 需要比 thresholds 多一个")
+        self.thresholds = thresholds
+        self.points = points
+
+    def tier(self, value) -> int:
+        return bisect_right(self.thresholds, value)
+
+    def score(self, value) -> int:
+        return self.points[self.tier(value)]
+
+
+# 年龄：30 岁以下 30 分，30~44 岁 20 分，45 岁及以上 10 分
+AGE_RULE = TierRule((30, 45), (30, 20, 10))
+
+# 投资经验（年）：不足 1 年 5 分，1 年 10 分，2~4 年 15 分，5 年及以上 20 分
+EXPERIENCE_RULE = TierRule((1, 2, 5), (5, 10, 15, 20))
+
+# 可承受最大回撤（%）：不足 10% 5 分，10%~19% 10 分，20%~29% 15 分，30% 及以上 20 分
+DRAWDOWN_RULE = TierRule((10, 20, 30), (5, 10, 15, 20))
+
+# 收入水平，未知的收入水平按低收入计分
+INCOME_POINTS = {"high": 30, "medium": 20}
+DEFAULT_INCOME_POINTS = 10
+
+# 无法解析的回撤容忍度按 10% 处理
+DEFAULT_DRAWDOWN = 10
+
+# 总分对应的风险等级：55 分以下保守，55~79 分平衡，80 分及以上激进
+RISK_LEVELS = ("conservative", "balanced", "aggressive")
+RISK_LEVEL_THRESHOLDS = (55, 80)
+
+# 资产类别（顺序固定）和各风险等级的配置比例（%），未知的风险等级按激进型配置
+CATEGORIES = ("现金及货币基金", "债券基金", "宽基指数基金")
+ALLOCATION_PERCENTS = {
+    "conservative": (40, 40, 20),
+    "balanced": (20, 40, 40),
+    "aggressive": (10, 20, 70),
+}
+DEFAULT_ALLOCATION = "aggressive"
+
+
+def income_points(income_level: str) -> int:
+    return INCOME_POINTS.get(income_level.lower(), DEFAULT_INCOME_POINTS)
+
+
+def parse_drawdown(max_drawdown_tolerance) -> int:
+    """把 "15%"、"15" 解析为 15，数字取整数部分，无法解析时返回 DEFAULT_DRAWDOWN"""
+    try:
+        if isinstance(max_drawdown_tolerance, (int, float)):
+            return int(max_drawdown_tolerance)
+        return int(max_drawdown_tolerance.strip().replace("%", ""))
+    except (AttributeError, ValueError, OverflowError):
+        return DEFAULT_DRAWDOWN
+
+
+def risk_level_for(score: int) -> str:
+    return RISK_LEVELS[bisect_right(RISK_LEVEL_THRESHOLDS, score)]
+
+
+def allocation_percents(risk_level: str) -> tuple:
+    return ALLOCATION_PERCENTS.get(risk_level, ALLOCATION_PERCENTS[DEFAULT_ALLOCATION])
@@ -0,0 +1,213 @@
+"""
+资产配置方案的蒙特卡洛模拟：按配置方案把每月定投分到三个资产类别（每月再平衡），
+模拟大量收益路径，给出各年末资产的分位数和净值最大回撤超过 10%/20%/30% 的概率。
+
+收益假设：每个类别的年化收益率和年化波动率（可覆盖）加上类别间相关系数。
+每月再平衡时组合月收益是各类别收益的线性组合，按组合的年化收益和波动率生成对数正态的月增长率，
+因此每条路径只需要一个随机数序列。
+
+随机数用查表代替逐个生成正态分布：预先算好 65536 个正态分位数对应的月增长率，
+每月只生成 16 位随机整数作为下标（生成正态随机数是主要耗时，查表后整体快约 3 倍）。
+分位数表截断在约 ±4.3 个标准差，对月度收益的分位数和回撤概率没有实际影响。
+
+路径按块模拟（SIMULATION_CHUNK_PATHS），每块只保留少量一维数组，内存与总路径数基本无关，
+只有年末资产快照（路径数 × 年数，float32）随路径数增长。
+"""
+
+import math
+from functools import lru_cache
+from typing import Dict, List
+
+from agents.shared.tracing import traced
+from config.settings import (
+    SIMULATION_CHUNK_PATHS,
+    SIMULATION_MAX_PATHS,
+    SIMULATION_MAX_YEARS,
+    SIMULATION_PATHS,
+)
+from .rules import CATEGORIES, DRAWDOWN_RULE, allocation_percents
+
+# 各资产类别的默认收益假设：(年化收益率 %, 年化波动率 %)，仅用于演示，不代表未来收益
+DEFAULT_ASSUMPTIONS = {
+    "现金及货币基金": (2.0, 0.5),
+    "债券基金": (3.5, 4.0),
+    "宽基指数基金": (8.0, 20.0),
+}
+
+# 类别间相关系数，行列顺序同 CATEGORIES
+DEFAULT_CORRELATION = (
+    (1.0, 0.1, 0.0),
+    (0.1, 1.0, -0.1),
+    (0.0, -0.1, 1.0),
+)
+
+# 报告的资产分位数（%），以及统计概率的回撤阈值（%，与风险评估的回撤分档一致）
+PERCENTILES = (10, 25, 50, 75, 90)
+DRAWDOWN_LEVELS = DRAWDOWN_RULE.thresholds
+
+_TABLE_BITS = 16
+
+
+@lru_cache(maxsize=1)
+def _normal_quantiles():
+    """65536 个等概率区间中点的标准正态分位数，缩放到方差为 1"""
+    import numpy as np
+    from statistics import NormalDist
+
+    size = 1 << _TABLE_BITS
+    inv_cdf = NormalDist().inv_cdf
+    quantiles = np.array([inv_cdf((i + 0.5) / size) for i in range(size)])
+    return quantiles / quantiles.std()
+
+
+def portfolio_assumptions(weights, assumptions: Dict = None, correlation=DEFAULT_CORRELATION) -> tuple:
+    """
+    组合的 (年化收益率 %, 年化波动率 %)。
+    weights 是各类别权重（顺序同 CATEGORIES），assumptions 可只覆盖部分类别。
+    """
+    merged = dict(DEFAULT_ASSUMPTIONS)
+    merged.update(assumptions or {})
+    returns = [merged[category][0] / 100 for category in CATEGORIES]
+    vols = [merged[category][1] / 100 for category in CATEGORIES]
+
+    expected = sum(w * r for w, r in zip(weights, returns))
+    variance = sum(
+        weights[i] * weights[j] * vols[i] * vols[j] * correlation[i][j]
+        for i in range(len(CATEGORIES))
+        for j in range(len(CATEGORIES))
+    )
+    return expected * 100, math.sqrt(max(variance, 0.0)) * 100
+
+
+def simulate_wealth_paths(
+    annual_return: float,
+    annual_volatility: float,
+    monthly_invest_amount: float,
+    months: int,
+    paths: int,
+    initial_amount: float = 0.0,
+    seed: int = 0,
+    chunk_paths: int = None,
+) -> tuple:
+    """
+    模拟 paths 条路径、每月月初定投 monthly_invest_amount，收益率单位为 %。
+    返回 (snapshots, max_drawdown)：
+        snapshots     (paths, 年数) float32，每年末的资产（months 不是 12 的倍数时最后一列是期末）
+        max_drawdown  (paths,) float32，净值最大回撤（0~1，不受追加投入影响）
+    结果由 seed 和 chunk_paths 共同决定。
+    """
+    import numpy as np
+
+    chunk_paths = max(1, chunk_paths or SIMULATION_CHUNK_PATHS)
+    # 月度对数增长率：均值使每月期望增长为 (1 + 年化收益) 的 12 次方根
+    sigma = annual_volatility / 100 / math.sqrt(12)
+    mu = math.log1p(annual_return / 100) / 12 - sigma * sigma / 2
+    growth_table = np.exp(mu + sigma * _normal_quantiles()).astype(np.float32)
+
+    checkpoints = list(range(11, months, 12))
+    if not checkpoints or checkpoints[-1] != months - 1:
+        checkpoints.append(months - 1)
+    snapshot_of = {month: column for column, month in enumerate(checkpoints)}
+
+    snapshots = np.empty((paths, len(checkpoints)), dtype=np.float32)
+    max_drawdown = np.empty(paths, dtype=np.float32)
+    bits = np.random.default_rng(seed).bit_generator
+    contribution = np.float32(monthly_invest_amount)
+
+    for start in range(0, paths, chunk_paths):
+        size = min(chunk_paths, paths - start)
+        wealth = np.full(size, initial_amount, dtype=np.float32)
+        nav = np.ones(size, dtype=np.float32)
+        peak = np.ones(size, dtype=np.float32)
+        # 记录净值相对历史高点的最低比例，最大回撤 = 1 - low
+        low = np.ones(size, dtype=np.float32)
+        growth = np.empty(size, dtype=np.float32)
+        ratio = np.empty(size, dtype=np.float32)
+
+        for month in range(months):
+            index = bits.random_raw((size + 3) // 4).view(np.uint16)[:size]
+            np.take(growth_table, index, out=growth)
+            wealth += contribution
+            wealth *= growth
+            nav *= growth
+            np.maximum(peak, nav, out=peak)
+            np.divide(nav, peak, out=ratio)
+            np.minimum(low, ratio, out=low)
+            column = snapshot_of.get(month)
+            if column is not None:
+                snapshots[start:start + size, column] = wealth
+
+        max_drawdown[start:start + size] = 1 - low
+
+    return snapshots, max_drawdown
+
+
+def _report_years(years: int) -> List[int]:
+    """10 年以内逐年报告，更长的期限报告第 1、3、5 年和之后每 5 年，最后一年总是报告"""
+    if years <= 10:
+        return list(range(1, years + 1))
+    report = [1, 3, 5] + list(range(10, years + 1, 5))
+    if report[-1] != years:
+        report.append(years)
+    return report
+
+
+@traced("tool", tool="simulate_plan_outcomes")
+def simulate_plan_outcomes(
+    risk_level: str,
+    monthly_invest_amount: float,
+    years: int = 10,
+    initial_amount: float = 0.0,
+    paths: int = None,
+    assumptions: Dict = None,
+    seed: int = 0,
+) -> Dict:
+    import numpy as np
+
+    years = min(max(int(years), 1), SIMULATION_MAX_YEARS)
+    paths = min(max(int(paths or SIMULATION_PATHS), 1), SIMULATION_MAX_PATHS)
+    risk_level = risk_level.lower()
+    weights = [percent / 100 for percent in allocation_percents(risk_level)]
+    # 模型传入的覆盖值形如 {"宽基指数基金": {"annual_return": 6, "annual_volatility": 18}}
+    overrides = {
+        category: (
+            float(values.get("annual_return", DEFAULT_ASSUMPTIONS[category][0])),
+            float(values.get("annual_volatility", DEFAULT_ASSUMPTIONS[category][1])),
+        )
+        for category, values in (assumptions or {}).items()
+        if category in DEFAULT_ASSUMPTIONS and isinstance(values, dict)
+    }
+    annual_return, annual_volatility = portfolio_assumptions(weights, overrides)
+
+    snapshots, max_drawdown = simulate_wealth_paths(
+        annual_return, annual_volatility, monthly_invest_amount,
+        months=years * 12, paths=paths, initial_amount=initial_amount, seed=seed,
+    )
+
+    report_years = _report_years(years)
+    values = np.percentile(snapshots[:, [year - 1 for year in report_years]], PERCENTILES, axis=0)
+    wealth_percentiles = []
+    for column, year in enumerate(report_years):
+        row = {"year": year, "contributed": round(initial_amount + monthly_invest_amount * 12 * year, 2)}
+        for percentile, value in zip(PERCENTILES, values[:, column]):
+            row[f"p{percentile}"] = round(float(value), 2)
+        wealth_percentiles.append(row)
+
+    total_contributed = wealth_percentiles[-1]["contributed"]
+    return {
+        "allocation_risk_level": risk_level,
+        "monthly_invest_amount": monthly_invest_amount,
+        "years": years,
+        "paths": paths,
+        "assumptions": {
+            "expected_annual_return": round(annual_return, 2),
+            "annual_volatility": round(annual_volatility, 2),
+        },
+        "wealth_percentiles": wealth_percentiles,
+        "max_drawdown_probability": {
+            f"{level}%": round(float((max_drawdown >= level / 100).mean()), 4)
+            for level in DRAWDOWN_LEVELS
+        },
+        "loss_probability": round(float((snapshots[:, -1] < total_contributed).mean()), 4),
+        "note": "结果基于假设的收益率和波动率随机模拟，仅用于理解波动范围，不代表未来收益。",
+    }
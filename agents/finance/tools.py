@@ -58,5 +58,45 @@ finance_tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "simulate_plan_outcomes",
+            "description": (
+                "按风险等级对应的资产配置方案模拟每月定投的多种可能结果，返回各年末资产的分位数（p10~p90）、"
+                "净值最大回撤超过 10%/20%/30% 的概率和到期低于投入本金的概率。"
+                "用户关心几年后大概有多少钱、最差情况或亏损可能时调用。"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "risk_level": {
+                        "type": "string",
+                        "description": "风险等级：conservative / balanced / aggressive。"
+                    },
+                    "monthly_invest_amount": {
+                        "type": "number",
+                        "description": "每月可投资金额（元）。"
+                    },
+                    "years": {
+                        "type": "integer",
+                        "description": "投资年限，默认 10 年，最长 30 年。"
+                    },
+                    "initial_amount": {
+                        "type": "number",
+                        "description": "已有的初始投资金额（元），默认 0。"
+                    },
+                    "assumptions": {
+                        "type": "object",
+                        "description": (
+                            "可选，覆盖资产类别的收益假设（单位 %），键为类别名（现金及货币基金/债券基金/宽基指数基金），"
+                            "值如 {\"annual_return\": 6, \"annual_volatility\": 18}。用户没有提出自己的假设时不要传。"
+                        ),
+                    },
+                },
+                "required": ["risk_level", "monthly_invest_amount"],
+            },
+        },
+    },
 ]
 
@@ -0,0 +1,260 @@
+"""
+本地意图路由：用预编译的关键词和句式判断问题属于哪个 Agent，并提取槽位（城市、理财画像字段）。
+置信度足够时直接分发到对应的 Agent，天气问题还会直接调用工具，省掉让模型选择 Agent 和工具的那次 LLM 请求；
+只有置信度低、会话里也没有上一轮 Agent 可以沿用的输入才请模型分类。
+
+    from agents.router import call_assistant
+    call_assistant("北京和上海明天哪个热")     # 直接调用 get_weather_batch
+    call_assistant("我27岁，每月能投2000元", session_id="user-1")
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from agents.shared.cache import TTLCache
+from agents.shared.messages import AgentPrompt
+from agents.shared.metrics import Counters
+from agents.finance.profile import UserProfile
+from agents.weather.gazetteer import (
+    find_places,
+    has_admin_suffix,
+    is_known_non_place,
+    remove_places,
+    resolve_place,
+)
+from config.settings import ROUTER_MIN_CONFIDENCE
+
+WEATHER = "weather"
+FINANCE = "finance"
+INTENTS = (WEATHER, FINANCE)
+
+DEFAULT_SESSION_ID = "default"
+
+
+def _keyword_re(keywords) -> re.Pattern:
+    """关键词拼成一个正则，长的在前"""
+    return re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+
+
+_WEATHER_RE = _keyword_re((
+    "天气", "气温", "温度", "多少度", "下雨", "下雪", "降雨", "降温", "升温", "冷不冷", "热不热",
+    "带伞", "雨伞", "刮风", "大风", "风力", "空气质量", "空气", "雾霾", "湿度", "紫外线", "预报",
+    "晴天", "阴天", "台风", "穿什么", "冷吗", "热吗", "哪个热", "哪个冷", "更热", "更冷", "凉快", "暖和", "weather",
+))
+_FINANCE_RE = _keyword_re((
+    "理财", "投资", "基金", "股票", "定投", "收益", "亏损", "回撤", "风险", "资产配置", "配置方案",
+    "存钱", "攒钱", "储蓄", "债券", "指数", "收入", "年薪", "月薪", "工资", "退休", "养老", "可投资",
+    "股市", "A股", "沪深", "ETF", "存款", "利率", "房价", "房贷", "贷款", "买房",
+))
+# 金额（"2000元"、"5万"）：和理财关键词一样计分，"每月2000元" 这类追问不需要上下文也能判断
+_AMOUNT_RE = re.compile(r"\d+(?:\.\d+)?\s*(?:元|块|万|千|[kKwW](?![a-zA-Z]))")
+
+# "涿州天气怎么样" 这类句式：本地索引没有收录的城市也能取出城市名
+_TIME_WORDS = r"今天|明天|后天|今日|明日|现在|目前|这几天|最近|本周|这周|周末|早上|晚上|下午"
+_WEATHER_QUESTION_RE = re.compile(
+    rf"^(?P<place>.{{1,12}}?)(?:的)?(?:{_TIME_WORDS})?(?:的)?(?:天气|气温|温度)"
+    r"(?:怎么样|如何|咋样|好吗|好不好|情况)?[?？。!！\s]*$"
+)
+_TIME_RE = re.compile(_TIME_WORDS)
+_NOT_PLACES = {"外面", "本地", "当地", "户外", "室外"}
+_PRONOUN_RE = re.compile(r"[我你他她这那哪]")
+
+# 列举城市时的分隔符和语气词：去掉城市名和时间词后只剩这些，说明整句就是在问这几个城市
+_FILLER_RE = re.compile(r"[\s、，,/和跟与及还有呢吗啊的那么？?。!！]+")
+
+# "CPU温度怎么样"、"室内温度" 这类取出的不是地名：按天气问题分发，但置信度低于阈值，交给模型判断
+_UNSURE_CONFIDENCE = 0.5
+
+
+class Route(NamedTuple):
+    intent: Optional[str]  # WEATHER / FINANCE，无法判断时为 None
+    confidence: float  # 0~1
+    tool: Optional[str] = None  # 槽位齐全、可以不经模型直接调用的工具
+    arguments: Optional[dict] = None
+    slots: Optional[dict] = None  # 提取到的槽位：places（城市名列表）或理财画像字段
+
+
+# 路由方式统计：local 本地判断、session 沿用会话上一轮的 Agent、llm 请模型分类
+_counters = Counters()
+
+# 会话上一轮使用的 Agent，用于"我27岁"这类单看一句无法判断的追问
+_last_intent = TTLCache(maxsize=4096, ttl=1800)
+
+_ROUTER_PROMPT = (
+    "你是一个意图分类器。判断用户的问题应该交给哪个助手：\n"
+    "weather：天气、气温、出行穿衣等和天气有关的问题\n"
+    "finance：理财、投资、储蓄、资产配置等和钱有关的问题\n"
+    "只回答 weather 或 finance，不要输出其他内容。"
+)
+_classifier = AgentPrompt("router", _ROUTER_PROMPT)
+
+
+def _weather_tool(places: List[str]) -> tuple:
+    if len(places) == 1:
+        return "get_weather", {"location": places[0]}
+    return "get_weather_batch", {"locations": places}
+
+
+def _question_place(text: str) -> Optional[str]:
+    """从 "XX天气怎么样" 句式中取出城市名（去掉时间词），取不到时返回 None"""
+    match = _WEATHER_QUESTION_RE.match(text)
+    if not match:
+        return None
+    place = _TIME_RE.sub("", match.group("place")).strip(" 的")
+    if not place or place in _NOT_PLACES or _PRONOUN_RE.search(place) or is_known_non_place(place):
+        return None
+    return place
+
+
+def route(user_input: str) -> Route:
+    """只用本地规则判断意图并提取槽位，耗时在微秒级"""
+    text = user_input.strip()
+    if not text:
+        return Route(None, 0.0)
+
+    # 整句就是一个城市名
+    place = resolve_place(text)
+    if place is not None:
+        return Route(WEATHER, 1.0, "get_weather", {"location": text}, {"places": [place.name]})
+
+    places = [p.name for p in find_places(text)]
+    weather_hits = len(_WEATHER_RE.findall(text))
+    finance_hits = len(_FINANCE_RE.findall(text)) + len(_AMOUNT_RE.findall(text))
+
+    if places and not finance_hits:
+        tool, arguments = _weather_tool(places)
+        slots = {"places": places}
+        if weather_hits:
+            return Route(WEATHER, 0.95, tool, arguments, slots)
+        # "北京、上海"、"那杭州呢？"、"北京明天"：去掉城市名和时间词后只剩分隔符和语气词
+        # 还有其他内容（"北京的房价"、"我在上海工作"）时不能确定是问天气，交给下面打分（置信度低于阈值）
+        residue = _FILLER_RE.sub("", _TIME_RE.sub("", remove_places(text)))
+        if not residue:
+            return Route(WEATHER, 0.9, tool, arguments, slots)
+
+    if weather_hits and not places and not finance_hits:
+        candidate = _question_place(text)
+        if candidate is not None:
+            # 只有索引能解析或带行政区划后缀的才当作城市直接查询
+            if resolve_place(candidate) is not None or has_admin_suffix(candidate):
+                return Route(WEATHER, 0.8, "get_weather", {"location": candidate}, {"places": [candidate]})
+            return Route(WEATHER, _UNSURE_CONFIDENCE, slots={"places": []})
+
+    # 按关键词和槽位打分：命中一个关键词约 0.7，两个以上为 1；两类信号都有时按比例降低
+    profile = UserProfile()
+    profile.update(text)
+    finance_slots = {k: v for k, v in profile.as_dict().items() if v is not None}
+    weather_score = weather_hits + (0.5 if places else 0.0)
+    finance_score = finance_hits + 0.5 * len(finance_slots)
+    total = weather_score + finance_score
+    if total == 0:
+        return Route(None, 0.0)
+
+    if weather_score >= finance_score:
+        intent, score, slots = WEATHER, weather_score, {"places": places}
+    else:
+        intent, score, slots = FINANCE, finance_score, finance_slots
+    confidence = round(score / total * min(1.0, 0.4 + 0.3 * score), 2)
+    return Route(intent, confidence, slots=slots)
+
+
+def _local_intent(decision: Route, session_id: str) -> Optional[str]:
+    """本地规则或会话上一轮的 Agent，都判断不了时返回 None（需要请模型分类）"""
+    if decision.intent is not None and decision.confidence >= ROUTER_MIN_CONFIDENCE:
+        _counters.incr("local")
+        return decision.intent
+    # 理财关键词、金额和画像字段（年龄、收入等）占多数时，即使置信度不够也不沿用上一轮的天气 Agent
+    if decision.intent == FINANCE:
+        _counters.incr("local")
+        return FINANCE
+    intent = _last_intent.get(session_id)
+    if intent is not None:
+        _counters.incr("session")
+    return intent
+
+
+def _sets_session(user_input: str, decision: Route, intent: str) -> bool:
+    """
+    这一轮的结果能否作为会话的 Agent 沿用到后面的追问。
+    只是句子里碰巧出现了地名（"长治久安"、"普洱茶"、"中山路"）时，没有天气关键词也不是单独的地名，
+    不能据此把会话定为天气 Agent。
+    """
+    if intent != WEATHER:
+        return True
+    return decision.confidence >= ROUTER_MIN_CONFIDENCE or _WEATHER_RE.search(user_input) is not None
+
+
+def _parse_intent(response) -> str:
+    _counters.incr("llm")
+    content = (response.choices[0].message.content or "").lower()
+    return FINANCE if FINANCE in content else WEATHER
+
+
+def resolve_intent(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """决定这句话交给哪个 Agent，返回 WEATHER 或 FINANCE"""
+    decision = route(user_input)
+    intent = _local_intent(decision, session_id)
+    if intent is None:
+        messages = _classifier.messages([{"role": "user", "content": user_input}])
+        intent = _parse_intent(_classifier.create(messages))
+    if _sets_session(user_input, decision, intent):
+        _last_intent.set(session_id, intent)
+    return intent
+
+
+async def aresolve_intent(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """resolve_intent 的异步版本"""
+    decision = route(user_input)
+    intent = _local_intent(decision, session_id)
+    if intent is None:
+        messages = _classifier.messages([{"role": "user", "content": user_input}])
+        intent = _parse_intent(await _classifier.acreate(messages))
+    if _sets_session(user_input, decision, intent):
+        _last_intent.set(session_id, intent)
+    return intent
+
+
+def call_assistant(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """不需要指定 Agent：自动判断意图后交给天气或理财 Agent"""
+    if resolve_intent(user_input, session_id) == FINANCE:
+        from agents.finance.core import call_finance_agent
+
+        return call_finance_agent(user_input, session_id=session_id)
+
+    from agents.weather.core import call_weather_agent
+
+    return call_weather_agent(user_input)
+
+
+def stream_assistant(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> tuple:
+    """call_assistant 的流式版本，返回 (意图, 逐段文本的迭代器)，便于调用方先显示由哪个 Agent 回答"""
+    intent = resolve_intent(user_input, session_id)
+    if intent == FINANCE:
+        from agents.finance.core import stream_finance_agent
+
+        return intent, stream_finance_agent(user_input, session_id=session_id)
+
+    from agents.weather.core import stream_weather_agent
+
+    return intent, stream_weather_agent(user_input)
+
+
+async def acall_assistant(user_input: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+    """call_assistant 的异步版本"""
+    if await aresolve_intent(user_input, session_id) == FINANCE:
+        from agents.finance.core import acall_finance_agent
+
+        return await acall_finance_agent(user_input, session_id=session_id)
+
+    from agents.weather.core import acall_weather_agent
+
+    return await acall_weather_agent(user_input)
+
+
+def get_router_stats() -> dict:
+    """返回各路由方式的次数和本地路由占比"""
+    counts = {name: 0 for name in ("local", "session", "llm")}
+    counts.update(_counters.snapshot())
+    total = sum(counts.values())
+    counts["local_rate"] = round((counts["local"] + counts["session"]) / total, 4) if total else 0.0
+    return counts
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    进程内缓存：按 TTL 过期，超过容量时按 LRU 淘汰。
+
+    过期后的 stale_ttl 时间窗口内仍可返回旧值（stale-while-revalidate），
+    同时在后台线程中刷新，避免用户请求等待外部接口。
+    同一个 key 未命中时只有一个调用方执行 loader，并发的其他调用方等待同一个结果（single-flight）。
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._loading = {}  # key -> 正在加载的 Future
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key):
+        """返回未过期的缓存值，不存在或已过期返回 None（不触发刷新）"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def expires_in(self, key):
+        """距离过期还有多少秒（已过期但仍在 stale 窗口内时为负数），不在缓存中返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        return entry[1] - time.monotonic()
+
+    def set(self, key, value) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        读取缓存，未命中时调用 loader() 加载并写入缓存。
+        loader 抛出的异常会直接向上传递（等待同一次加载的调用方也会收到），且不会写入缓存。
+        """
+        if not self.enabled:
+            return loader()
+
+        now = time.monotonic()
+        leader = False
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    # 旧值仍可用：先返回，再在后台刷新
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh, args=(key, loader), daemon=True
+                        ).start()
+                    return value
+                del self._data[key]
+            self.misses += 1
+            future = self._loading.get(key)
+            if future is not None:
+                # 已经有调用方在加载这个 key：等它的结果，不重复请求
+                self.coalesced += 1
+            else:
+                future = self._loading[key] = Future()
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def _refresh(self, key, loader) -> None:
+        """后台刷新单个 key，失败时保留旧值"""
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            self.set(key, value)
+            with self._lock:
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """返回命中/未命中等计数"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
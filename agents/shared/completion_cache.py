@@ -0,0 +1,194 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from openai.types.chat import ChatCompletion
+
+from agents.shared.cache import TTLCache
+
+OFF = "off"
+MEMORY = "memory"
+SQLITE = "sqlite"
+CACHE_MODES = (OFF, MEMORY, SQLITE)
+
+# 不参与缓存 key 的参数（只影响传输，不影响回答内容）
+_TRANSPORT_PARAMS = {"timeout", "extra_headers", "extra_query", "extra_body"}
+
+# 只缓存正常结束的回答（被截断的回答不应该被重放）
+_CACHEABLE_FINISH_REASONS = {"stop", "tool_calls"}
+
+
+def _bypass(kwargs: dict) -> bool:
+    """流式、多候选或显式要求随机采样的请求不走缓存"""
+    if kwargs.get("stream"):
+        return True
+    if (kwargs.get("n") or 1) > 1:
+        return True
+    temperature = kwargs.get("temperature")
+    if temperature is not None and temperature > 0:
+        return True
+    top_p = kwargs.get("top_p")
+    return top_p is not None and top_p < 1
+
+
+def _replay(raw: str):
+    """从缓存的 JSON 还原 ChatCompletion，并标记为重放的回答（不参与序列化）"""
+    response = ChatCompletion.model_validate_json(raw)
+    object.__setattr__(response, "_replayed", True)
+    return response
+
+
+def is_replayed(response) -> bool:
+    """回答是否来自缓存重放（没有真正请求模型，usage 是原来那次请求的）"""
+    return getattr(response, "_replayed", False)
+
+
+class CompletionCache:
+    """
+    chat.completions 的精确匹配缓存：key 为 model、messages、tools 等参数规范化 JSON 的 sha256。
+
+    - memory：进程内 TTL + LRU
+    - sqlite：进程内缓存之后再查一层 SQLite 文件，进程重启、多进程之间都能复用，按 TTL 和条数上限淘汰
+
+    没有显式指定 temperature 的请求视为可以重放（缓存的是一次有效的回答）。
+    """
+
+    def __init__(self, mode: str = OFF, path: str = "", ttl: float = 86400.0,
+                 max_entries: int = 10000):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"LLM_CACHE={mode} 无效，可选值：{' / '.join(CACHE_MODES)}")
+        self.mode = mode
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = TTLCache(maxsize=min(max_entries, 1024), ttl=ttl)
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        if mode == SQLITE:
+            self._open(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF and self.ttl > 0 and self.max_entries > 0
+
+    def _open(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions(accessed_at)")
+
+    def key_for(self, args: tuple, kwargs: dict):
+        """计算缓存 key；缓存关闭或请求不适合缓存时返回 None"""
+        if not self.enabled:
+            return None
+        if args or _bypass(kwargs):
+            self.bypassed += 1
+            return None
+        params = {k: v for k, v in kwargs.items() if k not in _TRANSPORT_PARAMS}
+        try:
+            canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        except (TypeError, ValueError):
+            self.bypassed += 1
+            return None
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """命中时返回新的 ChatCompletion 对象，未命中返回 None"""
+        raw = self._memory.get(key)
+        if raw is not None:
+            self.memory_hits += 1
+            return _replay(raw)
+
+        if self._db is not None:
+            raw = self._db_get(key)
+            if raw is not None:
+                self.disk_hits += 1
+                self._memory.set(key, raw)
+                return _replay(raw)
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, response) -> None:
+        if not all(choice.finish_reason in _CACHEABLE_FINISH_REASONS for choice in response.choices):
+            return
+        raw = response.model_dump_json()
+        self._memory.set(key, raw)
+        if self._db is not None:
+            self._db_set(key, raw)
+        self.stores += 1
+
+    def _db_get(self, key: str):
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] + self.ttl <= now:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _db_set(self, key: str, raw: str) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, raw, now, now),
+            )
+            self._writes += 1
+            # 每 100 次写入清理一次：先删过期的，再按最近访问时间淘汰超出上限的部分
+            if self._writes % 100 == 0:
+                self._evict_locked(now)
+
+    def _evict_locked(self, now: float) -> None:
+        self._db.execute("DELETE FROM completions WHERE created_at <= ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM completions WHERE key IN ("
+                " SELECT key FROM completions ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM completions")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        stats = {
+            "mode": self.mode,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_size": len(self._memory),
+        }
+        if self._db is not None:
+            with self._db_lock:
+                stats["disk_size"] = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        return stats
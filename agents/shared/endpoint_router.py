@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+
+from agents.shared.resilience import LatencyTracker
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class EndpointHealth:
+    """单个端点的健康状态：EWMA 延迟、EWMA 错误率和熔断器"""
+
+    def __init__(self, url: str, alpha: float, failure_threshold: int, open_seconds: float):
+        self.url = url
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.ewma_latency = None  # 秒，尚未测量时为 None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.latency = LatencyTracker()  # 完整请求的延迟窗口，用于自适应超时和对冲
+
+    def available(self, now: float) -> bool:
+        """是否可以发送请求；熔断打开超时后进入半开状态，只放行一个探测请求"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        return self.state == HALF_OPEN and not self.probe_in_flight
+
+    def on_dispatch(self) -> None:
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+
+    def release(self) -> None:
+        """请求结束但既不算成功也不算端点故障（429/400、其他异常、被取消）：让出探测名额，熔断状态不变"""
+        self.probe_in_flight = False
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.error_rate *= 1 - self.alpha
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.state = CLOSED
+        self.probe_in_flight = False
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+        self.probe_in_flight = False
+
+    def score(self) -> float:
+        """路由打分（越小越好）：延迟按错误率加权"""
+        return self.ewma_latency * (1 + 4 * self.error_rate)
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class EndpointRouter:
+    """
+    在多个等价端点之间路由（线程安全）。
+
+    - 优先使用当前端点；其他端点的打分明显更好（低于 switch_margin 比例）时才切换，避免来回抖动
+    - 以 explore_rate 的概率把请求发往其他端点，持续测量它们的延迟
+    - 连续失败达到阈值后熔断，open_seconds 后进入半开状态放行一个探测请求
+    """
+
+    def __init__(self, urls, alpha: float = 0.2, failure_threshold: int = 3,
+                 open_seconds: float = 30.0, explore_rate: float = 0.02,
+                 switch_margin: float = 0.2):
+        unique_urls = list(dict.fromkeys(urls))
+        self._health = {
+            url: EndpointHealth(url, alpha, failure_threshold, open_seconds)
+            for url in unique_urls
+        }
+        self._current = unique_urls[0]
+        self.explore_rate = explore_rate
+        self.switch_margin = switch_margin
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> str:
+        return self._current
+
+    @property
+    def urls(self) -> list:
+        return list(self._health)
+
+    def choose(self, exclude=()) -> str:
+        """选择本次请求使用的端点"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                h for url, h in self._health.items()
+                if url not in exclude and h.available(now)
+            ]
+            if not candidates:
+                # 全部熔断：仍然要发请求，选最早熔断的端点（最可能已经恢复）
+                remaining = [h for url, h in self._health.items() if url not in exclude]
+                if not remaining:
+                    remaining = list(self._health.values())
+                chosen = min(remaining, key=lambda h: h.opened_at)
+            else:
+                chosen = self._pick_locked(candidates)
+            chosen.on_dispatch()
+            return chosen.url
+
+    def _pick_locked(self, candidates: list) -> EndpointHealth:
+        current = self._health[self._current]
+        others = [h for h in candidates if h is not current]
+
+        if current not in candidates:
+            measured = [h for h in others if h.ewma_latency is not None]
+            best = min(measured, key=EndpointHealth.score) if measured else others[0]
+            self._current = best.url
+            return best
+
+        if others and random.random() < self.explore_rate:
+            return random.choice(others)
+
+        if current.ewma_latency is not None:
+            measured = [h for h in others if h.ewma_latency is not None]
+            if measured:
+                best = min(measured, key=EndpointHealth.score)
+                if best.score() < current.score() * (1 - self.switch_margin):
+                    self._current = best.url
+                    return best
+        return current
+
+    def record_success(self, url: str, latency: float) -> None:
+        with self._lock:
+            self._health[url].record_success(latency)
+
+    def record_failure(self, url: str) -> None:
+        with self._lock:
+            self._health[url].record_failure(time.monotonic())
+
+    def release(self, url: str) -> None:
+        with self._lock:
+            self._health[url].release()
+
+    def available(self, url: str) -> bool:
+        """端点当前是否可以发送请求（熔断中或半开探测已在进行时为 False）"""
+        with self._lock:
+            return self._health[url].available(time.monotonic())
+
+    def claim(self, url: str) -> bool:
+        """向指定端点发送请求前占用名额（半开状态占用探测名额）；端点不可用时返回 False"""
+        with self._lock:
+            health = self._health[url]
+            if not health.available(time.monotonic()):
+                return False
+            health.on_dispatch()
+            return True
+
+    def latency(self, url: str) -> LatencyTracker:
+        return self._health[url].latency
+
+    def alternative(self, url: str) -> str:
+        """返回 url 以外最健康的端点（只有一个端点时返回自身）"""
+        now = time.monotonic()
+        with self._lock:
+            others = [h for u, h in self._health.items() if u != url]
+            if not others:
+                return url
+            available = [h for h in others if h.available(now)] or others
+            measured = [h for h in available if h.ewma_latency is not None]
+            return (min(measured, key=EndpointHealth.score) if measured else available[0]).url
+
+    def switch_to(self, url: str) -> None:
+        with self._lock:
+            self._current = url
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "current": self._current,
+                "endpoints": [h.snapshot() for h in self._health.values()],
+            }
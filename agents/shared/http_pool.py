@@ -0,0 +1,138 @@
+"""
+共享的 httpx 连接池：keep-alive 复用连接、连接数可配置、可选 HTTP/2，代理配置与 LLM 客户端共用。
+
+每个连接池按名称统计请求数、新建的 TCP 连接和 TLS 握手次数（通过 httpcore 的 trace 扩展），
+据此计算连接复用率。httpx 在第一次创建连接池时才导入，导入本模块不会建立任何连接。
+"""
+
+import threading
+
+from agents.shared.metrics import Counters
+from config.settings import HTTP_PROXY, HTTPS_PROXY
+
+
+def proxy_urls() -> dict:
+    """按代理配置返回 {scheme: 代理地址}，没有配置时为空"""
+    urls = {}
+    if HTTP_PROXY:
+        urls["http://"] = HTTP_PROXY
+    if HTTPS_PROXY:
+        urls["https://"] = HTTPS_PROXY
+    return urls
+
+
+def proxy_mounts(transport_cls, **transport_kwargs) -> dict:
+    """按代理配置生成 httpx 的 mounts（同步/异步传输层通用）"""
+    return {
+        scheme: transport_cls(proxy=proxy_url, **transport_kwargs)
+        for scheme, proxy_url in proxy_urls().items()
+    }
+
+
+def http2_available() -> bool:
+    """httpx 的 HTTP/2 支持依赖可选的 h2 包"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PoolStats:
+    """一个连接池的请求数、新建连接数和协议版本统计"""
+
+    def __init__(self):
+        self._counters = Counters()
+
+    def on_request(self, request) -> None:
+        self._counters.incr("requests")
+        request.extensions["trace"] = self._trace
+
+    def on_response(self, response) -> None:
+        self._counters.incr(f"http_version:{response.http_version}")
+
+    def _trace(self, event_name: str, info: dict) -> None:
+        # 只有新建连接时才会出现 connect_tcp / start_tls 事件，复用的连接直接发送请求
+        if event_name == "connection.connect_tcp.complete":
+            self._counters.incr("new_connections")
+        elif event_name == "connection.start_tls.complete":
+            self._counters.incr("tls_handshakes")
+
+    def snapshot(self) -> dict:
+        counts = self._counters.snapshot()
+        requests = counts.get("requests", 0)
+        new_connections = counts.get("new_connections", 0)
+        reused = max(requests - new_connections, 0)
+        return {
+            "requests": requests,
+            "new_connections": new_connections,
+            "tls_handshakes": counts.get("tls_handshakes", 0),
+            "reused_connections": reused,
+            "reuse_rate": round(reused / requests, 4) if requests else 0.0,
+            "http_versions": {
+                name.split(":", 1)[1]: value for name, value in counts.items() if name.startswith("http_version:")
+            },
+        }
+
+
+_pools = {}  # 名称 -> (httpx.Client, PoolStats)
+_pools_lock = threading.Lock()
+
+
+def get_pooled_client(
+    name: str,
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    http2: bool = False,
+    timeout: float = 10.0,
+):
+    """
+    返回名为 name 的共享 httpx.Client（第一次调用时按参数创建，之后的参数被忽略）。
+    http2=True 但没有安装 h2 时退回 HTTP/1.1。
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = _create_pool(
+                    name, max_connections, max_keepalive_connections, keepalive_expiry, http2, timeout
+                )
+    return pool[0]
+
+
+def _create_pool(name, max_connections, max_keepalive_connections, keepalive_expiry, http2, timeout):
+    import httpx
+
+    if http2 and not http2_available():
+        print(f"⚠️  未安装 h2，{name} 连接池使用 HTTP/1.1（pip install 'httpx[http2]' 可启用 HTTP/2）")
+        http2 = False
+
+    stats = PoolStats()
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    options = {
+        "limits": limits,
+        "http2": http2,
+        "timeout": timeout,
+        "verify": True,
+        "event_hooks": {"request": [stats.on_request], "response": [stats.on_response]},
+    }
+    mounts = proxy_mounts(httpx.HTTPTransport, limits=limits, http2=http2)
+    if mounts:
+        client = httpx.Client(mounts=mounts, **options)
+    else:
+        # 没有单独配置代理时读取系统代理设置（VPN）
+        client = httpx.Client(trust_env=True, **options)
+    return client, stats
+
+
+def get_pool_stats() -> dict:
+    """返回每个已创建连接池的请求数、新建连接数和复用率"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: stats.snapshot() for name, (_, stats) in pools.items()}
@@ -1,16 +1,51 @@
+import asyncio
 import os
+import threading
+import time
+
 import httpx
-from openai import OpenAI
-from openai._exceptions import APIConnectionError
+from openai import OpenAI, AsyncOpenAI
+from openai._exceptions import APIConnectionError, APIStatusError
 
-from config.settings import DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL, HTTP_PROXY, HTTPS_PROXY
+from agents.shared.completion_cache import CompletionCache
+from agents.shared import tracing
+from agents.shared.endpoint_router import EndpointRouter
+from agents.shared.http_pool import proxy_mounts
+from agents.shared.resilience import adaptive_timeout, ahedged_call, backoff_delay, hedge_delay, hedged_call
+from config.settings import (
+    DEEPSEEK_API_KEY,
+    DEEPSEEK_BASE_URL,
+    DEEPSEEK_FALLBACK_URL,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_EWMA_ALPHA,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_OPEN_SECONDS,
+    LLM_ROUTER_EXPLORE_RATE,
+    LLM_ROUTER_SWITCH_MARGIN,
+    LLM_TIMEOUT,
+    LLM_TIMEOUT_MIN,
+    TIMEOUT_P99_MULTIPLIER,
+    LLM_MAX_RETRIES,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    LLM_HEDGE,
+    HEDGE_PERCENTILE,
+    LLM_CACHE,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+)
+
+
+def _check_api_key() -> None:
+    """检查 API 密钥是否存在（创建客户端时检查，而不是导入模块时）"""
+    if not DEEPSEEK_API_KEY:
+        raise ValueError(
+            "DEEPSEEK_API_KEY 未设置！请确保 .env 文件存在并包含 DEEPSEEK_API_KEY。"
+            "\n可以复制 .env.example 为 .env 并填入你的 API 密钥。"
+        )
 
-# 检查 API 密钥是否存在
-if not DEEPSEEK_API_KEY:
-    raise ValueError(
-        "DEEPSEEK_API_KEY 未设置！请确保 .env 文件存在并包含 DEEPSEEK_API_KEY。"
-        "\n可以复制 .env.example 为 .env 并填入你的 API 密钥。"
-    )
 
 # 定义两个可用的 API 端点
 DEEPSEEK_CN_URL = "https://api.deepseek.cn/v1"
@@ -27,31 +62,98 @@ def get_alternative_url(current_url: str) -> str:
         # 如果都不是，默认返回 .com
         return DEEPSEEK_COM_URL
 
-# 配置代理（如果设置了的话）
-proxies = {}
-if HTTP_PROXY:
-    proxies["http://"] = HTTP_PROXY
-if HTTPS_PROXY:
-    proxies["https://"] = HTTPS_PROXY
-
-# 创建 httpx 客户端
-# 如果有代理配置，使用代理；否则使用 trust_env=True 允许使用系统代理（VPN）
-if proxies:
-    _http_client = httpx.Client(proxies=proxies, timeout=30.0, verify=True)
-else:
+# 触发切换端点的错误（连接失败、超时）
+_FAILOVER_ERRORS = (APIConnectionError, httpx.ConnectError, httpx.TimeoutException)
+
+
+class _HedgeSkipped(Exception):
+    """对冲触发时备用端点已不可用（熔断或半开探测进行中），不发送对冲请求"""
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    """限流、请求超时和服务端错误可以退避后重试"""
+    return status_code in (408, 409, 429) or status_code >= 500
+
+
+def _with_timeout(router: EndpointRouter, url: str, kwargs: dict) -> dict:
+    """调用方没有指定 timeout 时，按该端点最近的 p99 延迟设置自适应超时"""
+    if "timeout" in kwargs:
+        return kwargs
+    timeout = adaptive_timeout(router.latency(url), LLM_TIMEOUT, LLM_TIMEOUT_MIN, TIMEOUT_P99_MULTIPLIER)
+    return dict(kwargs, timeout=timeout)
+
+
+def _create_router(initial_url: str, fallback_url: str = "") -> EndpointRouter:
+    """按配置创建端点路由器：主端点 + 备用端点"""
+    return EndpointRouter(
+        [initial_url, fallback_url or get_alternative_url(initial_url)],
+        alpha=LLM_EWMA_ALPHA,
+        failure_threshold=LLM_BREAKER_FAILURES,
+        open_seconds=LLM_BREAKER_OPEN_SECONDS,
+        explore_rate=LLM_ROUTER_EXPLORE_RATE,
+        switch_margin=LLM_ROUTER_SWITCH_MARGIN,
+    )
+
+
+def _create_http_client() -> httpx.Client:
+    """创建同步 httpx 客户端"""
+    # 如果有代理配置（与天气 API 连接池共用），使用代理；否则使用 trust_env=True 允许使用系统代理（VPN）
+    mounts = proxy_mounts(httpx.HTTPTransport)
+    if mounts:
+        return httpx.Client(mounts=mounts, timeout=LLM_TIMEOUT, verify=True)
     # 如果使用 VPN，允许使用系统代理设置
     # trust_env=True 会读取环境变量中的代理设置
-    _http_client = httpx.Client(trust_env=True, timeout=30.0, verify=True)
+    return httpx.Client(trust_env=True, timeout=LLM_TIMEOUT, verify=True)
+
+
+def _create_async_http_client() -> httpx.AsyncClient:
+    """创建异步 httpx 客户端，供同一个事件循环中的大量并发会话复用连接池"""
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    mounts = proxy_mounts(httpx.AsyncHTTPTransport)
+    if mounts:
+        return httpx.AsyncClient(
+            mounts=mounts,
+            limits=limits,
+            timeout=LLM_TIMEOUT,
+            verify=True,
+        )
+    return httpx.AsyncClient(trust_env=True, limits=limits, timeout=LLM_TIMEOUT, verify=True)
+
+
+# 连接池、端点路由器、回答缓存和客户端都在第一次使用时创建，导入本模块不会建立任何连接
+_shared = {}
+_shared_lock = threading.RLock()
+
+
+def _get_shared(name: str, factory):
+    """取出共享对象，不存在时用 factory 创建（线程安全，只创建一次）"""
+    value = _shared.get(name)
+    if value is None:
+        with _shared_lock:
+            value = _shared.get(name)
+            if value is None:
+                value = _shared[name] = factory()
+    return value
 
 
 class SmartOpenAIClient:
-    """智能 OpenAI 客户端，支持自动切换 API 端点"""
+    """智能 OpenAI 客户端，按端点健康状况（延迟、错误率、熔断）自动选择 API 端点"""
     
-    def __init__(self, initial_url: str):
-        self._current_url = initial_url
+    def __init__(self, initial_url: str, router: EndpointRouter = None, cache: CompletionCache = None):
+        self._init_common(initial_url, router, cache)
+        self._http_client = _get_shared("http_client", _create_http_client)
+        self._clients = {}
+
+    def _init_common(self, initial_url: str, router: EndpointRouter, cache: CompletionCache) -> None:
+        """同步和异步客户端共用的部分：API 密钥、端点路由器和回答缓存（不创建连接池）"""
+        _check_api_key()
         self._api_key = DEEPSEEK_API_KEY
-        self._http_client = _http_client
-        self._client = self._create_client(initial_url)
+        self._router = router or _create_router(initial_url)
+        self._cache = cache or CompletionCache()
+        self._clients_lock = threading.Lock()
     
     def _create_client(self, base_url: str) -> OpenAI:
         """创建 OpenAI 客户端"""
@@ -59,14 +161,42 @@ class SmartOpenAIClient:
             api_key=self._api_key,
             base_url=base_url,
             http_client=self._http_client,
+            max_retries=0,  # 重试（退避、切换端点）由 SmartCompletions 统一处理
         )
+
+    def _client_map(self) -> dict:
+        """端点 url -> 客户端"""
+        return self._clients
+
+    def _client_for(self, url: str):
+        """获取（必要时创建）某个端点的客户端，各端点共享同一个 HTTP 连接池"""
+        clients = self._client_map()
+        client_obj = clients.get(url)
+        if client_obj is None:
+            with self._clients_lock:
+                client_obj = clients.get(url)
+                if client_obj is None:
+                    client_obj = clients[url] = self._create_client(url)
+        return client_obj
+
+    @property
+    def _client(self):
+        """当前端点的客户端"""
+        return self._client_for(self._router.current)
+
+    @property
+    def _current_url(self) -> str:
+        return self._router.current
     
     def _switch_to_alternative(self):
         """切换到备用 URL"""
-        alternative_url = get_alternative_url(self._current_url)
-        print(f"⚠️  连接 {self._current_url} 失败，正在尝试切换到 {alternative_url}...")
-        self._current_url = alternative_url
-        self._client = self._create_client(self._current_url)
+        self._failover_from(self._router.current)
+
+    def _failover_from(self, failed_url: str):
+        """某个端点连接失败后，切换到最健康的备用端点（线程安全）"""
+        alternative_url = self._router.alternative(failed_url)
+        print(f"⚠️  连接 {failed_url} 失败，正在尝试切换到 {alternative_url}...")
+        self._router.switch_to(alternative_url)
         print(f"✅ 已切换到 {alternative_url}")
     
     @property
@@ -77,7 +207,11 @@ class SmartOpenAIClient:
     @property
     def base_url(self):
         """返回当前使用的 base_url"""
-        return self._current_url
+        return self._router.current
+
+    def endpoint_health(self) -> dict:
+        """返回各端点的健康状况（EWMA 延迟、错误率、熔断状态）"""
+        return self._router.snapshot()
 
 
 class SmartChatCompletions:
@@ -98,27 +232,435 @@ class SmartCompletions:
         self._smart_client = smart_client
     
     def create(self, *args, **kwargs):
-        """创建 completion，失败时自动切换端点"""
-        max_retries = 1  # 最多重试一次（切换端点）
-        last_error = None
+        """
+        创建 completion：连接错误时切换端点重试，限流和服务端错误退避后重试（最多 LLM_MAX_RETRIES 次），
+        开启 LLM_HEDGE 时超过 p95 仍未返回会向备用端点发出对冲请求。
+        """
+        if kwargs.get("stream"):
+            return self._create_stream(*args, **kwargs)
+
+        with tracing.span("llm.call", model=kwargs.get("model"), tools=bool(kwargs.get("tools"))) as trace:
+            # 完全相同的请求直接返回缓存的回答（LLM_CACHE 开启时）
+            cache = self._smart_client._cache
+            cache_key = cache.key_for(args, kwargs)
+            if cache_key is not None:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    trace.set(cached=True)
+                    return cached
+
+            response = self._create_with_retries(*args, **kwargs)
+            tracing.record_usage(response.usage)
+            if cache_key is not None:
+                cache.set(cache_key, response)
+            return response
+
+    def _create_with_retries(self, *args, **kwargs):
+        smart_client = self._smart_client
+        router = smart_client._router
+        tried = []
         
-        for attempt in range(max_retries + 1):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            url = router.choose(exclude=tried)
             try:
-                return self._smart_client._client.chat.completions.create(*args, **kwargs)
-            except (APIConnectionError, httpx.ConnectError, httpx.TimeoutException) as e:
-                last_error = e
-                if attempt < max_retries:
-                    self._smart_client._switch_to_alternative()
-                else:
+                return self._hedged_attempt(url, args, kwargs)
+            except _FAILOVER_ERRORS:
+                if attempt >= LLM_MAX_RETRIES:
                     raise
-            except Exception as e:
-                # 其他错误直接抛出，不切换端点
-                raise
-        
-        if last_error:
-            raise last_error
+                tried.append(url)
+                smart_client._failover_from(url)
+            except APIStatusError as e:
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable_status(e.status_code):
+                    raise
+            time.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX))
+
+    def _hedged_attempt(self, url: str, args, kwargs):
+        router = self._smart_client._router
+        alternative_url = router.alternative(url)
+        delay = hedge_delay(router.latency(url), HEDGE_PERCENTILE) if LLM_HEDGE else None
+        if delay is None or alternative_url == url or not router.available(alternative_url):
+            return self._attempt(url, args, kwargs)
+        return hedged_call(
+            lambda: self._attempt(url, args, kwargs),
+            lambda: self._hedge(alternative_url, args, kwargs),
+            delay,
+        )
+
+    def _hedge(self, url: str, args, kwargs):
+        """对冲请求：发送前通过路由器占用备用端点的名额，端点已不可用时放弃对冲（继续等主请求）"""
+        if not self._smart_client._router.claim(url):
+            raise _HedgeSkipped(url)
+        return self._attempt(url, args, kwargs)
+
+    def _attempt(self, url: str, args, kwargs):
+        """向指定端点发送一次请求，并记录延迟和成败"""
+        router = self._smart_client._router
+        start = time.monotonic()
+        succeeded = False
+        try:
+            response = self._smart_client._client_for(url).chat.completions.create(
+                *args, **_with_timeout(router, url, kwargs)
+            )
+            succeeded = True
+        except _FAILOVER_ERRORS:
+            router.record_failure(url)
+            raise
+        except APIStatusError as e:
+            if e.status_code >= 500:
+                router.record_failure(url)
+            raise
+        finally:
+            if not succeeded:
+                # 429/400、其他异常和被取消的对冲请求不计入成败，但要让出半开状态的探测名额
+                router.release(url)
+        latency = time.monotonic() - start
+        router.record_success(url, latency)
+        router.latency(url).observe(latency)
+        return response
+
+    def _create_stream(self, *args, **kwargs):
+        """
+        流式 completion：在收到第一个 chunk 之前出错时按同样的规则重试，
+        一旦开始输出就不再切换（已输出的内容无法撤回）。端点延迟按首个 chunk 的到达时间记录。
+        """
+        trace = tracing.span("llm.stream", model=kwargs.get("model"))
+        start = time.perf_counter()
+        try:
+            stream, first_chunk, iterator = self._open_stream(*args, **kwargs)
+        except BaseException as e:
+            trace.end(type(e).__name__)
+            raise
+        trace.set(ttft_ms=round((time.perf_counter() - start) * 1000, 3))
+        return _resume_stream(stream, first_chunk, iterator, trace)
+
+    def _open_stream(self, *args, **kwargs):
+        """打开流并读取第一个 chunk，返回 (stream, 第一个 chunk, 迭代器)"""
+        smart_client = self._smart_client
+        router = smart_client._router
+        tried = []
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            url = router.choose(exclude=tried)
+            start = time.monotonic()
+            stream = None
+            opened = False
+            try:
+                stream = smart_client._client_for(url).chat.completions.create(
+                    *args, **_with_timeout(router, url, kwargs)
+                )
+                iterator = iter(stream)
+                first_chunk = next(iterator, None)
+            except _FAILOVER_ERRORS:
+                router.record_failure(url)
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                tried.append(url)
+                smart_client._failover_from(url)
+            except APIStatusError as e:
+                if e.status_code >= 500:
+                    router.record_failure(url)
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable_status(e.status_code):
+                    raise
+            else:
+                opened = True
+                router.record_success(url, time.monotonic() - start)
+                return stream, first_chunk, iterator
+            finally:
+                if not opened:
+                    # 与 _attempt 相同：没有记录成功时让出探测名额，并关闭已经打开的连接
+                    router.release(url)
+                    if stream is not None:
+                        stream.close()
+            time.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX))
+
+
+def _resume_stream(stream, first_chunk, iterator, trace):
+    """把已经读取的第一个 chunk 放回流的开头，结束或中断时关闭连接"""
+    try:
+        if first_chunk is not None:
+            tracing.record_usage(getattr(first_chunk, "usage", None))
+            yield first_chunk
+        for chunk in iterator:
+            tracing.record_usage(getattr(chunk, "usage", None))
+            yield chunk
+    finally:
+        stream.close()
+        trace.end()
+
+
+def iter_stream_text(stream):
+    """从流式 completion 中逐段取出文本内容"""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
+async def aiter_stream_text(stream):
+    """iter_stream_text 的异步版本"""
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
+class AsyncSmartOpenAIClient(SmartOpenAIClient):
+    """
+    异步智能客户端，接口与 SmartOpenAIClient 一致。
+    httpx.AsyncClient 的连接绑定在创建它的事件循环上，所以每个事件循环各用一个连接池：
+    同一进程中多次 asyncio.run（测试、批量任务、serverless）不会用到已经关闭的事件循环。
+    """
+
+    def __init__(self, initial_url: str, router: EndpointRouter = None, cache: CompletionCache = None):
+        self._init_common(initial_url, router, cache)
+        # 事件循环 -> (httpx.AsyncClient, {端点 url: AsyncOpenAI})
+        self._loops = {}
+        self._loops_lock = threading.Lock()
+
+    def _loop_state(self) -> tuple:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            with self._loops_lock:
+                state = self._loops.get(loop)
+                if state is None:
+                    # 已经关闭的事件循环上的连接不能再用，也无法在新的事件循环中关闭，直接丢弃
+                    for closed in [l for l in self._loops if l.is_closed()]:
+                        del self._loops[closed]
+                    state = self._loops[loop] = (_create_async_http_client(), {})
+        return state
+
+    def _client_map(self) -> dict:
+        return self._loop_state()[1]
+
+    def _create_client(self, base_url: str) -> AsyncOpenAI:
+        """创建 AsyncOpenAI 客户端（使用当前事件循环的连接池）"""
+        return AsyncOpenAI(
+            api_key=self._api_key,
+            base_url=base_url,
+            http_client=self._loop_state()[0],
+            max_retries=0,
+        )
+
+    @property
+    def chat(self):
+        """返回 chat 对象，支持自动切换"""
+        return AsyncSmartChatCompletions(self)
+
+
+class AsyncSmartChatCompletions:
+    """异步 Chat Completions，支持自动切换端点"""
+
+    def __init__(self, smart_client: AsyncSmartOpenAIClient):
+        self._smart_client = smart_client
+
+    @property
+    def completions(self):
+        return AsyncSmartCompletions(self._smart_client)
+
+
+class AsyncSmartCompletions:
+    """异步 Completions，失败切换逻辑与 SmartCompletions 相同"""
+
+    def __init__(self, smart_client: AsyncSmartOpenAIClient):
+        self._smart_client = smart_client
+
+    async def create(self, *args, **kwargs):
+        """创建 completion，重试、退避和对冲规则与同步版本一致"""
+        if kwargs.get("stream"):
+            return await self._create_stream(*args, **kwargs)
+
+        with tracing.span("llm.call", model=kwargs.get("model"), tools=bool(kwargs.get("tools"))) as trace:
+            cache = self._smart_client._cache
+            cache_key = cache.key_for(args, kwargs)
+            if cache_key is not None:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    trace.set(cached=True)
+                    return cached
+
+            response = await self._create_with_retries(*args, **kwargs)
+            tracing.record_usage(response.usage)
+            if cache_key is not None:
+                cache.set(cache_key, response)
+            return response
+
+    async def _create_with_retries(self, *args, **kwargs):
+        smart_client = self._smart_client
+        router = smart_client._router
+        tried = []
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            url = router.choose(exclude=tried)
+            try:
+                return await self._hedged_attempt(url, args, kwargs)
+            except _FAILOVER_ERRORS:
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                tried.append(url)
+                smart_client._failover_from(url)
+            except APIStatusError as e:
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable_status(e.status_code):
+                    raise
+            await asyncio.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX))
+
+    async def _hedged_attempt(self, url: str, args, kwargs):
+        router = self._smart_client._router
+        alternative_url = router.alternative(url)
+        delay = hedge_delay(router.latency(url), HEDGE_PERCENTILE) if LLM_HEDGE else None
+        if delay is None or alternative_url == url or not router.available(alternative_url):
+            return await self._attempt(url, args, kwargs)
+        return await ahedged_call(
+            lambda: self._attempt(url, args, kwargs),
+            lambda: self._hedge(alternative_url, args, kwargs),
+            delay,
+        )
+
+    async def _hedge(self, url: str, args, kwargs):
+        """对冲请求：发送前通过路由器占用备用端点的名额，端点已不可用时放弃对冲（继续等主请求）"""
+        if not self._smart_client._router.claim(url):
+            raise _HedgeSkipped(url)
+        return await self._attempt(url, args, kwargs)
+
+    async def _attempt(self, url: str, args, kwargs):
+        router = self._smart_client._router
+        start = time.monotonic()
+        succeeded = False
+        try:
+            response = await self._smart_client._client_for(url).chat.completions.create(
+                *args, **_with_timeout(router, url, kwargs)
+            )
+            succeeded = True
+        except _FAILOVER_ERRORS:
+            router.record_failure(url)
+            raise
+        except APIStatusError as e:
+            if e.status_code >= 500:
+                router.record_failure(url)
+            raise
+        finally:
+            if not succeeded:
+                # 429/400、其他异常和被取消的对冲请求不计入成败，但要让出半开状态的探测名额
+                router.release(url)
+        latency = time.monotonic() - start
+        router.record_success(url, latency)
+        router.latency(url).observe(latency)
+        return response
+
+    async def _create_stream(self, *args, **kwargs):
+        """流式 completion，首个 chunk 之前出错时重试"""
+        trace = tracing.span("llm.stream", model=kwargs.get("model"))
+        start = time.perf_counter()
+        try:
+            stream, first_chunk, iterator = await self._open_stream(*args, **kwargs)
+        except BaseException as e:
+            trace.end(type(e).__name__)
+            raise
+        trace.set(ttft_ms=round((time.perf_counter() - start) * 1000, 3))
+        return _aresume_stream(stream, first_chunk, iterator, trace)
+
+    async def _open_stream(self, *args, **kwargs):
+        smart_client = self._smart_client
+        router = smart_client._router
+        tried = []
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            url = router.choose(exclude=tried)
+            start = time.monotonic()
+            stream = None
+            opened = False
+            try:
+                stream = await smart_client._client_for(url).chat.completions.create(
+                    *args, **_with_timeout(router, url, kwargs)
+                )
+                iterator = stream.__aiter__()
+                try:
+                    first_chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first_chunk = None
+            except _FAILOVER_ERRORS:
+                router.record_failure(url)
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                tried.append(url)
+                smart_client._failover_from(url)
+            except APIStatusError as e:
+                if e.status_code >= 500:
+                    router.record_failure(url)
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable_status(e.status_code):
+                    raise
+            else:
+                opened = True
+                router.record_success(url, time.monotonic() - start)
+                return stream, first_chunk, iterator
+            finally:
+                if not opened:
+                    # 与 _attempt 相同：没有记录成功时让出探测名额，并关闭已经打开的连接
+                    router.release(url)
+                    if stream is not None:
+                        await stream.close()
+            await asyncio.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX))
+
+
+async def _aresume_stream(stream, first_chunk, iterator, trace):
+    """_resume_stream 的异步版本"""
+    try:
+        if first_chunk is not None:
+            tracing.record_usage(getattr(first_chunk, "usage", None))
+            yield first_chunk
+        async for chunk in iterator:
+            tracing.record_usage(getattr(chunk, "usage", None))
+            yield chunk
+    finally:
+        await stream.close()
+        trace.end()
+
+
+def _get_router() -> EndpointRouter:
+    return _get_shared("router", lambda: _create_router(DEEPSEEK_BASE_URL, DEEPSEEK_FALLBACK_URL))
+
+
+def _get_completion_cache() -> CompletionCache:
+    return _get_shared(
+        "completion_cache",
+        lambda: CompletionCache(LLM_CACHE, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES),
+    )
+
+
+def get_client() -> SmartOpenAIClient:
+    """智能客户端（同步和异步客户端共享同一份端点健康数据和回答缓存）；没有配置 API 密钥时抛出 ValueError"""
+    return _get_shared(
+        "client",
+        lambda: SmartOpenAIClient(DEEPSEEK_BASE_URL, router=_get_router(), cache=_get_completion_cache()),
+    )
+
+
+def get_async_client() -> "AsyncSmartOpenAIClient":
+    """异步智能客户端；没有配置 API 密钥时抛出 ValueError"""
+    return _get_shared(
+        "async_client",
+        lambda: AsyncSmartOpenAIClient(DEEPSEEK_BASE_URL, router=_get_router(), cache=_get_completion_cache()),
+    )
+
+
+def __getattr__(name: str):
+    # 兼容 from agents.shared.llm_client import client, async_client
+    if name == "client":
+        return get_client()
+    if name == "async_client":
+        return get_async_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+def get_endpoint_stats() -> dict:
+    """返回 LLM 端点的路由和熔断状态"""
+    return _get_router().snapshot()
 
-# 导出智能客户端
-client = SmartOpenAIClient(DEEPSEEK_BASE_URL)
 
+def get_completion_cache_stats() -> dict:
+    """返回 LLM 回答缓存的命中统计"""
+    return _get_completion_cache().stats()
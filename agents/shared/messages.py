@@ -0,0 +1,133 @@
+"""
+请求组装：保证同一个 Agent 的所有请求共享字节完全一致的前缀，命中 DeepSeek 的前缀缓存（KV cache）。
+
+前缀顺序固定为 system 提示 → 工具定义 → 稳定的历史，每轮新增的内容只追加在末尾：
+- 同一个 Agent 的每次请求都带同一份工具定义；只需要模型回答时用 tool_choice="none"，而不是去掉工具
+- 自己构造的工具参数和工具结果用 canonical_json 序列化（键排序、无多余空白）
+- 每次请求的 usage 中的 prompt_cache_hit_tokens / prompt_cache_miss_tokens 按 Agent 累计
+
+LLM 客户端（以及 openai、httpx）在第一次发请求时才导入和创建，导入 Agent 模块本身很快。
+"""
+
+import json
+
+from agents.shared.completion_cache import is_replayed
+from agents.shared.metrics import Counters
+
+DEFAULT_MODEL = "deepseek-chat"
+
+_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens", "prompt_cache_miss_tokens")
+
+_usage = Counters()
+
+
+def canonical_json(obj) -> str:
+    """稳定的 JSON 序列化：相同内容总是得到相同的字节"""
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def tool_call(call_id: str, name: str, arguments: dict) -> dict:
+    """构造 assistant 消息中的一个工具调用"""
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": canonical_json(arguments)},
+    }
+
+
+def tool_result(call_id: str, content) -> dict:
+    """构造工具结果消息，非字符串结果用 canonical_json 序列化"""
+    if not isinstance(content, str):
+        content = canonical_json(content)
+    return {"role": "tool", "tool_call_id": call_id, "content": content}
+
+
+def _usage_value(usage, field: str) -> int:
+    value = getattr(usage, field, None)
+    if value is None and getattr(usage, "model_extra", None):
+        value = usage.model_extra.get(field)
+    return value or 0
+
+
+class AgentPrompt:
+    """某个 Agent 的请求组装器，所有 LLM 请求都经过这里发出"""
+
+    def __init__(self, agent: str, system_prompt: str, tools: list = None, model: str = DEFAULT_MODEL):
+        self.agent = agent
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.tools = tools
+        self.model = model
+
+    def messages(self, *parts) -> list:
+        """system 提示在最前，之后依次拼接各部分消息（稳定的历史在前，本轮新增的在后）"""
+        messages = [self.system_message]
+        for part in parts:
+            messages.extend(part)
+        return messages
+
+    def request(self, messages: list, tool_choice: str = "none", **extra) -> dict:
+        kwargs = {"model": self.model, "messages": messages}
+        if self.tools:
+            kwargs["tools"] = self.tools
+            kwargs["tool_choice"] = tool_choice
+        kwargs.update(extra)
+        return kwargs
+
+    def create(self, messages: list, tool_choice: str = "none"):
+        """同步请求；tool_choice="auto" 让模型决定是否调用工具，"none" 只要回答"""
+        from agents.shared.llm_client import get_client
+
+        response = get_client().chat.completions.create(**self.request(messages, tool_choice))
+        self._record_response(response)
+        return response
+
+    async def acreate(self, messages: list, tool_choice: str = "none"):
+        from agents.shared.llm_client import get_async_client
+
+        response = await get_async_client().chat.completions.create(**self.request(messages, tool_choice))
+        self._record_response(response)
+        return response
+
+    def _record_response(self, response) -> None:
+        """缓存重放的回答没有真正请求模型，不计入前缀缓存统计"""
+        if not is_replayed(response):
+            self.record_usage(response.usage)
+
+    def stream(self, messages: list):
+        """流式请求最终回答，逐个返回 chunk（最后一个 chunk 带 usage）"""
+        from agents.shared.llm_client import get_client
+
+        stream = get_client().chat.completions.create(
+            **self.request(messages, "none", stream=True, stream_options={"include_usage": True})
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                self.record_usage(chunk.usage)
+            yield chunk
+
+    def stream_text(self, messages: list):
+        """流式请求最终回答，逐段返回文本"""
+        from agents.shared.llm_client import iter_stream_text
+
+        return iter_stream_text(self.stream(messages))
+
+    def record_usage(self, usage) -> None:
+        if usage is None:
+            return
+        _usage.incr(f"{self.agent}:requests")
+        for field in _USAGE_FIELDS:
+            value = _usage_value(usage, field)
+            if value:
+                _usage.incr(f"{self.agent}:{field}", value)
+
+
+def get_prompt_cache_stats() -> dict:
+    """按 Agent 返回 token 用量和前缀缓存命中率（来自 usage 的 prompt_cache_hit/miss_tokens）"""
+    counts = _usage.snapshot()
+    stats = {}
+    for agent in sorted({key.split(":", 1)[0] for key in counts}):
+        values = {field: counts.get(f"{agent}:{field}", 0) for field in ("requests",) + _USAGE_FIELDS}
+        cached = values["prompt_cache_hit_tokens"] + values["prompt_cache_miss_tokens"]
+        values["prompt_cache_hit_rate"] = round(values["prompt_cache_hit_tokens"] / cached, 4) if cached else 0.0
+        stats[agent] = values
+    return stats
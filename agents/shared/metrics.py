@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+
+# 默认延迟分桶上界（秒），覆盖从本地缓存命中到 LLM 多轮调用的范围
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+
+class LatencyHistogram:
+    """线程安全的延迟直方图（固定分桶），可估算分位数"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个桶是 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+            self._count += 1
+
+    def percentile(self, q: float) -> float:
+        """按分桶估算分位数（q 取 0~100），返回所在桶的上界"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if total == 0:
+            return 0.0
+        rank = total * q / 100
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            total_sum = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += count
+            cumulative.append([bound, running])
+        return {
+            "count": total,
+            "sum": round(total_sum, 6),
+            "mean": round(total_sum / total, 6) if total else 0.0,
+            "p50": _finite(self.percentile(50)),
+            "p95": _finite(self.percentile(95)),
+            "p99": _finite(self.percentile(99)),
+            "buckets": cumulative,
+        }
+
+
+def _finite(value: float):
+    """JSON 不支持 Infinity，落在 +Inf 桶的分位数用 None 表示"""
+    return None if value == float("inf") else value
+
+
+class Counters:
+    """线程安全的命名计数器"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
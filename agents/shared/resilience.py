@@ -0,0 +1,121 @@
+import asyncio
+import random
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from agents.shared.tracing import propagate
+from config.settings import HEDGE_MAX_WORKERS
+
+
+class LatencyTracker:
+    """最近 window 次请求的延迟（秒），用来估计 p95/p99（线程安全）"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    @property
+    def ready(self) -> bool:
+        """样本数是否足够估计尾延迟"""
+        return len(self._samples) >= self.min_samples
+
+    def percentile(self, q: float):
+        """第 q 百分位的延迟，没有样本时返回 None"""
+        with self._lock:
+            values = sorted(self._samples)
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))
+        return values[index]
+
+    def snapshot(self) -> dict:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "samples": len(self._samples),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+
+
+def adaptive_timeout(tracker: LatencyTracker, default: float, minimum: float,
+                     multiplier: float = 3.0) -> float:
+    """
+    按观测到的 p99 延迟计算超时：multiplier * p99，限制在 [minimum, default] 之间。
+    样本不足时使用 default。
+    """
+    if not tracker.ready:
+        return default
+    return min(default, max(minimum, multiplier * tracker.percentile(99)))
+
+
+def hedge_delay(tracker: LatencyTracker, percentile: float = 95):
+    """请求超过该延迟（默认 p95）仍未返回时发出对冲请求；样本不足时返回 None（不对冲）"""
+    if not tracker.ready:
+        return None
+    return tracker.percentile(percentile)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """带抖动的指数退避（full jitter）：在 [0, min(cap, base * 2^attempt)] 内均匀取值"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# 对冲请求使用的线程池（调用方线程阻塞等待，主请求和对冲请求都在这里执行）
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+
+
+def hedged_call(primary, secondary, delay: float):
+    """
+    先执行 primary；delay 秒内没有完成时再并发执行 secondary，返回先成功的结果。
+    primary 在 delay 之前就失败时直接抛出异常（由调用方决定是否重试）；两个都失败时抛出 primary 的异常。
+    落后的请求无法中断，会在后台执行完，结果被丢弃。
+    """
+    first = _hedge_executor.submit(propagate(primary))
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+
+    second = _hedge_executor.submit(propagate(secondary))
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    return first.result()
+
+
+async def ahedged_call(primary, secondary, delay: float):
+    """hedged_call 的异步版本，primary / secondary 是返回协程的函数；落后的请求会被取消"""
+    first = asyncio.ensure_future(primary())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(secondary())
+        tasks.append(second)
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return first.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
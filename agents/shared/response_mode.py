@@ -0,0 +1,50 @@
+from agents.shared.metrics import Counters
+from config.settings import RESPONSE_MODE
+
+TEMPLATE = "template"
+LLM = "llm"
+TEMPLATE_THEN_LLM = "template-then-llm-if-complex"
+RESPONSE_MODES = (TEMPLATE, LLM, TEMPLATE_THEN_LLM)
+
+if RESPONSE_MODE not in RESPONSE_MODES:
+    raise ValueError(
+        f"RESPONSE_MODE={RESPONSE_MODE} 无效，可选值：{' / '.join(RESPONSE_MODES)}"
+    )
+
+# 按 Agent 统计：模板回复次数、因此省掉的 LLM 调用次数
+_counters = Counters()
+
+
+def use_template(is_complex: bool = False) -> bool:
+    """当前模式下这次回复是否用本地模板渲染"""
+    if RESPONSE_MODE == TEMPLATE:
+        return True
+    if RESPONSE_MODE == TEMPLATE_THEN_LLM:
+        return not is_complex
+    return False
+
+
+def contains_any(text: str, keywords) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+
+def record_template_reply(agent: str, llm_calls_avoided: int = 1) -> None:
+    _counters.incr(f"{agent}.template_replies")
+    _counters.incr(f"{agent}.llm_calls_avoided", llm_calls_avoided)
+
+
+def get_response_stats() -> dict:
+    """返回回复模式和各 Agent 省掉的 LLM 调用次数"""
+    counts = _counters.snapshot()
+    agents = sorted({name.split(".", 1)[0] for name in counts})
+    return {
+        "mode": RESPONSE_MODE,
+        "agents": {
+            agent: {
+                "template_replies": counts.get(f"{agent}.template_replies", 0),
+                "llm_calls_avoided": counts.get(f"{agent}.llm_calls_avoided", 0),
+            }
+            for agent in agents
+        },
+        "llm_calls_avoided": sum(v for k, v in counts.items() if k.endswith(".llm_calls_avoided")),
+    }
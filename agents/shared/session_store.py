@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# 每个会话对象本身的估算开销（字节），保证空会话也计入全局内存上限
+_SESSION_OVERHEAD_BYTES = 512
+
+
+def _message_size(message: dict) -> int:
+    """估算一条消息占用的内存（按 JSON 序列化后的字节数）"""
+    return len(json.dumps(message, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class Session:
+    """单个用户会话：对话历史及其内存占用"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.history = []
+        self.size_bytes = _SESSION_OVERHEAD_BYTES
+        self.last_access = time.monotonic()
+        # 各 Agent 自己的会话状态（如理财 Agent 的用户画像）
+        self.data = {}
+        # 同一会话的多轮请求需要串行执行：同步路径用 lock，异步路径用 async_lock
+        self.lock = threading.RLock()
+        self.async_lock = asyncio.Lock()
+
+
+class SessionStore:
+    """
+    按 session id 隔离的会话存储。
+
+    - max_messages：单个会话最多保留的消息数，超出后丢弃最早的消息
+    - idle_ttl：会话空闲超过该时间（秒）后被清理
+    - max_total_bytes：所有会话的内存上限，超出后按最近最少使用淘汰整个会话
+    """
+
+    def __init__(self, max_messages: int = 50, idle_ttl: float = 1800.0,
+                 max_total_bytes: int = 64 * 1024 * 1024):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_total_bytes = max_total_bytes
+        self._sessions = OrderedDict()  # session_id -> Session，按最近访问排序
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> Session:
+        """获取会话，不存在时新建"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= min(self.idle_ttl, 60.0):
+                self._sweep_locked(now)
+
+            session = self._sessions.get(session_id)
+            if session is not None and now - session.last_access > self.idle_ttl:
+                self._remove_locked(session_id)
+                self.expired += 1
+                session = None
+
+            if session is None:
+                session = Session(session_id)
+                self._sessions[session_id] = session
+                self._total_bytes += session.size_bytes
+                self._enforce_ceiling_locked(keep=session_id)
+
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def append(self, session: Session, message: dict) -> None:
+        """向会话追加一条消息，并维护单会话上限和全局内存上限"""
+        size = _message_size(message)
+        with self._lock:
+            session.history.append(message)
+            session.size_bytes += size
+            if session.session_id in self._sessions:
+                self._total_bytes += size
+
+            if len(session.history) > self.max_messages:
+                self._trim_locked(session)
+
+            self._enforce_ceiling_locked(keep=session.session_id)
+
+    def drop(self, session_id: str) -> None:
+        """删除一个会话"""
+        with self._lock:
+            self._remove_locked(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "total_bytes": self._total_bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _trim_locked(self, session: Session) -> None:
+        """丢弃最早的消息，且不让历史以孤立的 tool 结果开头"""
+        history = session.history
+        drop = len(history) - self.max_messages
+        while drop < len(history) and history[drop].get("role") == "tool":
+            drop += 1
+        removed = sum(_message_size(m) for m in history[:drop])
+        del history[:drop]
+        session.size_bytes -= removed
+        if session.session_id in self._sessions:
+            self._total_bytes -= removed
+
+    def _sweep_locked(self, now: float) -> None:
+        """清理所有空闲超时的会话"""
+        self._last_sweep = now
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_access <= self.idle_ttl:
+                # OrderedDict 按访问时间排序，后面的都更新
+                break
+            self._remove_locked(session_id)
+            self.expired += 1
+
+    def _enforce_ceiling_locked(self, keep: str) -> None:
+        """超出全局内存上限时，从最久未访问的会话开始淘汰（当前会话除外）"""
+        while self._total_bytes > self.max_total_bytes and len(self._sessions) > 1:
+            oldest_id = next(iter(self._sessions))
+            if oldest_id == keep:
+                self._sessions.move_to_end(keep)
+                oldest_id = next(iter(self._sessions))
+                if oldest_id == keep:
+                    break
+            self._remove_locked(oldest_id)
+            self.evicted += 1
+
+    def _remove_locked(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size_bytes
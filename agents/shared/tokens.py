@@ -0,0 +1,24 @@
+import json
+
+# DeepSeek 官方给出的换算：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+_CJK_TOKENS = 0.6
+_OTHER_TOKENS = 0.3
+# 每条消息的角色、分隔符等固定开销
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本的 token 数（不调用 tokenizer，误差在一两成以内）"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if ch >= "⺀")
+    return int(cjk * _CJK_TOKENS + (len(text) - cjk) * _OTHER_TOKENS) + 1
+
+
+def message_tokens(message: dict) -> int:
+    """估算一条消息占用的 token 数（包括 tool_calls 的参数）"""
+    tokens = _MESSAGE_OVERHEAD + estimate_tokens(message.get("content") or "")
+    tool_calls = message.get("tool_calls")
+    if tool_calls:
+        tokens += estimate_tokens(json.dumps(tool_calls, ensure_ascii=False))
+    return tokens
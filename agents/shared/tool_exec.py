@@ -0,0 +1,54 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from agents.shared.tracing import propagate
+from config.settings import TOOL_MAX_WORKERS, TOOL_TIMEOUT
+
+# 工具调用使用的线程池（各 Agent 共享）
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+def _run_tool(func, args: dict):
+    return func(**args)
+
+
+def execute_tool_calls(tool_calls, func_map: dict, timeout: float = TOOL_TIMEOUT) -> list:
+    """
+    并发执行一次模型回复中的所有工具调用，按 tool_calls 的原始顺序返回 (tool_call, result, error) 列表。
+
+    - 成功时 result 为工具的返回值，error 为 None
+    - 工具不存在、参数不是合法 JSON、执行出错或超过 timeout 秒时 result 为 None，error 为给模型看的说明；
+      一个工具出错不影响其他工具
+    - 超时的工具无法中断，会在后台执行完，结果被丢弃
+    """
+    outcomes = [None] * len(tool_calls)
+    futures = {}
+    for index, call in enumerate(tool_calls):
+        func_name = call.function.name
+        func = func_map.get(func_name)
+        if func is None:
+            outcomes[index] = (call, None, f"未找到名为 {func_name} 的工具。")
+            continue
+        try:
+            args = json.loads(call.function.arguments or "{}")
+        except ValueError:
+            outcomes[index] = (call, None, f"工具 {func_name} 的参数不是合法的 JSON。")
+            continue
+        futures[_tool_executor.submit(propagate(_run_tool), func, args)] = index
+
+    if futures:
+        wait(futures, timeout=timeout)
+
+    for future, index in futures.items():
+        call = tool_calls[index]
+        func_name = call.function.name
+        if not future.done():
+            future.cancel()
+            outcomes[index] = (call, None, f"工具 {func_name} 执行超时（{timeout:g} 秒）。")
+        elif future.exception() is not None:
+            error = future.exception()
+            print(f"⚠️  工具 {func_name} 执行失败：{error}")
+            outcomes[index] = (call, None, f"工具 {func_name} 执行失败：{error}")
+        else:
+            outcomes[index] = (call, future.result(), None)
+    return outcomes
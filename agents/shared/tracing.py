@@ -0,0 +1,349 @@
+"""
+轻量级追踪：每轮对话一个 turn，轮内记录 LLM 调用、工具执行、天气 HTTP 请求、用户画像提取等 span，
+并累计 response.usage 中的 token 数。
+
+TRACE_EXPORT：
+    off（默认）   完全关闭，span() 返回空操作的单例，开销只有一次函数调用
+    jsonl         每轮结束时向 TRACE_PATH 追加一行 JSON（包含该轮的所有 span 和 token 数）
+    prometheus    进程退出时把汇总指标以 Prometheus 文本格式写入 TRACE_PATH；
+                  HTTP 服务的 /metrics?format=prometheus 可以直接抓取
+
+开启时（jsonl 或 prometheus）都会汇总每类 span 的延迟直方图、错误数和每个 Agent 的 token 数。
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from pathlib import Path
+
+from agents.shared.metrics import Counters, LatencyHistogram
+from config.settings import TRACE_EXPORT, TRACE_PATH
+
+OFF = "off"
+JSONL = "jsonl"
+PROMETHEUS = "prometheus"
+TRACE_EXPORTS = (OFF, JSONL, PROMETHEUS)
+
+if TRACE_EXPORT not in TRACE_EXPORTS:
+    raise ValueError(f"TRACE_EXPORT={TRACE_EXPORT} 无效，可选值：{' / '.join(TRACE_EXPORTS)}")
+
+_enabled = TRACE_EXPORT != OFF
+
+# 当前线程 / 协程所在的 turn
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+# usage 中需要累计的字段
+_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens", "prompt_cache_miss_tokens")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class _NoopSpan:
+    """关闭追踪时使用的空 span"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def end(self, error: str = None) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.turn = _current_turn.get()
+        self.start = time.perf_counter()
+        self._ended = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc_type.__name__ if exc_type else None)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def end(self, error: str = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        duration = time.perf_counter() - self.start
+        _collector.record_span(self.name, duration, error)
+        if self.turn is not None:
+            record = {
+                "name": self.name,
+                "offset_ms": round((self.start - self.turn.start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+            }
+            if self.attrs:
+                record["attrs"] = self.attrs
+            if error:
+                record["error"] = error
+            self.turn.add_span(record)
+
+
+class _Turn:
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self.tokens = dict.fromkeys(_USAGE_FIELDS, 0)
+        self._lock = threading.Lock()  # 工具可能在线程池中并发执行
+
+    def add_span(self, record: dict) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def add_usage(self, values: dict) -> None:
+        with self._lock:
+            for field, value in values.items():
+                self.tokens[field] += value
+
+
+def span(name: str, **attrs):
+    """记录一个 span：with span("llm.call", model=...) as s: ...；关闭追踪时返回空操作的单例"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: str, **attrs):
+    """装饰器：把整个函数调用记录为一个 span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, dict(attrs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_turn(agent: str):
+    """装饰器：把一次 Agent 调用记录为一个 turn，支持普通函数、协程函数和生成器函数"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                turn, token = _begin_turn(agent)
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    _end_turn(turn, token, error)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return (yield from func(*args, **kwargs))
+                turn, token = _begin_turn(agent)
+                error = None
+                try:
+                    return (yield from func(*args, **kwargs))
+                except BaseException as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    _end_turn(turn, token, error)
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            turn, token = _begin_turn(agent)
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                _end_turn(turn, token, error)
+        return wrapper
+    return decorator
+
+
+def _begin_turn(agent: str):
+    turn = _Turn(agent)
+    return turn, _current_turn.set(turn)
+
+
+def _end_turn(turn: _Turn, token, error) -> None:
+    try:
+        _current_turn.reset(token)
+    except ValueError:
+        # 生成器在其他上下文中被关闭时 token 无法复位，直接清空
+        _current_turn.set(None)
+    _collector.record_turn(turn, time.perf_counter() - turn.start, error)
+
+
+def propagate(func):
+    """
+    让提交到线程池的函数继承当前 turn（线程池不会自动复制 contextvars）。
+    关闭追踪时原样返回 func。
+    """
+    if not _enabled:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def record_usage(usage) -> None:
+    """累计一次 LLM 调用的 token 数（response.usage，可以为 None）"""
+    if not _enabled or usage is None:
+        return
+    values = {}
+    for field in _USAGE_FIELDS:
+        value = getattr(usage, field, None)
+        if value is None and getattr(usage, "model_extra", None):
+            value = usage.model_extra.get(field)
+        if value:
+            values[field] = value
+    if not values:
+        return
+    turn = _current_turn.get()
+    agent = turn.agent if turn is not None else "unknown"
+    if turn is not None:
+        turn.add_usage(values)
+    _collector.record_tokens(agent, values)
+
+
+class _Collector:
+    """汇总指标，并按 TRACE_EXPORT 导出"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._span_latency = {}
+        self._turn_latency = {}
+        self.errors = Counters()
+        self.tokens = Counters()
+        self._file = None
+
+    def _histogram(self, table: dict, name: str) -> LatencyHistogram:
+        histogram = table.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record_span(self, name: str, seconds: float, error) -> None:
+        self._histogram(self._span_latency, name).observe(seconds)
+        if error:
+            self.errors.incr(f"span:{name}")
+
+    def record_tokens(self, agent: str, values: dict) -> None:
+        for field, value in values.items():
+            self.tokens.incr(f"{agent}:{field}", value)
+
+    def record_turn(self, turn: _Turn, seconds: float, error) -> None:
+        self._histogram(self._turn_latency, turn.agent).observe(seconds)
+        if error:
+            self.errors.incr(f"turn:{turn.agent}")
+        if TRACE_EXPORT == JSONL:
+            record = {
+                "type": "turn",
+                "agent": turn.agent,
+                "ts": round(turn.started_at, 3),
+                "duration_ms": round(seconds * 1000, 3),
+                "tokens": turn.tokens,
+                "spans": turn.spans,
+            }
+            if error:
+                record["error"] = error
+            self._write_line(json.dumps(record, ensure_ascii=False))
+
+    def _write_line(self, line: str) -> None:
+        with self._lock:
+            if self._file is None:
+                Path(TRACE_PATH).parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(TRACE_PATH, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def snapshot(self) -> dict:
+        return {
+            "turn_latency_seconds": {k: h.snapshot() for k, h in sorted(self._turn_latency.items())},
+            "span_latency_seconds": {k: h.snapshot() for k, h in sorted(self._span_latency.items())},
+            "errors": self.errors.snapshot(),
+            "tokens": self.tokens.snapshot(),
+        }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        _render_histograms(lines, "smart_agent_turn_duration_seconds", "agent", self._turn_latency,
+                           "每轮对话耗时")
+        _render_histograms(lines, "smart_agent_span_duration_seconds", "span", self._span_latency,
+                           "各类 span 耗时")
+
+        lines.append("# HELP smart_agent_errors_total 出错的 turn / span 数")
+        lines.append("# TYPE smart_agent_errors_total counter")
+        for key, value in sorted(self.errors.snapshot().items()):
+            kind, name = key.split(":", 1)
+            lines.append(f'smart_agent_errors_total{{kind="{kind}",name="{name}"}} {value}')
+
+        lines.append("# HELP smart_agent_llm_tokens_total LLM token 数（来自 response.usage）")
+        lines.append("# TYPE smart_agent_llm_tokens_total counter")
+        for key, value in sorted(self.tokens.snapshot().items()):
+            agent, field = key.split(":", 1)
+            lines.append(f'smart_agent_llm_tokens_total{{agent="{agent}",kind="{field}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _render_histograms(lines: list, metric: str, label: str, table: dict, help_text: str) -> None:
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} histogram")
+    for name, histogram in sorted(table.items()):
+        snap = histogram.snapshot()
+        for bound, count in snap["buckets"]:
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {count}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {snap["sum"]}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {snap["count"]}')
+
+
+_collector = _Collector()
+
+
+def get_trace_stats() -> dict:
+    """返回汇总的延迟、错误和 token 指标"""
+    return _collector.snapshot()
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式返回汇总指标"""
+    return _collector.render_prometheus()
+
+
+def _write_prometheus_file() -> None:
+    Path(TRACE_PATH).parent.mkdir(parents=True, exist_ok=True)
+    Path(TRACE_PATH).write_text(render_prometheus(), encoding="utf-8")
+
+
+if TRACE_EXPORT == PROMETHEUS:
+    atexit.register(_write_prometheus_file)
@@ -1,111 +1,220 @@
-import json
+import asyncio
 
-from agents.shared.llm_client import client
+from agents.router import WEATHER, route
+from agents.shared.messages import AgentPrompt, tool_call, tool_result
+from agents.shared.response_mode import contains_any, record_template_reply, use_template
+from agents.shared.tool_exec import execute_tool_calls
+from agents.shared.tracing import trace_turn
+from config.settings import ROUTER_MIN_CONFIDENCE
 from .prompts import SYSTEM_PROMPT
 from .tools import weather_tools
-from .handlers import get_weather
+from .handlers import get_weather, get_weather_batch
+from .gazetteer import has_admin_suffix, resolve_place, is_known_non_place
+from .templates import render_weather_reply
 
 TOOL_FUNC_MAP = {
     "get_weather": get_weather,
+    "get_weather_batch": get_weather_batch,
 }
 
+# 所有请求共享 system 提示和工具定义组成的前缀
+_prompt = AgentPrompt("weather", SYSTEM_PROMPT, weather_tools)
 
+
+# 需要模型综合判断的问题（比较、建议等），模板只能罗列天气数据
+_COMPLEX_KEYWORDS = ("哪个", "哪里", "比较", "对比", "还是", "要不要", "适合", "穿", "建议", "为什么")
+
+
+def _is_complex_turn(user_input: str, tool_names: list) -> bool:
+    """查询了多个城市，或者问题需要模型综合判断"""
+    if len(tool_names) > 1 or "get_weather_batch" in tool_names:
+        return True
+    return contains_any(user_input, _COMPLEX_KEYWORDS)
+
+
+def _template_reply(tool_messages: list) -> str:
+    return render_weather_reply([m["content"] for m in tool_messages])
+
+
+def _is_likely_city(user_input_clean: str) -> bool:
+    """判断输入是否是一个单独的地名"""
+    # 本地索引能直接解析的一定是城市；已确认不是地名的交给模型处理
+    if resolve_place(user_input_clean) is not None:
+        return True
+    if is_known_non_place(user_input_clean):
+        return False
+    # 其他输入（"你好"、"那明天呢"）不再按长度猜测，交给模型判断
+    return has_admin_suffix(user_input_clean)
+
+
+def _direct_tool_call(user_input_clean: str):
+    """
+    本地就能确定要查哪些城市时返回 (工具名, 参数)，不需要模型决定是否调用工具；否则返回 None。
+    城市由意图路由提取（本地索引中的城市、"XX天气怎么样" 句式），
+    没有收录的城市名单独输入时仍按城市名直接查询。
+    """
+    decision = route(user_input_clean)
+    if decision.intent == WEATHER and decision.tool and decision.confidence >= ROUTER_MIN_CONFIDENCE:
+        return decision.tool, decision.arguments
+    if _is_likely_city(user_input_clean):
+        return "get_weather", {"location": user_input_clean}
+    return None
+
+
+def _build_direct_messages(user_input_clean: str, tool_name: str, arguments: dict, result: str) -> list:
+    """构造"直接调用工具"分支的消息：伪造一次工具调用及其结果"""
+    # 只输入了城市名时补全成完整的问题
+    question = user_input_clean
+    if arguments.get("location") == user_input_clean:
+        question = f"查询 {user_input_clean} 的天气"
+    return _prompt.messages([
+        {"role": "user", "content": question},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [tool_call("auto_call", tool_name, arguments)],
+        },
+        tool_result("auto_call", result),
+    ])
+
+
+def _tool_names(message) -> list:
+    return [call.function.name for call in message.tool_calls]
+
+
+def _tool_call_message(message) -> dict:
+    """把模型返回的工具调用请求转换成可追加到 messages 的字典"""
+    return {
+        "role": message.role,
+        "content": message.content or "",
+        "tool_calls": [tc.model_dump() for tc in message.tool_calls],
+    }
+
+
+def _execute_tool_calls(tool_calls) -> list:
+    """并发执行工具调用（多城市同时查询），按原顺序返回对应的 tool 消息列表"""
+    return [
+        tool_result(call.id, result if error is None else error)
+        for call, result, error in execute_tool_calls(tool_calls, TOOL_FUNC_MAP)
+    ]
+
+
+@trace_turn("weather")
 def call_weather_agent(user_input: str) -> str:
     user_input_clean = user_input.strip()
-    
-    # 如果输入看起来像城市名称（短文本，没有问号等），直接调用工具
-    # 这样可以避免模型不调用工具的问题
-    is_likely_city = (
-        len(user_input_clean) < 20 
-        and "?" not in user_input_clean 
-        and "？" not in user_input_clean
-        and "天气" not in user_input_clean  # 如果包含"天气"，让模型处理
-        and "温度" not in user_input_clean
-        and "气温" not in user_input_clean
-    )
-    
-    if is_likely_city:
-        # 直接调用工具，不经过模型判断
-        result = get_weather(user_input_clean)
+
+    # 本地就能确定要查询的城市时直接调用工具，省掉让模型决定是否调用工具的一次请求
+    direct = _direct_tool_call(user_input_clean)
+    if direct is not None:
+        tool_name, arguments = direct
+        result = TOOL_FUNC_MAP[tool_name](**arguments)
+        if use_template(_is_complex_turn(user_input_clean, [tool_name])):
+            record_template_reply("weather")
+            return render_weather_reply([result])
         # 用工具结果让模型生成友好的回答
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"查询 {user_input_clean} 的天气"},
-            {
-                "role": "assistant",
-                "content": None,
-                "tool_calls": [{
-                    "id": "auto_call",
-                    "type": "function",
-                    "function": {
-                        "name": "get_weather",
-                        "arguments": json.dumps({"location": user_input_clean}, ensure_ascii=False)
-                    }
-                }]
-            },
-            {
-                "role": "tool",
-                "tool_call_id": "auto_call",
-                "content": result
-            }
-        ]
-        final_resp = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-        )
+        final_resp = _prompt.create(_build_direct_messages(user_input_clean, tool_name, arguments, result))
         return final_resp.choices[0].message.content or result
-    
+
     # 对于更复杂的查询，让模型决定是否调用工具
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_input},
-    ]
+    messages = _prompt.messages([{"role": "user", "content": user_input}])
 
     # 第一次请求：让模型决定是否调用工具
-    response = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        tools=weather_tools,
-        tool_choice="auto",
-    )
+    response = _prompt.create(messages, tool_choice="auto")
     message = response.choices[0].message
 
     # 没有调用工具，返回模型的回复
     if not getattr(message, "tool_calls", None):
         return message.content or ""
 
-    # 记录工具调用请求
-    messages.append(
-        {
-            "role": message.role,
-            "content": message.content or "",
-            "tool_calls": [tc.model_dump() for tc in message.tool_calls],
-        }
-    )
-
-    # 执行工具
-    for tool_call in message.tool_calls:
-        func_name = tool_call.function.name
-        args = json.loads(tool_call.function.arguments)
-
-        func = TOOL_FUNC_MAP.get(func_name)
-        if func is None:
-            result = f"未找到名为 {func_name} 的工具。"
-        else:
-            result = func(**args)
-
-        messages.append(
-            {
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": result,
-            }
-        )
+    # 记录工具调用请求，并执行工具
+    messages.append(_tool_call_message(message))
+    tool_messages = _execute_tool_calls(message.tool_calls)
+    messages.extend(tool_messages)
+
+    if use_template(_is_complex_turn(user_input, _tool_names(message))):
+        record_template_reply("weather")
+        return _template_reply(tool_messages)
 
     # 第二次请求：基于工具结果生成最终回答
-    final_resp = client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-    )
+    final_resp = _prompt.create(messages)
     return final_resp.choices[0].message.content or ""
 
+
+@trace_turn("weather")
+def stream_weather_agent(user_input: str):
+    """call_weather_agent 的流式版本：逐段返回最终回答的文本"""
+    user_input_clean = user_input.strip()
+
+    direct = _direct_tool_call(user_input_clean)
+    if direct is not None:
+        tool_name, arguments = direct
+        result = TOOL_FUNC_MAP[tool_name](**arguments)
+        if use_template(_is_complex_turn(user_input_clean, [tool_name])):
+            record_template_reply("weather")
+            yield render_weather_reply([result])
+            return
+        messages = _build_direct_messages(user_input_clean, tool_name, arguments, result)
+        fallback = result
+    else:
+        messages = _prompt.messages([{"role": "user", "content": user_input}])
+        # 是否调用工具需要看完整回复，这一步不走流式
+        response = _prompt.create(messages, tool_choice="auto")
+        message = response.choices[0].message
+
+        if not getattr(message, "tool_calls", None):
+            if message.content:
+                yield message.content
+            return
+
+        messages.append(_tool_call_message(message))
+        tool_messages = _execute_tool_calls(message.tool_calls)
+        messages.extend(tool_messages)
+        if use_template(_is_complex_turn(user_input, _tool_names(message))):
+            record_template_reply("weather")
+            yield _template_reply(tool_messages)
+            return
+        fallback = ""
+
+    has_output = False
+    for text in _prompt.stream_text(messages):
+        has_output = True
+        yield text
+
+    # 模型没有输出任何内容时，直接给出工具结果
+    if not has_output and fallback:
+        yield fallback
+
+
+@trace_turn("weather")
+async def acall_weather_agent(user_input: str) -> str:
+    """call_weather_agent 的异步版本，LLM 请求走 async_client，阻塞的天气查询放到线程中执行"""
+    user_input_clean = user_input.strip()
+
+    direct = _direct_tool_call(user_input_clean)
+    if direct is not None:
+        tool_name, arguments = direct
+        result = await asyncio.to_thread(TOOL_FUNC_MAP[tool_name], **arguments)
+        if use_template(_is_complex_turn(user_input_clean, [tool_name])):
+            record_template_reply("weather")
+            return render_weather_reply([result])
+        final_resp = await _prompt.acreate(_build_direct_messages(user_input_clean, tool_name, arguments, result))
+        return final_resp.choices[0].message.content or result
+
+    messages = _prompt.messages([{"role": "user", "content": user_input}])
+
+    response = await _prompt.acreate(messages, tool_choice="auto")
+    message = response.choices[0].message
+
+    if not getattr(message, "tool_calls", None):
+        return message.content or ""
+
+    messages.append(_tool_call_message(message))
+    tool_messages = await asyncio.to_thread(_execute_tool_calls, message.tool_calls)
+    messages.extend(tool_messages)
+
+    if use_template(_is_complex_turn(user_input, _tool_names(message))):
+        record_template_reply("weather")
+        return _template_reply(tool_messages)
+
+    final_resp = await _prompt.acreate(messages)
+    return final_resp.choices[0].message.content or ""
@@ -0,0 +1,449 @@
+"""
+本地行政区划索引：把别名、拼音、英文名（如 "Beijing"）解析成标准城市名，不需要网络请求。
+
+索引是按 key 排序的数组，用 bisect 做精确查找；同时维护一个"已知不是地名"的负缓存，
+避免同一个无效输入反复请求天气 API。
+"""
+
+import re
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional
+
+from agents.shared.cache import TTLCache
+from config.settings import WEATHER_NEGATIVE_CACHE_TTL
+
+# 每行：标准全称 拼音 [别名,别名...]
+# 别名的优先级高于拼音，用来消除拼音重名（如 fuzhou 同时对应福州和抚州）
+_PLACE_TABLE = """
+北京市 beijing Peking,北平,帝都
+天津市 tianjin
+上海市 shanghai 魔都,沪
+重庆市 chongqing 山城,渝
+香港 xianggang Hong Kong,HongKong,HK,香港特别行政区
+澳门 aomen Macau,Macao,澳门特别行政区
+台北市 taibei Taipei
+高雄市 gaoxiong Kaohsiung
+石家庄市 shijiazhuang
+唐山市 tangshan
+秦皇岛市 qinhuangdao
+邯郸市 handan
+邢台市 xingtai
+保定市 baoding
+张家口市 zhangjiakou
+承德市 chengde
+沧州市 cangzhou
+廊坊市 langfang
+衡水市 hengshui
+太原市 taiyuan
+大同市 datong
+阳泉市 yangquan
+长治市 changzhi
+晋城市 jincheng
+朔州市 shuozhou
+晋中市 jinzhong
+运城市 yuncheng
+忻州市 xinzhou
+临汾市 linfen
+吕梁市 lvliang
+呼和浩特市 huhehaote Hohhot
+包头市 baotou
+乌海市 wuhai
+赤峰市 chifeng
+通辽市 tongliao
+鄂尔多斯市 eerduosi Ordos
+呼伦贝尔市 hulunbeier
+沈阳市 shenyang
+大连市 dalian
+鞍山市 anshan
+抚顺市 fushun
+本溪市 benxi
+丹东市 dandong
+锦州市 jinzhou
+营口市 yingkou
+阜新市 fuxin
+辽阳市 liaoyang
+盘锦市 panjin
+铁岭市 tieling
+葫芦岛市 huludao
+长春市 changchun
+吉林市 jilin
+四平市 siping
+辽源市 liaoyuan
+通化市 tonghua
+白山市 baishan
+松原市 songyuan
+白城市 baicheng
+哈尔滨市 haerbin Harbin,冰城
+齐齐哈尔市 qiqihaer
+鸡西市 jixi
+鹤岗市 hegang
+双鸭山市 shuangyashan
+大庆市 daqing
+伊春市 yichun
+佳木斯市 jiamusi
+七台河市 qitaihe
+牡丹江市 mudanjiang
+黑河市 heihe
+绥化市 suihua
+南京市 nanjing 金陵
+无锡市 wuxi
+徐州市 xuzhou
+常州市 changzhou
+苏州市 suzhou Suzhou
+南通市 nantong
+连云港市 lianyungang
+淮安市 huaian
+盐城市 yancheng
+扬州市 yangzhou
+镇江市 zhenjiang
+泰州市 taizhou
+宿迁市 suqian
+杭州市 hangzhou
+宁波市 ningbo
+温州市 wenzhou
+嘉兴市 jiaxing
+湖州市 huzhou
+绍兴市 shaoxing
+金华市 jinhua
+衢州市 quzhou
+舟山市 zhoushan
+台州市 taizhou
+丽水市 lishui
+合肥市 hefei
+芜湖市 wuhu
+蚌埠市 bengbu
+淮南市 huainan
+马鞍山市 maanshan
+淮北市 huaibei
+铜陵市 tongling
+安庆市 anqing
+黄山市 huangshan
+滁州市 chuzhou
+阜阳市 fuyang
+宿州市 suzhou
+六安市 luan
+亳州市 bozhou
+池州市 chizhou
+宣城市 xuancheng
+福州市 fuzhou Fuzhou,榕城
+厦门市 xiamen Amoy,鹭岛
+莆田市 putian
+三明市 sanming
+泉州市 quanzhou
+漳州市 zhangzhou
+南平市 nanping
+龙岩市 longyan
+宁德市 ningde
+南昌市 nanchang
+景德镇市 jingdezhen
+萍乡市 pingxiang
+九江市 jiujiang
+新余市 xinyu
+鹰潭市 yingtan
+赣州市 ganzhou
+吉安市 jian
+宜春市 yichun
+抚州市 fuzhou
+上饶市 shangrao
+济南市 jinan 泉城
+青岛市 qingdao Tsingtao
+淄博市 zibo
+枣庄市 zaozhuang
+东营市 dongying
+烟台市 yantai
+潍坊市 weifang
+济宁市 jining
+泰安市 taian
+威海市 weihai
+日照市 rizhao
+临沂市 linyi
+德州市 dezhou
+聊城市 liaocheng
+滨州市 binzhou
+菏泽市 heze
+郑州市 zhengzhou
+开封市 kaifeng
+洛阳市 luoyang
+平顶山市 pingdingshan
+安阳市 anyang
+鹤壁市 hebi
+新乡市 xinxiang
+焦作市 jiaozuo
+濮阳市 puyang
+许昌市 xuchang
+漯河市 luohe
+三门峡市 sanmenxia
+南阳市 nanyang
+商丘市 shangqiu
+信阳市 xinyang
+周口市 zhoukou
+驻马店市 zhumadian
+武汉市 wuhan 江城
+黄石市 huangshi
+十堰市 shiyan
+宜昌市 yichang
+襄阳市 xiangyang
+鄂州市 ezhou
+荆门市 jingmen
+孝感市 xiaogan
+荆州市 jingzhou
+黄冈市 huanggang
+咸宁市 xianning
+随州市 suizhou
+长沙市 changsha 星城
+株洲市 zhuzhou
+湘潭市 xiangtan
+衡阳市 hengyang
+邵阳市 shaoyang
+岳阳市 yueyang
+常德市 changde
+张家界市 zhangjiajie
+益阳市 yiyang
+郴州市 chenzhou
+永州市 yongzhou
+怀化市 huaihua
+娄底市 loudi
+广州市 guangzhou Canton,羊城
+韶关市 shaoguan
+深圳市 shenzhen 鹏城
+珠海市 zhuhai
+汕头市 shantou
+佛山市 foshan
+江门市 jiangmen
+湛江市 zhanjiang
+茂名市 maoming
+肇庆市 zhaoqing
+惠州市 huizhou
+梅州市 meizhou
+汕尾市 shanwei
+河源市 heyuan
+阳江市 yangjiang
+清远市 qingyuan
+东莞市 dongguan
+中山市 zhongshan
+潮州市 chaozhou
+揭阳市 jieyang
+云浮市 yunfu
+南宁市 nanning
+柳州市 liuzhou
+桂林市 guilin
+梧州市 wuzhou
+北海市 beihai
+钦州市 qinzhou
+玉林市 yulin
+百色市 baise
+河池市 hechi
+海口市 haikou
+三亚市 sanya
+儋州市 danzhou
+成都市 chengdu 蓉城
+自贡市 zigong
+攀枝花市 panzhihua
+泸州市 luzhou
+德阳市 deyang
+绵阳市 mianyang
+广元市 guangyuan
+遂宁市 suining
+内江市 neijiang
+乐山市 leshan
+南充市 nanchong
+眉山市 meishan
+宜宾市 yibin
+广安市 guangan
+达州市 dazhou
+雅安市 yaan
+巴中市 bazhong
+资阳市 ziyang
+贵阳市 guiyang
+六盘水市 liupanshui
+遵义市 zunyi
+安顺市 anshun
+毕节市 bijie
+铜仁市 tongren
+昆明市 kunming 春城
+曲靖市 qujing
+玉溪市 yuxi
+保山市 baoshan
+昭通市 zhaotong
+丽江市 lijiang
+普洱市 puer
+临沧市 lincang
+大理市 dali
+拉萨市 lasa Lhasa
+日喀则市 rikaze Shigatse
+林芝市 linzhi
+西安市 xian Xi'an,长安
+铜川市 tongchuan
+宝鸡市 baoji
+咸阳市 xianyang
+渭南市 weinan
+延安市 yanan
+汉中市 hanzhong
+榆林市 yulin
+安康市 ankang
+商洛市 shangluo
+兰州市 lanzhou
+嘉峪关市 jiayuguan
+金昌市 jinchang
+白银市 baiyin
+天水市 tianshui
+武威市 wuwei
+张掖市 zhangye
+平凉市 pingliang
+酒泉市 jiuquan
+庆阳市 qingyang
+定西市 dingxi
+陇南市 longnan
+西宁市 xining
+海东市 haidong
+银川市 yinchuan
+石嘴山市 shizuishan
+吴忠市 wuzhong
+固原市 guyuan
+中卫市 zhongwei
+乌鲁木齐市 wulumuqi Urumqi
+克拉玛依市 kelamayi Karamay
+吐鲁番市 tulufan Turpan
+哈密市 hami
+喀什市 kashi Kashgar
+伊宁市 yining
+"""
+
+# 查找优先级：中文名 > 别名 > 拼音
+_PRIORITY_NAME = 0
+_PRIORITY_ALIAS = 1
+_PRIORITY_PINYIN = 2
+
+_NORMALIZE_RE = re.compile(r"[\s'’\-·.]+")
+
+
+class Place(NamedTuple):
+    name: str  # 常用简称，如 "保定"
+    full_name: str  # 标准全称，如 "保定市"
+
+
+def normalize_place_key(text: str) -> str:
+    """查找用的 key：去掉空白、撇号、连字符等，并统一大小写"""
+    return _NORMALIZE_RE.sub("", text).casefold()
+
+
+def _short_name(full_name: str) -> str:
+    if full_name.endswith("市") and len(full_name) > 2:
+        return full_name[:-1]
+    return full_name
+
+
+def _build_index():
+    """构建排序数组索引：_keys[i] 对应 _values[i]（Place，拼音重名时为 None）"""
+    best = {}  # key -> (priority, place)
+    for line in _PLACE_TABLE.strip().splitlines():
+        parts = line.split(" ", 2)
+        full_name, pinyin = parts[0], parts[1]
+        aliases = parts[2].split(",") if len(parts) > 2 else []
+        place = Place(_short_name(full_name), full_name)
+
+        candidates = [
+            (full_name, _PRIORITY_NAME),
+            (place.name, _PRIORITY_NAME),
+            (pinyin, _PRIORITY_PINYIN),
+        ] + [(alias, _PRIORITY_ALIAS) for alias in aliases]
+
+        for raw_key, priority in candidates:
+            key = normalize_place_key(raw_key)
+            current = best.get(key)
+            if current is None or priority < current[0]:
+                best[key] = (priority, place)
+            elif priority == current[0] and current[1] != place:
+                # 同优先级对应不同城市（拼音重名），标记为歧义
+                best[key] = (priority, None)
+
+    keys = sorted(best)
+    return keys, [best[k][1] for k in keys]
+
+
+_keys, _values = _build_index()
+
+# 在整句中查找地名：中文名和别名拼成一个预编译的正则（长的在前，"北京市" 优先于 "北京"）。
+# 单字别名（如 "沪"）在句子里太容易误判，只用于整句精确查找
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+_PLACE_MENTION_RE = re.compile("|".join(sorted(
+    (re.escape(key) for key, place in zip(_keys, _values)
+     if place is not None and len(key) >= 2 and _CJK_RE.search(key)),
+    key=len,
+    reverse=True,
+)))
+# 拼音和英文名按单词查找，相邻两个单词优先（"Hong Kong"）
+_LATIN_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'’]*")
+# 本地索引没有收录的地名：带行政区划后缀的短中文（如 "涿州"、"正定县"、"雄安新区"）
+_ADMIN_SUFFIX_RE = re.compile(r"^[\u4e00-\u9fff]{1,8}(?:市|县|区|州|省|镇|乡|旗|盟)$")
+
+# 负缓存：确认不是地名的输入（天气 API 对所有名称变体都明确返回无结果）
+_not_place_cache = TTLCache(maxsize=4096, ttl=WEATHER_NEGATIVE_CACHE_TTL)
+
+
+def resolve_place(text: str) -> Optional[Place]:
+    """把城市名/别名/拼音/英文名解析为 Place，未收录或有歧义时返回 None"""
+    key = normalize_place_key(text)
+    if not key:
+        return None
+    i = bisect_left(_keys, key)
+    if i < len(_keys) and _keys[i] == key:
+        return _values[i]
+    return None
+
+
+def has_admin_suffix(text: str) -> bool:
+    """是否是带行政区划后缀的短中文地名（不查索引，只看形状）"""
+    return _ADMIN_SUFFIX_RE.match(text) is not None
+
+
+def _place_mentions(text: str):
+    """逐个返回句子中的地名 (起点, 终点, Place)"""
+    for match in _PLACE_MENTION_RE.finditer(text):
+        yield match.start(), match.end(), resolve_place(match.group())
+
+    words = list(_LATIN_WORD_RE.finditer(text))
+    i = 0
+    while i < len(words):
+        if i + 1 < len(words):
+            start, end = words[i].start(), words[i + 1].end()
+            place = resolve_place(text[start:end])
+            if place is not None:
+                yield start, end, place
+                i += 2
+                continue
+        place = resolve_place(words[i].group())
+        if place is not None:
+            yield words[i].start(), words[i].end(), place
+        i += 1
+
+
+def find_places(text: str) -> List[Place]:
+    """找出句子中提到的所有城市（按出现顺序，去重），如 "北京和上海哪个热" -> [北京, 上海]"""
+    found = {}
+    for start, _, place in _place_mentions(text):
+        found.setdefault(place, start)
+    return sorted(found, key=found.get)
+
+
+def remove_places(text: str) -> str:
+    """去掉句子中的所有地名，如 "北京和上海呢" 变成 "和呢"。"""
+    spans = sorted((start, end) for start, end, _ in _place_mentions(text))
+    parts = []
+    position = 0
+    for start, end in spans:
+        if start >= position:
+            parts.append(text[position:start])
+            position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def mark_not_place(text: str) -> None:
+    """记录一个已确认不是地名的输入"""
+    _not_place_cache.set(normalize_place_key(text), True)
+
+
+def is_known_non_place(text: str) -> bool:
+    """输入是否已被确认不是地名"""
+    return _not_place_cache.get(normalize_place_key(text)) is not None
@@ -1,7 +1,96 @@
-import requests
-from config.settings import WEATHER_API_KEY, WEATHER_API_HOST, WEATHER_API_TYPE
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from agents.shared.cache import TTLCache
+from agents.shared.http_pool import get_pooled_client
+from agents.shared.resilience import LatencyTracker, adaptive_timeout, backoff_delay, hedge_delay, hedged_call
+from agents.shared.tracing import propagate, traced
+from .gazetteer import resolve_place, mark_not_place, is_known_non_place
+from .prefetch import WeatherPrefetcher
+from config.settings import (
+    WEATHER_API_KEY,
+    WEATHER_API_HOST,
+    WEATHER_API_TYPE,
+    WEATHER_CACHE_TTL,
+    WEATHER_CACHE_STALE_TTL,
+    WEATHER_CACHE_MAXSIZE,
+    WEATHER_PROBE_MODE,
+    WEATHER_PROBE_WORKERS,
+    WEATHER_PROBE_RACE_WIDTH,
+    WEATHER_BATCH_WORKERS,
+    WEATHER_BATCH_MAX_LOCATIONS,
+    WEATHER_HTTP_MAX_CONNECTIONS,
+    WEATHER_HTTP_MAX_KEEPALIVE,
+    WEATHER_HTTP_KEEPALIVE_EXPIRY,
+    WEATHER_HTTP2,
+    WEATHER_PREFETCH,
+    WEATHER_PREFETCH_TOP_N,
+    WEATHER_PREFETCH_INTERVAL,
+    WEATHER_PREFETCH_QUOTA,
+    WEATHER_PREFETCH_HALF_LIFE,
+    WEATHER_PREFETCH_MIN_SCORE,
+    TIANAPI_URL,
+    WEATHER_TIMEOUT,
+    WEATHER_TIMEOUT_MIN,
+    WEATHER_MAX_RETRIES,
+    WEATHER_HEDGE,
+    TIMEOUT_P99_MULTIPLIER,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    HEDGE_PERCENTILE,
+)
 
+
+class WeatherLookupError(Exception):
+    """天气查询失败，异常信息就是返回给模型看的提示（失败结果不写入缓存）"""
+
+
+class PlaceNotFoundError(WeatherLookupError):
+    """天气 API 对所有城市名称变体都明确返回无结果（不是网络问题）"""
+
+
+class _TransientLookupError(Exception):
+    """单次请求出现网络错误、HTTP 错误或响应无法解析，结果不能说明城市名是否有效"""
+
+
+# 天气结果缓存：key 为规范化后的城市名，value 为解析后的天气字段
+_weather_cache = TTLCache(
+    maxsize=WEATHER_CACHE_MAXSIZE,
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE_TTL,
+)
+
+# 热门城市预取：记录查询频率，后台线程在缓存过期前刷新最热门的城市（WEATHER_PREFETCH 开启时才记录）
+_prefetcher = WeatherPrefetcher(
+    _weather_cache,
+    top_n=WEATHER_PREFETCH_TOP_N,
+    interval=WEATHER_PREFETCH_INTERVAL,
+    quota_per_hour=WEATHER_PREFETCH_QUOTA,
+    half_life=WEATHER_PREFETCH_HALF_LIFE,
+    min_score=WEATHER_PREFETCH_MIN_SCORE,
+    lead_time=WEATHER_TIMEOUT,
+)
+
+# 记住每个输入最终可用的城市名称变体（如 "保定" -> "保定市"），下次直接用它查询
+_variant_memo = TTLCache(maxsize=1024, ttl=24 * 3600)
+
+# 天行数据 API 的延迟窗口，用于自适应超时和对冲请求
+_tianapi_latency = LatencyTracker()
+
+# get_weather_batch 并发查询多个城市的线程池（与变体探测的线程池分开，避免互相等待）
+_batch_executor = ThreadPoolExecutor(
+    max_workers=WEATHER_BATCH_WORKERS, thread_name_prefix="weather-batch"
+)
+
+# race 模式下并发探测城市名称变体的线程池
+_probe_executor = ThreadPoolExecutor(
+    max_workers=WEATHER_PROBE_WORKERS, thread_name_prefix="weather-probe"
+)
+
+
+@traced("tool", tool="get_weather")
 def get_weather(location: str) -> str:
     """
     调用天气 API，返回一个给模型看的简短字符串。
@@ -9,92 +98,373 @@ def get_weather(location: str) -> str:
     如果没有配置 WEATHER_API_KEY，就直接返回模拟数据。
     """
     if not WEATHER_API_KEY:
-        return f"当前无法访问真实天气服务，这里先假装 {location} 的气温是 26℃，多云。"
+        return _mock_weather(location)
+
+    data, error = _lookup_weather(location.strip())
+    if error is not None:
+        return error
+    return _format_weather(data)
+
+
+@traced("tool", tool="get_weather_batch")
+def get_weather_batch(locations: list) -> str:
+    """
+    一次查询多个城市，返回一张紧凑的表格（每个城市一行）。
+    同一城市的不同写法（"北京"、"北京市"、"Beijing"）只查询一次；各城市并发查询
+    （_lookup_weather 先查缓存，命中时不请求天气 API）。
+    """
+    if isinstance(locations, str):
+        locations = [locations]
+
+    # 按缓存 key 去重，保持用户给出的顺序
+    unique = {}
+    for location in locations:
+        location = str(location).strip()
+        if location:
+            unique.setdefault(_cache_key_for(location), location)
+    names = list(unique.values())[:WEATHER_BATCH_MAX_LOCATIONS]
+    if not names:
+        return "没有提供要查询的城市。"
+
+    if not WEATHER_API_KEY:
+        return _weather_table([(name, None, _mock_weather(name)) for name in names])
+
+    futures = [_batch_executor.submit(propagate(_lookup_weather), name) for name in names]
+    rows = [(name,) + future.result() for name, future in zip(names, futures)]
+    table = _weather_table(rows)
+    skipped = len(unique) - len(names)
+    if skipped:
+        table += f"\n（城市太多，省略了 {skipped} 个）"
+    return table
+
 
-    # 根据配置选择使用天行数据或和风天气
+def _mock_weather(location: str) -> str:
+    return f"当前无法访问真实天气服务，这里先假装 {location} 的气温是 26℃，多云。"
+
+
+def _cache_key_for(location: str) -> str:
+    """天气缓存的 key：本地索引能解析的城市使用标准名"""
+    place = resolve_place(location)
+    return _normalize_location(place.name if place is not None else location)
+
+
+def _lookup_weather(location: str):
+    """查询一个城市（先查缓存），返回 (天气字段, None)，失败时返回 (None, 给模型看的提示)"""
+    # 优先用本地行政区划索引解析（别名、拼音、英文名都归一到同一个城市）
+    place = resolve_place(location)
+    if place is not None:
+        variants = [place.name] if place.name == place.full_name else [place.name, place.full_name]
+        cache_key = _normalize_location(place.name)
+    else:
+        if is_known_non_place(location):
+            return None, _not_found_message(location)
+        variants = None
+        cache_key = _normalize_location(location)
+
+    try:
+        data = _weather_cache.get_or_load(
+            cache_key, lambda: _fetch_weather(location, variants)
+        )
+    except PlaceNotFoundError as e:
+        if place is None:
+            mark_not_place(location)
+        return None, str(e)
+    except WeatherLookupError as e:
+        return None, str(e)
+    if WEATHER_PREFETCH and _weather_cache.enabled:
+        # 只记录查询成功的城市，后台刷新时沿用同样的名称变体
+        _prefetcher.record(cache_key, lambda: _fetch_weather(location, variants))
+    return data, None
+
+
+def _weather_table(rows: list) -> str:
+    """rows 为 (城市, 天气字段, 错误提示)，每个城市一行"""
+    lines = ["城市 | 天气 | 当前气温 | 最低~最高 | 湿度 | 风力 | 空气质量"]
+    for name, data, error in rows:
+        if data is None:
+            lines.append(f"{name} | {error}")
+            continue
+        wind = " ".join(part for part in (data.get("wind", ""), data.get("windsc", "")) if part)
+        quality = data.get("quality", "")
+        if quality and data.get("aqi"):
+            quality += f"（AQI {data['aqi']}）"
+        humidity = data.get("humidity", "N/A")
+        lines.append(" | ".join([
+            data["area"],
+            data.get("weather", "未知"),
+            str(data.get("real", "N/A")),
+            f"{data.get('lowest', 'N/A')}~{data.get('highest', 'N/A')}",
+            f"{humidity}%" if humidity != "N/A" else "N/A",
+            wind or "-",
+            quality or "-",
+        ]))
+    return "\n".join(lines)
+
+
+def get_weather_cache_stats() -> dict:
+    """返回天气缓存的命中统计"""
+    return _weather_cache.stats()
+
+
+def get_weather_prefetch_stats() -> dict:
+    """返回热门城市预取的刷新次数、剩余配额和当前最热门的城市"""
+    stats = _prefetcher.stats()
+    stats["enabled"] = WEATHER_PREFETCH
+    return stats
+
+
+def _normalize_location(location: str) -> str:
+    """缓存 key：去掉多余空白并统一大小写（"Beijing" 与 "beijing" 共用一条缓存）"""
+    return " ".join(location.split()).casefold()
+
+
+def _not_found_message(location: str) -> str:
+    return f"查询 {location} 天气失败，无法找到有效的城市位置。请尝试使用完整的城市名称，如'保定市'。"
+
+
+def _fetch_weather(location: str, variants=None) -> dict:
+    """根据配置选择使用天行数据或和风天气"""
     api_type = WEATHER_API_TYPE.lower() if WEATHER_API_TYPE else "tianapi"
-    
+
     if api_type == "tianapi":
-        return _get_weather_tianapi(location)
+        return _get_weather_tianapi(location, variants)
     else:
         return _get_weather_qweather(location)
 
 
-def _get_weather_tianapi(location: str) -> str:
-    """使用天行数据天气 API"""
-    url = "https://apis.tianapi.com/tianqi/index"
-    
+def _format_weather(data: dict) -> str:
+    """把解析后的天气字段拼成给模型看的字符串"""
+    humidity = data.get("humidity", "N/A")
+    wind = data.get("wind", "")
+    windsc = data.get("windsc", "")
+    quality = data.get("quality", "")
+    aqi = data.get("aqi", "")
+
+    # 构建返回字符串
+    result = (
+        f"{data['area']} 当前气温 {data.get('real', 'N/A')}，天气：{data.get('weather', '未知')}，"
+        f"温度范围 {data.get('lowest', 'N/A')} ~ {data.get('highest', 'N/A')}"
+    )
+    if humidity != "N/A":
+        result += f"，相对湿度 {humidity}%"
+    if wind:
+        result += f"，{wind}"
+        if windsc:
+            result += f" {windsc}"
+    if quality and aqi:
+        result += f"，空气质量：{quality}（AQI: {aqi}）"
+
+    return result
+
+
+def _get_weather_tianapi(location: str, location_variants=None) -> dict:
+    """
+    使用天行数据天气 API，返回解析后的天气字段。
+    location_variants 为空时按 "原名 / 原名市 / 原名县" 猜测城市名称变体。
+    """
+    memo_key = _normalize_location(location)
+
+    # 之前成功过的变体优先直接查询
+    remembered = _variant_memo.get(memo_key)
+    if remembered is not None:
+        try:
+            data = _query_tianapi(remembered, location)
+        except _TransientLookupError:
+            data = None
+        if data is not None:
+            return data
+
     # 尝试多个城市名称变体
-    location_variants = [
-        location,
-        f"{location}市",
-        f"{location}县",
-    ]
-    
+    if not location_variants:
+        location_variants = [
+            location,
+            f"{location}市",
+            f"{location}县",
+        ]
+
+    if WEATHER_PROBE_MODE == "race":
+        data, variant, transient = _probe_variants_race(location_variants, location)
+    else:
+        data, variant, transient = _probe_variants_sequential(location_variants, location)
+
+    if data is None:
+        # 只有所有变体都得到 API 的明确答复时，才能确认输入不是地名
+        error_cls = WeatherLookupError if transient else PlaceNotFoundError
+        raise error_cls(_not_found_message(location))
+
+    _variant_memo.set(memo_key, variant)
+    return data
+
+
+def _probe_variants_sequential(location_variants: list, location: str):
+    """
+    依次尝试每个变体，返回 (天气字段, 命中的变体, 是否出现过临时错误)。
+    都失败时天气字段和变体为 None。
+    """
+    transient = False
     for loc in location_variants:
         try:
-            params = {
-                "key": WEATHER_API_KEY,
-                "city": loc,
-                "type": 1,  # 1=实时天气，7=七天预报
-            }
-            
-            resp = requests.get(url, params=params, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                
-                # 检查 API 返回状态
-                code = data.get("code")
-                if code != 200:
-                    error_msg = data.get("msg", f"API 返回错误码: {code}")
-                    if code == 150:  # API可用次数不足
-                        return f"查询 {location} 天气失败，{error_msg}。请检查 API 调用次数。"
-                    # 尝试下一个城市名称变体
-                    continue
-                
-                # 解析天行数据 API 响应
-                result_data = data.get("result", {})
-                if not result_data:
-                    continue
-                
-                area = result_data.get("area", location)
-                weather = result_data.get("weather", "未知")
-                real = result_data.get("real", "N/A")
-                lowest = result_data.get("lowest", "N/A")
-                highest = result_data.get("highest", "N/A")
-                wind = result_data.get("wind", "")
-                windsc = result_data.get("windsc", "")
-                humidity = result_data.get("humidity", "N/A")
-                quality = result_data.get("quality", "")
-                aqi = result_data.get("aqi", "")
-                
-                # 构建返回字符串
-                result = f"{area} 当前气温 {real}，天气：{weather}，温度范围 {lowest} ~ {highest}"
-                if humidity != "N/A":
-                    result += f"，相对湿度 {humidity}%"
-                if wind:
-                    result += f"，{wind}"
-                    if windsc:
-                        result += f" {windsc}"
-                if quality and aqi:
-                    result += f"，空气质量：{quality}（AQI: {aqi}）"
-                
-                return result
-            else:
-                continue
-                
-        except requests.exceptions.RequestException:
+            data = _query_tianapi(loc, location)
+        except _TransientLookupError:
+            transient = True
             continue
-        except Exception:
-            continue
-    
-    return f"查询 {location} 天气失败，无法找到有效的城市位置。请尝试使用完整的城市名称，如'保定市'。"
+        if data is not None:
+            return data, loc, transient
+    return None, None, transient
+
+
+def _probe_variants_race(location_variants: list, location: str):
+    """
+    并发查询变体（同时最多 WEATHER_PROBE_RACE_WIDTH 个，前面的变体失败后再发出下一个），取第一个有效结果。
+    拿到结果后通知其余探测：还没发出的请求（包括排队中的变体、重试和对冲请求）不再发送；
+    已经发出的 HTTP 请求无法撤回，其结果被忽略，但仍计入天气 API 的调用次数。
+    """
+    cancelled = threading.Event()
+    remaining = deque(location_variants)
+    futures = {}
+
+    def submit_next():
+        loc = remaining.popleft()
+        futures[_probe_executor.submit(propagate(_query_tianapi), loc, location, cancelled)] = loc
+
+    for _ in range(min(max(WEATHER_PROBE_RACE_WIDTH, 1), len(remaining))):
+        submit_next()
+
+    quota_error = None
+    transient = False
+    try:
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                loc = futures.pop(future)
+                try:
+                    data = future.result()
+                except WeatherLookupError as e:
+                    quota_error = e
+                    data = None
+                except _TransientLookupError:
+                    transient = True
+                    data = None
+                if data is not None:
+                    return data, loc, transient
+                if remaining:
+                    submit_next()
+    finally:
+        cancelled.set()
+        for future in futures:
+            future.cancel()
 
+    if quota_error is not None:
+        raise quota_error
+    return None, None, transient
 
-def _get_weather_qweather(location: str) -> str:
+
+def _query_tianapi(loc: str, location: str, cancelled: threading.Event = None):
+    """
+    用某个城市名称变体查询天行数据 API。
+    成功返回解析后的天气字段；该变体无效时返回 None；API 次数不足时抛出 WeatherLookupError；
+    网络或响应格式问题退避重试 WEATHER_MAX_RETRIES 次后仍失败则抛出 _TransientLookupError。
+    cancelled 被设置（race 模式下其他变体已经拿到结果）后不再发出新的请求，直接返回 None。
+    """
+    for attempt in range(WEATHER_MAX_RETRIES + 1):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        try:
+            return _query_tianapi_hedged(loc, location, cancelled)
+        except _TransientLookupError:
+            if attempt >= WEATHER_MAX_RETRIES:
+                raise
+        time.sleep(backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX))
+
+
+def _query_tianapi_hedged(loc: str, location: str, cancelled: threading.Event = None):
+    """开启 WEATHER_HEDGE 时，请求超过 p95 仍未返回就再发一次相同的请求，取先返回的结果"""
+    delay = hedge_delay(_tianapi_latency, HEDGE_PERCENTILE) if WEATHER_HEDGE else None
+    if delay is None:
+        return _query_tianapi_once(loc, location)
+
+    def backup():
+        if cancelled is not None and cancelled.is_set():
+            return None
+        return _query_tianapi_once(loc, location)
+
+    return hedged_call(lambda: _query_tianapi_once(loc, location), backup, delay)
+
+
+def _get_http_client():
+    """
+    天气 API 共用的 httpx 连接池：复用 keep-alive 连接，并发探测和批量查询不必每次重新建立 TCP + TLS 连接。
+    第一次真正请求天气 API 时才创建（没有配置密钥时使用模拟数据，不会用到）。
+    """
+    return get_pooled_client(
+        "weather",
+        max_connections=WEATHER_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=WEATHER_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=WEATHER_HTTP_KEEPALIVE_EXPIRY,
+        http2=WEATHER_HTTP2,
+        timeout=WEATHER_TIMEOUT,
+    )
+
+
+@traced("tianapi.http")
+def _query_tianapi_once(loc: str, location: str):
+    """请求一次天行数据 API，超时按最近的 p99 延迟自适应"""
+    try:
+        params = {
+            "key": WEATHER_API_KEY,
+            "city": loc,
+            "type": 1,  # 1=实时天气，7=七天预报
+        }
+
+        timeout = adaptive_timeout(_tianapi_latency, WEATHER_TIMEOUT, WEATHER_TIMEOUT_MIN, TIMEOUT_P99_MULTIPLIER)
+        start = time.monotonic()
+        resp = _get_http_client().get(TIANAPI_URL, params=params, timeout=timeout)
+        _tianapi_latency.observe(time.monotonic() - start)
+        if resp.status_code != 200:
+            raise _TransientLookupError(f"HTTP {resp.status_code}")
+
+        data = resp.json()
+
+        # 检查 API 返回状态
+        code = data.get("code")
+        if code != 200:
+            error_msg = data.get("msg", f"API 返回错误码: {code}")
+            if code == 150:  # API可用次数不足
+                raise WeatherLookupError(
+                    f"查询 {location} 天气失败，{error_msg}。请检查 API 调用次数。"
+                )
+            # 交给下一个城市名称变体
+            return None
+
+        # 解析天行数据 API 响应
+        result_data = data.get("result", {})
+        if not result_data:
+            return None
+
+        return {
+            "area": result_data.get("area", location),
+            "weather": result_data.get("weather", "未知"),
+            "real": result_data.get("real", "N/A"),
+            "lowest": result_data.get("lowest", "N/A"),
+            "highest": result_data.get("highest", "N/A"),
+            "wind": result_data.get("wind", ""),
+            "windsc": result_data.get("windsc", ""),
+            "humidity": result_data.get("humidity", "N/A"),
+            "quality": result_data.get("quality", ""),
+            "aqi": result_data.get("aqi", ""),
+        }
+
+    except (WeatherLookupError, _TransientLookupError):
+        raise
+    except Exception as e:
+        # 网络错误（httpx.HTTPError）和响应解析错误
+        raise _TransientLookupError(str(e)) from e
+
+
+def _get_weather_qweather(location: str) -> dict:
     """使用和风天气 API（保留原有逻辑）"""
     # 这里保留原来的和风天气代码逻辑
     # 由于代码较长，暂时返回提示信息
-    return f"和风天气 API 功能暂未实现，请使用天行数据 API（设置 WEATHER_API_TYPE=tianapi）"
-
+    raise WeatherLookupError(
+        f"和风天气 API 功能暂未实现，请使用天行数据 API（设置 WEATHER_API_TYPE=tianapi）"
+    )
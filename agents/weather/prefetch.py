@@ -0,0 +1,172 @@
+"""
+热门城市天气预取：按指数衰减的查询次数找出最近最常被问到的城市，
+后台线程在它们的缓存过期之前提前刷新，用户的问题直接命中缓存，关键路径上不再请求天气 API。
+
+刷新次数受每小时配额限制（令牌桶），配额不够时优先刷新最热门的城市；
+没人再问的城市分数会按半衰期衰减到阈值以下，不再占用配额。
+"""
+
+import threading
+import time
+
+from agents.shared.metrics import Counters
+
+
+class DecayingCounter:
+    """每个 key 的查询次数按半衰期指数衰减，只保留分数最高的 maxsize 个 key"""
+
+    def __init__(self, half_life: float, maxsize: int = 1024):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._scores = {}  # key -> (衰减前的分数, 上次更新时间)
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def add(self, key, amount: float = 1.0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._scores.get(key)
+            score = self._decayed(*entry, now) if entry is not None else 0.0
+            self._scores[key] = (score + amount, now)
+            if len(self._scores) > self.maxsize:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        """淘汰分数最低的一半，摊薄排序的开销"""
+        ranked = sorted(self._scores.items(), key=lambda item: self._decayed(*item[1], now), reverse=True)
+        self._scores = dict(ranked[: self.maxsize // 2])
+
+    def top(self, n: int, min_score: float = 0.0) -> list:
+        """返回分数最高的 n 个 [(key, 当前分数)]，从高到低"""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._scores.items())
+        scored = [(key, self._decayed(*entry, now)) for key, entry in items]
+        scored = [(key, score) for key, score in scored if score >= min_score]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:n]
+
+    def __contains__(self, key) -> bool:
+        return key in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class QuotaBucket:
+    """令牌桶：每小时最多 per_hour 次，匀速补充，空闲时最多攒满一小时的配额"""
+
+    def __init__(self, per_hour: float):
+        self.capacity = max(per_hour, 0.0)
+        self.rate = self.capacity / 3600
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self._updated_at
+            return min(self.capacity, self._tokens + elapsed * self.rate)
+
+
+class WeatherPrefetcher:
+    """
+    记录每个城市的查询频率，定期刷新其中最热门、缓存即将过期（或已过期）的 top_n 个城市。
+    loader 在 record 时给出（同一城市用最近一次的 loader），刷新失败时保留缓存中的旧值。
+    """
+
+    def __init__(self, cache, top_n: int, interval: float, quota_per_hour: float,
+                 half_life: float, min_score: float = 1.0, lead_time: float = 0.0):
+        self.cache = cache
+        self.top_n = top_n
+        self.interval = interval
+        self.min_score = min_score
+        # 剩余有效期不超过一个刷新周期（加上一次请求的时间）就提前刷新，保证下一轮之前不会过期
+        self.lead_time = interval + lead_time
+        self._counter = DecayingCounter(half_life, maxsize=max(4 * top_n, 256))
+        self._quota = QuotaBucket(quota_per_hour)
+        self._loaders = {}
+        self._counters = Counters()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, key, loader) -> None:
+        """记录一次查询；第一次调用时启动后台线程"""
+        self._counter.add(key)
+        self._loaders[key] = loader
+        self._counters.incr("recorded")
+        if self._thread is None:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="weather-prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                print(f"⚠️  天气预取失败：{e}")
+
+    def refresh_due(self) -> int:
+        """刷新一轮：热门城市中缓存即将过期的，按热度从高到低在配额内刷新，返回刷新成功的城市数"""
+        refreshed = 0
+        for key, _ in self._counter.top(self.top_n, self.min_score):
+            remaining = self.cache.expires_in(key)
+            if remaining is not None and remaining > self.lead_time:
+                continue
+            loader = self._loaders.get(key)
+            if loader is None:
+                continue
+            if not self._quota.take():
+                # 配额用完：剩下的城市热度更低，本轮不再刷新
+                self._counters.incr("quota_exhausted")
+                break
+            try:
+                value = loader()
+            except Exception:
+                self._counters.incr("refresh_errors")
+                continue
+            self.cache.set(key, value)
+            self._counters.incr("refreshes")
+            refreshed += 1
+        # 已经掉出计数器的城市不再需要 loader
+        for key in list(self._loaders):
+            if key not in self._counter:
+                self._loaders.pop(key, None)
+        return refreshed
+
+    def stats(self) -> dict:
+        counts = {name: 0 for name in ("recorded", "refreshes", "refresh_errors", "quota_exhausted")}
+        counts.update(self._counters.snapshot())
+        counts["tracked"] = len(self._counter)
+        counts["quota_tokens"] = round(self._quota.tokens, 2)
+        counts["running"] = self._thread is not None
+        counts["hot"] = [[key, round(score, 2)] for key, score in self._counter.top(5)]
+        return counts
@@ -0,0 +1,51 @@
+import re
+
+# 天气现象对应的出行提示（按顺序匹配第一个）
+_WEATHER_TIPS = (
+    ("雷", "有雷电天气，尽量减少户外活动。"),
+    ("雪", "有降雪，注意防滑保暖。"),
+    ("雨", "有降雨，出门记得带伞。"),
+    ("霾", "有霾，建议佩戴口罩。"),
+    ("雾", "有雾，出行注意交通安全。"),
+    ("沙", "有沙尘，建议减少外出。"),
+)
+
+_WEATHER_RE = re.compile(r"天气：([^，]+)")
+_TEMPERATURE_RE = re.compile(r"当前气温 (-?\d+(?:\.\d+)?)")
+
+
+def _tip_for(result: str) -> str:
+    """根据 get_weather 的结果文本给出一句出行提示，没有合适的提示时返回空字符串"""
+    weather = _WEATHER_RE.search(result)
+    if weather:
+        for keyword, tip in _WEATHER_TIPS:
+            if keyword in weather.group(1):
+                return tip
+
+    temperature = _TEMPERATURE_RE.search(result)
+    if temperature:
+        value = float(temperature.group(1))
+        if value >= 35:
+            return "天气炎热，注意防暑降温。"
+        if value <= 0:
+            return "气温较低，注意保暖。"
+    return ""
+
+
+def render_weather_reply(results: list) -> str:
+    """把一个或多个 get_weather / get_weather_batch 结果渲染成最终回答（不经过模型）"""
+    lines = []
+    for result in results:
+        result = result.strip()
+        if not result:
+            continue
+        if "\n" in result:
+            # get_weather_batch 的多城市表格原样输出
+            lines.append(result)
+            continue
+        line = result if result.endswith(("。", "！", "？")) else f"{result}。"
+        tip = _tip_for(result)
+        if tip:
+            line += tip
+        lines.append(line)
+    return "\n".join(lines)
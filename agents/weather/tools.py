@@ -16,5 +16,22 @@ weather_tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_weather_batch",
+            "description": "一次查询多个城市的当前天气，返回每个城市一行的表格。用户询问或比较两个及以上城市时使用。",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "locations": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "城市名称列表，例如：['北京', '上海', '广州']。",
+                    }
+                },
+                "required": ["locations"],
+            },
+        },
+    },
 ]
-
@@ -0,0 +1,268 @@
+"""
+批量模式：逐行读取 JSONL 文件中的问题，用多个线程并发调用 Agent，结果逐行写入 JSONL。
+
+输入每行一个 JSON 对象：
+    {"agent": "weather", "input": "北京"}
+    {"agent": "finance", "session": "user-1", "input": "我今年27岁"}
+
+输出每行一个结果，line 为输入文件中的行号（从 0 开始）：
+    {"line": 0, "agent": "weather", "session": null, "input": "北京", "reply": "...", "latency_ms": 812.3}
+    {"line": 5, "agent": "finance", ..., "error": "APIConnectionError: ..."}
+
+输出文件已存在时会跳过其中已完成的行（断点续跑）；同一 session 的理财对话按输入顺序依次执行，
+只完成了一部分的 session 续跑时从第一轮开始重新执行（对话历史只在内存中）。
+续跑前输出文件会按保留的结果重写，每个输入行只有一条结果。
+"""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ORDER_INPUT = "input"
+ORDER_COMPLETION = "completion"
+
+
+def _call_weather(session_id, user_input: str) -> str:
+    from agents.weather.core import call_weather_agent
+
+    return call_weather_agent(user_input)
+
+
+def _call_finance(session_id, user_input: str) -> str:
+    from agents.finance.core import call_finance_agent
+
+    return call_finance_agent(user_input, session_id=session_id)
+
+
+BATCH_AGENTS = {
+    "weather": _call_weather,
+    "finance": _call_finance,
+}
+
+
+def _read_output(output_path: str) -> dict:
+    """
+    读取已有的输出文件，返回 {输入行号: 该行最后一条结果的原始 JSON 行}。
+    进程中途退出时最后一行可能只写了一半，这里把它忽略（续跑时整个文件会重写）。
+    """
+    records = {}
+    if not os.path.exists(output_path):
+        return records
+
+    with open(output_path, "rb") as f:
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    for raw in data[:end].splitlines():
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "line" in record:
+            records[record["line"]] = raw
+    return records
+
+
+def _finance_sessions(input_path: str) -> dict:
+    """预读输入文件，返回 {(agent, session): [行号, ...]}，只包含理财对话"""
+    sessions = {}
+    with open(input_path, encoding="utf-8-sig") as fin:
+        for index, raw in enumerate(fin):
+            if not raw.strip():
+                continue
+            record = _parse_record(index, raw)
+            if record.get("agent") == "finance" and "error" not in record:
+                sessions.setdefault((record["agent"], record["session"]), []).append(index)
+    return sessions
+
+
+def _load_done_lines(input_path: str, output_path: str, retry_errors: bool) -> set:
+    """
+    读取已有的输出文件，返回续跑时可以跳过的输入行号。
+
+    理财对话的历史只在内存中，跳过一个 session 的前几轮会让后面几轮丢失上下文，
+    所以只完成了一部分（或需要重试失败行）的 session 从第一轮开始整个重新执行。
+    输出文件按保留下来的结果重写，每个输入行只有一条结果。
+    """
+    records = _read_output(output_path)
+    if not records:
+        return set()
+
+    done = set()
+    for line, raw in records.items():
+        if retry_errors and "error" in json.loads(raw):
+            continue
+        done.add(line)
+
+    for lines in _finance_sessions(input_path).values():
+        if not done.issuperset(lines):
+            done.difference_update(lines)
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for line in sorted(done):
+            f.write(records[line] + b"\n")
+    os.replace(tmp_path, output_path)
+    return done
+
+
+def _parse_record(index: int, raw: str) -> dict:
+    """解析一行输入，格式错误时返回带 error 的结果"""
+    try:
+        data = json.loads(raw)
+        agent = data["agent"]
+        user_input = data["input"]
+    except (ValueError, KeyError, TypeError):
+        return {"line": index, "error": "输入行需要是包含 agent 和 input 字段的 JSON"}
+    if agent not in BATCH_AGENTS:
+        return {"line": index, "agent": agent, "error": f"未知 agent：{agent}"}
+
+    session_id = data.get("session")
+    if agent == "finance" and not session_id:
+        # 没有指定 session 的理财问题互相独立
+        session_id = f"batch-{index}"
+    return {"line": index, "agent": agent, "session": session_id, "input": user_input}
+
+
+def _run_record(record: dict) -> dict:
+    start = time.perf_counter()
+    result = dict(record)
+    try:
+        result["reply"] = BATCH_AGENTS[record["agent"]](record["session"], record["input"])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+class _OutputWriter:
+    """按 completion 或 input 顺序写出结果，每写一行就 flush，保证可以断点续跑"""
+
+    def __init__(self, f, order: str):
+        self._f = f
+        self._order = order
+        self._expected = deque()  # input 顺序下等待写出的行号
+        self._ready = {}
+
+    def expect(self, index: int) -> None:
+        if self._order == ORDER_INPUT:
+            self._expected.append(index)
+
+    def write(self, result: dict) -> None:
+        if self._order == ORDER_COMPLETION:
+            self._write_line(result)
+            return
+        self._ready[result["line"]] = result
+        while self._expected and self._expected[0] in self._ready:
+            self._write_line(self._ready.pop(self._expected.popleft()))
+
+    @property
+    def buffered(self) -> int:
+        return len(self._ready)
+
+    def _write_line(self, result: dict) -> None:
+        self._f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+
+def run_batch(input_path: str, output_path: str, workers: int = 8,
+              order: str = ORDER_COMPLETION, retry_errors: bool = False) -> dict:
+    """
+    处理整个输入文件，返回统计信息。
+    输入文件逐行读取：同时进行中的请求数不超过 workers，input 顺序下等待写出的结果不超过 workers * 4 条。
+    """
+    done = _load_done_lines(input_path, output_path, retry_errors)
+    max_pending = workers * 4
+
+    stats = {"total": 0, "skipped": len(done), "processed": 0, "errors": 0}
+    latencies = []
+
+    # 同一 session 的记录必须按顺序执行：session 有进行中的记录时，后续记录先排队
+    busy_sessions = set()
+    session_queues = {}
+    futures = {}
+
+    start = time.perf_counter()
+    with open(input_path, encoding="utf-8-sig") as fin, \
+            open(output_path, "a", encoding="utf-8") as fout, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        writer = _OutputWriter(fout, order)
+        waiting = 0  # 已排队但尚未提交的记录数
+
+        def submit(record):
+            session_key = (record["agent"], record["session"]) if record["agent"] == "finance" else None
+            if session_key is not None:
+                if session_key in busy_sessions:
+                    session_queues.setdefault(session_key, deque()).append(record)
+                    return 1
+                busy_sessions.add(session_key)
+            futures[executor.submit(_run_record, record)] = session_key
+            return 0
+
+        def collect():
+            """等待至少一个请求完成，写出结果，并提交同一 session 排队中的下一条"""
+            nonlocal waiting
+            finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in finished:
+                session_key = futures.pop(future)
+                result = future.result()
+                stats["processed"] += 1
+                if "error" in result:
+                    stats["errors"] += 1
+                latencies.append(result["latency_ms"])
+                writer.write(result)
+                if session_key is not None:
+                    queue = session_queues.get(session_key)
+                    if queue:
+                        waiting -= 1
+                        futures[executor.submit(_run_record, queue.popleft())] = session_key
+                        if not queue:
+                            del session_queues[session_key]
+                    else:
+                        busy_sessions.discard(session_key)
+
+        for index, raw in enumerate(fin):
+            if not raw.strip():
+                continue
+            stats["total"] += 1
+            if index in done:
+                continue
+
+            record = _parse_record(index, raw)
+            writer.expect(index)
+            if "error" in record:
+                stats["processed"] += 1
+                stats["errors"] += 1
+                writer.write(record)
+                continue
+
+            waiting += submit(record)
+            while futures and (len(futures) + waiting >= workers or writer.buffered >= max_pending):
+                collect()
+
+        while futures:
+            collect()
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["throughput_per_s"] = round(stats["processed"] / elapsed, 2) if elapsed else 0.0
+    if latencies:
+        stats["latency_ms"] = {
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1],
+        }
+    return stats
+
+
+def print_summary(stats: dict) -> None:
+    print(
+        f"共 {stats['total']} 条，本次处理 {stats['processed']} 条"
+        f"（失败 {stats['errors']}），跳过已完成 {stats['skipped']} 条"
+    )
+    print(f"耗时 {stats['elapsed_s']}s，吞吐量 {stats['throughput_per_s']} 条/秒")
+    if "latency_ms" in stats:
+        lat = stats["latency_ms"]
+        print(f"单条延迟 p50 {lat['p50']} ms，p95 {lat['p95']} ms，最大 {lat['max']} ms")
@@ -0,0 +1,89 @@
+"""
+批量打分基准：对比逐行调用 assess_risk_profile + generate_allocation_plan 与
+batch_scoring.score_and_allocate 的吞吐量，并核对两者结果一致。
+
+运行方式（项目根目录）：
+    python -m benchmarks.bench_batch_scoring
+    python -m benchmarks.bench_batch_scoring --rows 5000000 --loop-rows 200000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from agents.finance.batch_scoring import risk_level_names, score_and_allocate
+from agents.finance.handlers import assess_risk_profile, generate_allocation_plan
+
+_INCOME_LEVELS = np.array(["low", "medium", "high", "Medium"])
+_DRAWDOWNS = np.array(["5%", "10%", "15%", "20%", "25%", "30%", "40%", "不确定"])
+
+
+def _make_columns(rows: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "age": rng.integers(18, 80, rows),
+        "income_level": _INCOME_LEVELS[rng.integers(0, len(_INCOME_LEVELS), rows)],
+        "investment_experience_years": rng.integers(0, 15, rows),
+        "max_drawdown_tolerance": _DRAWDOWNS[rng.integers(0, len(_DRAWDOWNS), rows)],
+        "monthly_invest_amount": np.round(rng.uniform(100, 20000, rows), 2),
+    }
+
+
+def _per_row(columns: dict, rows: int) -> list:
+    """现有做法：逐个用户调用工具函数"""
+    results = []
+    for i in range(rows):
+        risk = assess_risk_profile(
+            age=int(columns["age"][i]),
+            income_level=str(columns["income_level"][i]),
+            investment_experience_years=int(columns["investment_experience_years"][i]),
+            max_drawdown_tolerance=str(columns["max_drawdown_tolerance"][i]),
+        )
+        plan = generate_allocation_plan(risk["risk_level"], float(columns["monthly_invest_amount"][i]))
+        results.append((risk, plan))
+    return results
+
+
+def _check(columns: dict, batch: dict, per_row: list) -> int:
+    """核对逐行结果与批量结果，返回不一致的行数"""
+    names = risk_level_names(batch["risk_level"])
+    mismatches = 0
+    for i, (risk, plan) in enumerate(per_row):
+        amounts = [item["amount"] for item in plan["plan"]]
+        if (risk["score"] != batch["score"][i] or risk["risk_level"] != names[i]
+                or amounts != batch["amounts"][i].tolist()):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量风险评估基准")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="批量打分的用户数（默认 100 万）")
+    parser.add_argument("--loop-rows", type=int, default=100_000, help="逐行调用的用户数（默认 10 万）")
+    args = parser.parse_args()
+
+    columns = _make_columns(args.rows)
+    loop_rows = min(args.loop_rows, args.rows)
+
+    start = time.perf_counter()
+    per_row = _per_row(columns, loop_rows)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = score_and_allocate(
+        columns["age"], columns["income_level"], columns["investment_experience_years"],
+        columns["max_drawdown_tolerance"], columns["monthly_invest_amount"],
+    )
+    batch_s = time.perf_counter() - start
+
+    loop_rate = loop_rows / loop_s
+    batch_rate = args.rows / batch_s
+    print(f"{'方式':<10} {'用户数':>10} {'耗时(s)':>10} {'用户/秒':>14}")
+    print(f"{'逐行调用':<10} {loop_rows:>10} {loop_s:>10.3f} {loop_rate:>14,.0f}")
+    print(f"{'批量打分':<10} {args.rows:>10} {batch_s:>10.3f} {batch_rate:>14,.0f}")
+    print(f"加速比 {batch_rate / loop_rate:.1f}x；前 {loop_rows} 行结果不一致 {_check(columns, batch, per_row)} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+启动耗时基准：在新进程中用 python -X importtime 导入各个入口模块，报告导入耗时、
+最慢的顶层包，以及是否提前加载了 openai、httpx 等较重的依赖。超出预算时退出码为 1，可以放进 CI。
+
+运行方式（项目根目录）：
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeat 10 --top 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 入口模块 -> 导入耗时预算（毫秒），None 表示只报告不检查
+TARGETS = {
+    "main": 100,
+    "batch": 100,
+    "agents.weather.core": 200,
+    "agents.finance.core": 200,
+    "agents.router": 200,
+    "server": None,
+}
+
+# 只应在第一次真正使用时加载的依赖
+HEAVY_MODULES = ("openai", "httpx", "dotenv", "numpy")
+
+
+def _parse_importtime(stderr: str, module: str) -> dict:
+    """
+    解析 -X importtime 的输出，只保留 module 自身触发的导入（不含解释器启动时 site 等的导入），
+    返回 {模块名: 累计耗时 us}。输出按导入完成的顺序排列，顶层导入没有缩进。
+    """
+    subtree = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if not name.startswith("  "):
+            # 一个顶层导入结束：目标模块之前的都丢弃
+            if name.strip() == module:
+                subtree[module] = int(parts[1])
+                return subtree
+            subtree = {}
+            continue
+        subtree[name.strip()] = int(parts[1])
+    raise RuntimeError(f"importtime 输出中没有找到 {module}")
+
+
+def _measure(module: str, repeat: int) -> dict:
+    """在新进程中导入 module repeat 次，取最短的一次"""
+    env = dict(os.environ, SKIP_DOTENV="1")
+    env.pop("DEEPSEEK_API_KEY", None)  # 导入不应该依赖 API 密钥
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"导入 {module} 失败：\n{proc.stderr[-2000:]}")
+        records = _parse_importtime(proc.stderr, module)
+        total_us = records[module]
+        if best is None or total_us < best["total_us"]:
+            best = {
+                "total_us": total_us,
+                "records": records,
+                "heavy": [m for m in proc.stdout.strip().split(",") if m],
+            }
+    return best
+
+
+def _top_packages(records: dict, module: str, top: int) -> list:
+    """累计耗时最长的顶层包（不含入口模块自身）"""
+    packages = [(name, cumulative) for name, cumulative in records.items()
+                if "." not in name and name != module.split(".")[0]]
+    packages.sort(key=lambda item: item[1], reverse=True)
+    return [(name, round(cumulative / 1000, 1)) for name, cumulative in packages[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartAssistantAgent 启动耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块测量次数，取最短的一次（默认 5）")
+    parser.add_argument("--top", type=int, default=5, help="列出最慢的顶层包个数（默认 5）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    report = {}
+    failed = []
+    for module, budget_ms in TARGETS.items():
+        result = _measure(module, args.repeat)
+        total_ms = round(result["total_us"] / 1000, 1)
+        over_budget = budget_ms is not None and total_ms > budget_ms
+        if over_budget:
+            failed.append(module)
+        report[module] = {
+            "import_ms": total_ms,
+            "budget_ms": budget_ms,
+            "over_budget": over_budget,
+            "heavy_modules": result["heavy"],
+            "top_packages": _top_packages(result["records"], module, args.top),
+        }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for module, item in report.items():
+            budget = f"预算 {item['budget_ms']} ms" if item["budget_ms"] is not None else "不检查"
+            status = "超出预算" if item["over_budget"] else "OK"
+            print(f"{module:<22} {item['import_ms']:>8.1f} ms  （{budget}）  {status}")
+            if item["heavy_modules"]:
+                print(f"    已加载：{', '.join(item['heavy_modules'])}")
+            top = "，".join(f"{name} {ms} ms" for name, ms in item["top_packages"])
+            print(f"    最慢的包：{top}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
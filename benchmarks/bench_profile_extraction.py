@@ -0,0 +1,99 @@
+"""
+用户画像提取基准：对比"每轮拼接全部历史再匹配"与增量提取的单轮耗时。
+
+运行方式（项目根目录）：
+    python -m benchmarks.bench_profile_extraction
+"""
+
+import re
+import time
+
+from agents.finance.profile import UserProfile
+
+_TURNS = [
+    "你好，我想了解一下理财",
+    "我今年27岁",
+    "平时工作比较忙",
+    "年收入10w左右",
+    "之前没有投资经验",
+    "能接受10%的亏损",
+    "每月可以投1000元",
+]
+
+
+def _legacy_extract(conversation_history):
+    """原实现：合并所有用户输入后逐条执行未预编译的正则"""
+    user_info = {}
+    all_user_input = " ".join([
+        msg.get("content", "")
+        for msg in conversation_history
+        if msg.get("role") == "user"
+    ])
+    age_match = re.search(r'(\d+)\s*岁', all_user_input)
+    if age_match:
+        user_info["age"] = int(age_match.group(1))
+    if re.search(r'年收入\s*10\s*w|年薪\s*10\s*万|10\s*万年薪|中等收入|中等', all_user_input, re.I):
+        user_info["income_level"] = "medium"
+    elif re.search(r'低收入|月收入\s*5000\s*以下', all_user_input, re.I):
+        user_info["income_level"] = "low"
+    elif re.search(r'高收入|月收入\s*15000\s*以上', all_user_input, re.I):
+        user_info["income_level"] = "high"
+    if re.search(r'没有.*经验|没有投资|0\s*年', all_user_input, re.I):
+        user_info["investment_experience_years"] = 0
+    else:
+        exp_match = re.search(r'(\d+)\s*年.*经验', all_user_input)
+        if exp_match:
+            user_info["investment_experience_years"] = int(exp_match.group(1))
+    if re.search(r'较小.*亏损|10\s*%|能接受\s*10\s*%', all_user_input, re.I):
+        user_info["max_drawdown_tolerance"] = "10%"
+    else:
+        tol_match = re.search(r'(\d+)\s*%', all_user_input)
+        if tol_match:
+            user_info["max_drawdown_tolerance"] = f"{tol_match.group(1)}%"
+    if re.search(r'1\s*k|1000|每月\s*1\s*k|每月\s*1000', all_user_input, re.I):
+        user_info["monthly_invest_amount"] = 1000
+    else:
+        amount_match = re.search(r'每月.*?(\d+)\s*[元块]', all_user_input)
+        if amount_match:
+            user_info["monthly_invest_amount"] = float(amount_match.group(1))
+    return user_info
+
+
+def _history(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": _TURNS[i % len(_TURNS)]})
+        history.append({"role": "assistant", "content": "好的，请继续介绍一下您的情况。" * 3})
+    return history
+
+
+def _per_turn_us(func, repeat: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(f"{'历史轮数':>8} {'全量重扫(us/轮)':>16} {'增量提取(us/轮)':>16}")
+    for turns in (10, 100, 1000, 5000):
+        history = _history(turns)
+        new_message = "我想每月定投一些"
+
+        profile = UserProfile()
+        for msg in history:
+            if msg["role"] == "user":
+                profile.update(msg["content"])
+
+        legacy = _per_turn_us(lambda: _legacy_extract(history + [{"role": "user", "content": new_message}]),
+                              repeat=max(5, 2000 // turns))
+
+        def incremental():
+            profile.update(new_message)
+            profile.as_dict()
+
+        print(f"{turns:>8} {legacy:>16.1f} {_per_turn_us(incremental):>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
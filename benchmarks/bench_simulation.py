@@ -0,0 +1,88 @@
+"""
+蒙特卡洛模拟基准：simulate_wealth_paths 在不同分块大小下的耗时和内存峰值，
+并与逐月生成正态随机数的直接实现对比分位数和回撤概率，确认查表生成随机数不影响结果。
+
+运行方式（项目根目录）：
+    python -m benchmarks.bench_simulation
+    python -m benchmarks.bench_simulation --paths 100000 --months 360 --chunks 5000,20000,100000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from agents.finance.rules import allocation_percents
+from agents.finance.simulation import (
+    DRAWDOWN_LEVELS,
+    PERCENTILES,
+    portfolio_assumptions,
+    simulate_wealth_paths,
+)
+
+
+def _reference(annual_return: float, annual_volatility: float, monthly: float, months: int,
+               paths: int, seed: int = 1) -> tuple:
+    """直接实现：每月用 standard_normal 生成对数收益，只计算期末资产和最大回撤"""
+    rng = np.random.default_rng(seed)
+    sigma = annual_volatility / 100 / np.sqrt(12)
+    mu = np.log1p(annual_return / 100) / 12 - sigma * sigma / 2
+    wealth = np.zeros(paths)
+    nav = np.ones(paths)
+    peak = np.ones(paths)
+    max_drawdown = np.zeros(paths)
+    for _ in range(months):
+        growth = np.exp(mu + sigma * rng.standard_normal(paths))
+        wealth = (wealth + monthly) * growth
+        nav *= growth
+        np.maximum(peak, nav, out=peak)
+        np.maximum(max_drawdown, 1 - nav / peak, out=max_drawdown)
+    return wealth, max_drawdown
+
+
+def _summary(final_wealth, max_drawdown) -> str:
+    wealth = "  ".join(f"p{p}={v:,.0f}" for p, v in zip(PERCENTILES, np.percentile(final_wealth, PERCENTILES)))
+    drawdown = "  ".join(f">={level}%:{(max_drawdown >= level / 100).mean():.3f}" for level in DRAWDOWN_LEVELS)
+    return f"{wealth}\n    回撤 {drawdown}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="蒙特卡洛模拟基准")
+    parser.add_argument("--paths", type=int, default=100_000, help="模拟路径数（默认 10 万）")
+    parser.add_argument("--months", type=int, default=360, help="模拟月数（默认 360）")
+    parser.add_argument("--chunks", default="5000,20000,100000", help="要对比的分块大小，逗号分隔")
+    parser.add_argument("--risk-level", default="aggressive", help="配置方案的风险等级")
+    parser.add_argument("--monthly", type=float, default=1000, help="每月定投金额")
+    args = parser.parse_args()
+
+    weights = [percent / 100 for percent in allocation_percents(args.risk_level)]
+    annual_return, annual_volatility = portfolio_assumptions(weights)
+    print(f"组合假设：年化收益 {annual_return:.2f}%，年化波动 {annual_volatility:.2f}%；"
+          f"{args.paths} 条路径 × {args.months} 个月")
+
+    # 预热分位数表（进程内只计算一次）
+    simulate_wealth_paths(annual_return, annual_volatility, args.monthly, 12, 1000)
+
+    print(f"{'分块大小':<10} {'耗时(s)':>10} {'内存峰值(MB)':>14}")
+    result = None
+    for chunk in (int(value) for value in args.chunks.split(",")):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = simulate_wealth_paths(annual_return, annual_volatility, args.monthly,
+                                       args.months, args.paths, chunk_paths=chunk)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{chunk:<10} {elapsed:>10.3f} {peak / 1e6:>14.1f}")
+
+    snapshots, max_drawdown = result
+    start = time.perf_counter()
+    reference = _reference(annual_return, annual_volatility, args.monthly, args.months, args.paths)
+    reference_s = time.perf_counter() - start
+    print(f"\n查表随机数：\n    {_summary(snapshots[:, -1], max_drawdown)}")
+    print(f"直接生成正态随机数（{reference_s:.3f}s）：\n    {_summary(*reference)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+压测：用 N 个并发会话驱动 call_weather_agent / call_finance_agent，
+报告 p50/p95/p99 延迟、吞吐量以及每轮的 LLM / 天气 HTTP 调用次数。
+
+默认在进程内启动本地模拟服务（benchmarks.mock_servers），不需要真实 API Key：
+    python -m benchmarks.load_test --sessions 50 --turns 5 --agent mixed
+"""
+
+import argparse
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_servers import MockConfig, MockServer
+
+WEATHER_TURNS = [
+    "北京",
+    "上海天气怎么样？",
+    "保定",
+    "广州和深圳今天哪个更热？",
+    "杭州",
+]
+
+FINANCE_TURNS = [
+    "你好，我想做点理财",
+    "我今年28岁",
+    "年收入10w，没有投资经验",
+    "能接受10%的亏损，每月1000元",
+    "这个方案需要多久调整一次？",
+]
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _fetch_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(base_url + "/stats", timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def _reset_stats(base_url: str) -> None:
+    req = urllib.request.Request(base_url + "/stats/reset", data=b"", method="POST")
+    urllib.request.urlopen(req, timeout=5).close()
+
+
+def _origin(url: str) -> str:
+    parts = url.split("/")
+    return "/".join(parts[:3])
+
+
+def run(args) -> dict:
+    llm_server = weather_server = None
+    llm_url, weather_url = args.llm_url, args.weather_url
+    if not llm_url:
+        llm_server = MockServer("llm", MockConfig(args.llm_latency_ms, args.jitter_ms, args.error_rate)).start()
+        llm_url = llm_server.url
+    if not weather_url:
+        weather_server = MockServer(
+            "weather", MockConfig(args.weather_latency_ms, args.jitter_ms, args.error_rate)
+        ).start()
+        weather_url = weather_server.url
+
+    # 必须在导入 Agent 之前设置，配置在导入时读取
+    os.environ["SKIP_DOTENV"] = "1"
+    os.environ["DEEPSEEK_BASE_URL"] = llm_url
+    os.environ["DEEPSEEK_FALLBACK_URL"] = llm_url  # 避免端点路由探测到真实 API
+    os.environ.setdefault("DEEPSEEK_API_KEY", "mock-key")
+    os.environ["TIANAPI_URL"] = weather_url
+    os.environ.setdefault("WEATHER_API_KEY", "mock-key")
+    if args.no_weather_cache:
+        os.environ["WEATHER_CACHE_TTL"] = "0"
+    if args.response_mode:
+        os.environ["RESPONSE_MODE"] = args.response_mode
+
+    from agents.weather.core import call_weather_agent
+    from agents.finance.core import call_finance_agent
+    from agents.shared.response_mode import get_response_stats
+
+    def session_worker(index: int) -> list:
+        agent = args.agent
+        if agent == "mixed":
+            agent = "weather" if index % 2 == 0 else "finance"
+        latencies = []
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            try:
+                if agent == "weather":
+                    call_weather_agent(WEATHER_TURNS[(index + turn) % len(WEATHER_TURNS)])
+                else:
+                    call_finance_agent(FINANCE_TURNS[turn % len(FINANCE_TURNS)], session_id=f"load-{index}")
+                ok = True
+            except Exception:
+                ok = False
+            latencies.append((agent, time.perf_counter() - start, ok))
+        return latencies
+
+    _reset_stats(_origin(llm_url))
+    _reset_stats(_origin(weather_url))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = [r for session in executor.map(session_worker, range(args.sessions)) for r in session]
+    elapsed = time.perf_counter() - start
+
+    llm_stats = _fetch_stats(_origin(llm_url))
+    weather_stats = _fetch_stats(_origin(weather_url))
+    if llm_server:
+        llm_server.stop()
+    if weather_server:
+        weather_server.stop()
+
+    turns = len(results)
+    report = {
+        "sessions": args.sessions,
+        "turns": turns,
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "llm_calls_per_turn": round(llm_stats.get("llm_requests", 0) / turns, 3) if turns else 0.0,
+        "weather_http_calls_per_turn": round(weather_stats.get("tianapi_requests", 0) / turns, 3) if turns else 0.0,
+        "response_mode": get_response_stats()["mode"],
+        "llm_calls_avoided": get_response_stats()["llm_calls_avoided"],
+        "latency_ms": {},
+    }
+    for agent in sorted({a for a, _, _ in results}) + ["all"]:
+        values = sorted(lat for a, lat, _ in results if agent in ("all", a))
+        report["latency_ms"][agent] = {
+            "p50": round(_percentile(values, 50) * 1000, 1),
+            "p95": round(_percentile(values, 95) * 1000, 1),
+            "p99": round(_percentile(values, 99) * 1000, 1),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartAssistantAgent 压测")
+    parser.add_argument("--sessions", type=int, default=20, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=5, help="每个会话的轮数")
+    parser.add_argument("--agent", choices=["weather", "finance", "mixed"], default="mixed")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--weather-latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-url", help="使用外部 LLM 服务（如单独启动的模拟服务），默认进程内启动")
+    parser.add_argument("--weather-url", help="使用外部天气服务，默认进程内启动")
+    parser.add_argument("--no-weather-cache", action="store_true", help="关闭天气缓存，测量每轮真实的天气请求")
+    parser.add_argument("--response-mode", choices=["llm", "template", "template-then-llm-if-complex"],
+                        help="回复生成方式（默认读取 RESPONSE_MODE）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"会话数 {report['sessions']}，总轮数 {report['turns']}，失败 {report['errors']}，耗时 {report['elapsed_s']}s")
+    print(f"吞吐量：{report['throughput_turns_per_s']} 轮/秒")
+    print(f"每轮 LLM 调用：{report['llm_calls_per_turn']}，每轮天气 HTTP 调用：{report['weather_http_calls_per_turn']}")
+    print(f"回复模式：{report['response_mode']}，模板回复省掉的 LLM 调用：{report['llm_calls_avoided']}")
+    for agent, lat in report["latency_ms"].items():
+        print(f"  {agent:<8} p50 {lat['p50']:>8} ms   p95 {lat['p95']:>8} ms   p99 {lat['p99']:>8} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+本地模拟服务：不需要真实 API Key 和调用额度即可压测。
+
+- LLM：兼容 OpenAI chat-completions 协议（POST /v1/chat/completions），支持 tool_calls 和 stream
+- 天气：兼容天行数据 tianqi/index 的响应结构（GET /tianqi/index）
+
+两类服务都可以配置延迟和错误注入，GET /stats 返回请求计数，POST /stats/reset 清零。
+
+单独运行（项目根目录）：
+    python -m benchmarks.mock_servers --llm-port 9001 --weather-port 9002
+然后设置：
+    DEEPSEEK_BASE_URL=http://127.0.0.1:9001/v1
+    TIANAPI_URL=http://127.0.0.1:9002/tianqi/index
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 模拟天气服务认识的城市（其余城市名返回 code 250，触发"市/县"变体探测）
+KNOWN_CITIES = {
+    "北京": "北京", "上海": "上海", "广州": "广州", "深圳": "深圳", "杭州": "杭州",
+    "成都": "成都", "武汉": "武汉", "西安": "西安", "南京": "南京", "重庆": "重庆",
+    "天津": "天津", "苏州": "苏州", "长沙": "长沙", "郑州": "郑州", "青岛": "青岛",
+    "保定市": "保定", "廊坊市": "廊坊", "正定县": "正定",
+}
+_CITY_RE = re.compile("|".join(sorted((c.rstrip("市县") for c in KNOWN_CITIES), key=len, reverse=True)))
+_WEATHERS = ["晴", "多云", "阴", "小雨", "阵雨", "雾"]
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 50.0  # 平均延迟
+    jitter_ms: float = 20.0  # 延迟抖动（均匀分布 ±jitter）
+    error_rate: float = 0.0  # 注入错误的概率（LLM 返回 HTTP 500，天气返回 code 230）
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+
+
+def _weather_result(city: str) -> dict:
+    area = KNOWN_CITIES[city]
+    rnd = random.Random(area)  # 同一城市返回稳定的数据
+    low = rnd.randint(-5, 20)
+    return {
+        "area": area,
+        "weather": rnd.choice(_WEATHERS),
+        "real": f"{low + rnd.randint(2, 8)}℃",
+        "lowest": f"{low}℃",
+        "highest": f"{low + rnd.randint(8, 12)}℃",
+        "wind": "东北风",
+        "windsc": f"{rnd.randint(1, 4)}级",
+        "humidity": str(rnd.randint(20, 90)),
+        "quality": "良",
+        "aqi": str(rnd.randint(30, 120)),
+    }
+
+
+def _tool_calls_for(body: dict):
+    """根据工具列表和最后一条用户消息，模拟模型的工具调用决策"""
+    messages = body.get("messages") or []
+    tools = body.get("tools") or []
+    if not tools or body.get("tool_choice") == "none":
+        return None
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    text = messages[-1].get("content") or ""
+    names = {t["function"]["name"] for t in tools}
+
+    if "get_weather" in names:
+        cities = list(dict.fromkeys(_CITY_RE.findall(text)))
+        if len(cities) > 1 and "get_weather_batch" in names:
+            return [("get_weather_batch", {"locations": cities})]
+        if cities:
+            return [("get_weather", {"location": city}) for city in cities]
+    if "assess_risk_profile" in names:
+        age = re.search(r"(\d+)\s*岁", text)
+        if age:
+            return [("assess_risk_profile", {
+                "age": int(age.group(1)),
+                "income_level": "medium",
+                "investment_experience_years": 0,
+                "max_drawdown_tolerance": "10%",
+            })]
+    return None
+
+
+def _reply_text(body: dict) -> str:
+    messages = body.get("messages") or []
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        return f"根据查询结果为您整理如下：{last.get('content', '')}。如需了解更多信息，欢迎继续提问，我会尽力为您解答。"
+    return "好的，为了给出更合适的建议，请告诉我您的年龄、收入水平、投资经验、可承受的最大亏损以及每月可投资金额。"
+
+
+def _usage(body: dict, completion_text: str) -> dict:
+    prompt_chars = sum(len(json.dumps(m, ensure_ascii=False)) for m in body.get("messages") or [])
+    prompt_tokens = prompt_chars // 2
+    hit = (prompt_tokens // 64) * 64 // 2
+    completion_tokens = len(completion_text) // 2 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_cache_hit_tokens": hit,
+        "prompt_cache_miss_tokens": prompt_tokens - hit,
+    }
+
+
+def _make_handler(kind: str, config: MockConfig, stats: _Stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # 压测时不打印访问日志
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _sleep(self) -> None:
+            delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/stats":
+                return self._send_json(200, stats.snapshot())
+            if kind == "weather" and parsed.path.endswith("/tianqi/index"):
+                return self._tianapi(parse_qs(parsed.query))
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if self.path == "/stats/reset":
+                stats.reset()
+                return self._send_json(200, {"ok": True})
+            if kind == "llm" and self.path.endswith("/chat/completions"):
+                return self._chat(json.loads(raw or b"{}"))
+            self._send_json(404, {"error": "not found"})
+
+        def _tianapi(self, query: dict) -> None:
+            stats.incr("tianapi_requests")
+            self._sleep()
+            city = (query.get("city") or [""])[0]
+            if random.random() < config.error_rate:
+                stats.incr("tianapi_errors")
+                return self._send_json(200, {"code": 230, "msg": "模拟服务错误"})
+            if city not in KNOWN_CITIES:
+                return self._send_json(200, {"code": 250, "msg": "数据返回为空"})
+            self._send_json(200, {"code": 200, "msg": "success", "result": _weather_result(city)})
+
+        def _chat(self, body: dict) -> None:
+            stats.incr("llm_requests")
+            if body.get("tools"):
+                stats.incr("llm_requests_with_tools")
+            self._sleep()
+            if random.random() < config.error_rate:
+                stats.incr("llm_errors")
+                return self._send_json(500, {"error": {"message": "模拟服务错误", "type": "server_error"}})
+
+            tool_calls = _tool_calls_for(body)
+            if tool_calls:
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": f"call_{i}",
+                            "type": "function",
+                            "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)},
+                        }
+                        for i, (name, args) in enumerate(tool_calls)
+                    ],
+                }
+                finish_reason = "tool_calls"
+            else:
+                message = {"role": "assistant", "content": _reply_text(body)}
+                finish_reason = "stop"
+
+            usage = _usage(body, message.get("content") or "")
+            if body.get("stream"):
+                return self._stream(body, message.get("content") or "", usage)
+
+            self._send_json(200, {
+                "id": f"chatcmpl-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "deepseek-chat"),
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        def _stream(self, body: dict, text: str, usage: dict) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            base = {
+                "id": f"chatcmpl-{time.time_ns()}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "deepseek-chat"),
+            }
+            pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+            events = [
+                dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                for piece in pieces
+            ]
+            events.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}], usage=usage))
+            for event in events:
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认 backlog 只有 5，高并发时会丢连接并触发 1 秒的 SYN 重传，污染延迟数据
+    request_queue_size = 1024
+
+
+class MockServer:
+    """在后台线程中运行的模拟服务，kind 为 llm 或 weather"""
+
+    def __init__(self, kind: str, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.kind = kind
+        self.config = config or MockConfig()
+        self.stats = _Stats()
+        self._httpd = _MockHTTPServer((host, port), _make_handler(kind, self.config, self.stats))
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        if self.kind == "llm":
+            return f"http://{host}:{port}/v1"
+        return f"http://{host}:{port}/tianqi/index"
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 DeepSeek / 天行数据服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=9001)
+    parser.add_argument("--weather-port", type=int, default=9002)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--weather-latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    llm = MockServer("llm", MockConfig(args.llm_latency_ms, args.jitter_ms, args.error_rate),
+                     args.host, args.llm_port).start()
+    weather = MockServer("weather", MockConfig(args.weather_latency_ms, args.jitter_ms, args.error_rate),
+                         args.host, args.weather_port).start()
+    print(f"LLM 模拟服务：DEEPSEEK_BASE_URL={llm.url}")
+    print(f"天气模拟服务：TIANAPI_URL={weather.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        llm.stop()
+        weather.stop()
+
+
+if __name__ == "__main__":
+    main()
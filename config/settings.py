@@ -1,6 +1,5 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv, dotenv_values
 
 # 获取项目根目录
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -8,22 +7,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # 加载 .env 文件（从项目根目录）
 env_path = BASE_DIR / ".env"
 
-# 先尝试使用 load_dotenv
-load_dotenv(dotenv_path=env_path, override=True)
-
-# 如果 load_dotenv 没有加载到值，使用 dotenv_values 直接读取（处理 BOM 问题）
-if not os.getenv("DEEPSEEK_API_KEY"):
-    env_values = dotenv_values(dotenv_path=env_path)
-    # 处理 BOM 字符问题：检查是否有带 BOM 的键名
-    for key, value in env_values.items():
-        # 去除键名中的 BOM 字符
-        clean_key = key.lstrip('\ufeff')
-        if clean_key != key:
-            # 如果键名有 BOM，设置正确的环境变量
-            os.environ[clean_key] = value
-        else:
-            # 正常设置环境变量
-            os.environ[key] = value
+# 基准测试等场景可以设置 SKIP_DOTENV=1，只使用进程环境变量（避免 .env 覆盖指向本地模拟服务的配置）
+# .env 只解析一次；文件不存在时不导入 dotenv
+if not os.getenv("SKIP_DOTENV") and env_path.is_file():
+    from dotenv import dotenv_values
+
+    # .env 中的值覆盖进程环境变量
+    for key, value in dotenv_values(dotenv_path=env_path).items():
+        if value is None:
+            continue
+        # 处理 BOM 字符问题：去除键名中的 BOM 字符
+        os.environ[key.lstrip('\ufeff')] = value
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 # 如果你在国内用 .cn 更稳定，可以改成 https://api.deepseek.cn/v1
@@ -41,8 +35,123 @@ WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 # 如果使用和风天气，需要配置 WEATHER_API_HOST
 WEATHER_API_HOST = os.getenv("WEATHER_API_HOST")
 WEATHER_API_TYPE = os.getenv("WEATHER_API_TYPE", "tianapi")  # tianapi 或 qweather
+# 天行数据天气接口地址（可指向本地模拟服务做压测）
+TIANAPI_URL = os.getenv("TIANAPI_URL", "https://apis.tianapi.com/tianqi/index")
 
 # 代理设置（可选）
 HTTP_PROXY = os.getenv("HTTP_PROXY") or os.getenv("http_proxy")
 HTTPS_PROXY = os.getenv("HTTPS_PROXY") or os.getenv("https_proxy")
 
+
+# LLM 异步连接池大小（异步 Agent 并发会话共享）
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+
+# 天气结果缓存（秒）：TTL 内直接命中；过期后 STALE_TTL 内先返回旧值并在后台刷新
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "300"))
+WEATHER_CACHE_MAXSIZE = int(os.getenv("WEATHER_CACHE_MAXSIZE", "256"))
+
+# 城市名称变体探测方式：sequential 依次尝试；race 并发请求所有变体，取最先返回的有效结果
+WEATHER_PROBE_MODE = os.getenv("WEATHER_PROBE_MODE", "sequential").lower()
+WEATHER_PROBE_WORKERS = int(os.getenv("WEATHER_PROBE_WORKERS", "8"))
+# race 模式下同时发出的变体请求数上限，前面的变体失败后才发出下一个（已经发出的请求无法撤回，仍计入调用次数）
+WEATHER_PROBE_RACE_WIDTH = int(os.getenv("WEATHER_PROBE_RACE_WIDTH", "2"))
+
+# 负缓存：确认不是地名的输入在这段时间内不再请求天气 API（秒）
+WEATHER_NEGATIVE_CACHE_TTL = float(os.getenv("WEATHER_NEGATIVE_CACHE_TTL", "21600"))
+
+# 理财 Agent 会话存储：单会话最多消息数、空闲过期时间（秒）、所有会话的内存上限（字节）
+FINANCE_SESSION_MAX_MESSAGES = int(os.getenv("FINANCE_SESSION_MAX_MESSAGES", "50"))
+FINANCE_SESSION_IDLE_TTL = float(os.getenv("FINANCE_SESSION_IDLE_TTL", "1800"))
+FINANCE_SESSION_MAX_TOTAL_BYTES = int(os.getenv("FINANCE_SESSION_MAX_TOTAL_BYTES", str(64 * 1024 * 1024)))
+
+# HTTP 服务（python main.py serve）
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "64"))  # 同时执行的 Agent 请求数
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "256"))  # 超出并发后最多排队的请求数，再多直接返回 503
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "120"))
+SERVER_SHUTDOWN_TIMEOUT = float(os.getenv("SERVER_SHUTDOWN_TIMEOUT", "30"))
+
+# LLM 端点路由：备用端点（默认在 api.deepseek.cn / api.deepseek.com 之间互为备用）
+DEEPSEEK_FALLBACK_URL = os.getenv("DEEPSEEK_FALLBACK_URL", "")
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", "0.2"))  # 延迟/错误率的 EWMA 平滑系数
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))  # 连续失败多少次后熔断
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))  # 熔断多久后放行探测请求
+LLM_ROUTER_EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", "0.02"))  # 发往非当前端点以测量延迟的比例
+LLM_ROUTER_SWITCH_MARGIN = float(os.getenv("LLM_ROUTER_SWITCH_MARGIN", "0.2"))  # 备用端点快多少比例才切换
+
+# 超时、重试和对冲请求
+# 超时按最近请求的 p99 自适应（TIMEOUT_P99_MULTIPLIER * p99），限制在 [*_TIMEOUT_MIN, *_TIMEOUT] 之间
+TIMEOUT_P99_MULTIPLIER = float(os.getenv("TIMEOUT_P99_MULTIPLIER", "3"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_TIMEOUT_MIN = float(os.getenv("LLM_TIMEOUT_MIN", "10"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "10"))
+WEATHER_TIMEOUT_MIN = float(os.getenv("WEATHER_TIMEOUT_MIN", "2"))
+# 可重试错误（连接失败、超时、429、5xx）的重试次数，重试前按指数退避加随机抖动等待（秒）
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+WEATHER_MAX_RETRIES = int(os.getenv("WEATHER_MAX_RETRIES", "1"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.2"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "5"))
+# 对冲请求：超过 p95 仍未返回时向备用端点（天气为同一服务）再发一次，取先返回的结果
+# 会增加 API 调用量（LLM 按 token 计费），默认关闭
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes", "on")
+WEATHER_HEDGE = os.getenv("WEATHER_HEDGE", "0").lower() in ("1", "true", "yes", "on")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "64"))
+
+# 回复生成方式：
+#   llm（默认）：工具结果都交给模型润色
+#   template：确定性的工具结果直接用本地模板渲染，不再调用模型
+#   template-then-llm-if-complex：简单问题用模板，比较、建议、追问等复杂问题仍交给模型
+RESPONSE_MODE = os.getenv("RESPONSE_MODE", "llm").lower()
+
+# LLM 回答缓存（精确匹配）：off 关闭（默认）、memory 进程内、sqlite 进程内 + SQLite 文件
+LLM_CACHE = os.getenv("LLM_CACHE", "off").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(BASE_DIR / ".cache" / "llm_completions.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# 追踪与指标导出：off（默认）、jsonl（每轮一行 JSON）、prometheus（Prometheus 文本格式）
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "off").lower()
+TRACE_PATH = os.getenv(
+    "TRACE_PATH",
+    str(BASE_DIR / ".cache" / ("metrics.prom" if TRACE_EXPORT == "prometheus" else "traces.jsonl")),
+)
+
+# 理财 Agent 每次请求携带的对话历史 token 上限（本地估算），更早的对话折叠成用户画像摘要
+FINANCE_HISTORY_TOKEN_BUDGET = int(os.getenv("FINANCE_HISTORY_TOKEN_BUDGET", "1500"))
+
+# 同一次模型回复中的多个工具调用并发执行：单个工具的超时（秒）和线程池大小
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "16"))
+
+# get_weather_batch：并发查询的线程数、一次最多查询的城市数
+WEATHER_BATCH_WORKERS = int(os.getenv("WEATHER_BATCH_WORKERS", "8"))
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", "10"))
+
+# simulate_plan_outcomes：默认模拟路径数、路径数上限、最长年限，以及每块同时模拟的路径数（控制内存）
+SIMULATION_PATHS = int(os.getenv("SIMULATION_PATHS", "10000"))
+SIMULATION_MAX_PATHS = int(os.getenv("SIMULATION_MAX_PATHS", "100000"))
+SIMULATION_MAX_YEARS = int(os.getenv("SIMULATION_MAX_YEARS", "30"))
+SIMULATION_CHUNK_PATHS = int(os.getenv("SIMULATION_CHUNK_PATHS", "20000"))
+
+# 本地意图路由：置信度不低于该值时直接分发到对应的 Agent 和工具，低于该值才请模型判断
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.7"))
+
+# 天气 API 的 keep-alive 连接池：最大连接数、保留的空闲连接数、空闲连接保留时间（秒）
+# WEATHER_HTTP2=1 时尝试 HTTP/2（需要安装 h2：pip install "httpx[http2]"），代理沿用 HTTP_PROXY / HTTPS_PROXY
+WEATHER_HTTP_MAX_CONNECTIONS = int(os.getenv("WEATHER_HTTP_MAX_CONNECTIONS", str(WEATHER_PROBE_WORKERS + WEATHER_BATCH_WORKERS)))
+WEATHER_HTTP_MAX_KEEPALIVE = int(os.getenv("WEATHER_HTTP_MAX_KEEPALIVE", str(WEATHER_HTTP_MAX_CONNECTIONS)))
+WEATHER_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("WEATHER_HTTP_KEEPALIVE_EXPIRY", "60"))
+WEATHER_HTTP2 = os.getenv("WEATHER_HTTP2", "0").lower() in ("1", "true", "yes", "on")
+
+# 热门城市天气预取（默认关闭）：按查询频率（半衰期 WEATHER_PREFETCH_HALF_LIFE 秒的衰减计数）取最热门的 TOP_N 个城市，
+# 每 INTERVAL 秒检查一次，缓存即将过期的提前刷新；每小时最多刷新 QUOTA 次，衰减后分数低于 MIN_SCORE 的城市不刷新
+WEATHER_PREFETCH = os.getenv("WEATHER_PREFETCH", "0").lower() in ("1", "true", "yes", "on")
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", "20"))
+WEATHER_PREFETCH_INTERVAL = float(os.getenv("WEATHER_PREFETCH_INTERVAL", "60"))
+WEATHER_PREFETCH_QUOTA = float(os.getenv("WEATHER_PREFETCH_QUOTA", "120"))
+WEATHER_PREFETCH_HALF_LIFE = float(os.getenv("WEATHER_PREFETCH_HALF_LIFE", "3600"))
+WEATHER_PREFETCH_MIN_SCORE = float(os.getenv("WEATHER_PREFETCH_MIN_SCORE", "2"))
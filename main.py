@@ -1,45 +1,116 @@
-from agents.weather.core import call_weather_agent
-from agents.finance.core import call_finance_agent
+import argparse
+import time
 
 
-def main():
+def _print_stream(prefix: str, chunks) -> None:
+    """边生成边打印回答，结束后报告首字延迟和总耗时"""
+    start = time.perf_counter()
+    first_token_at = None
+    print(prefix, end="", flush=True)
+    for text in chunks:
+        if first_token_at is None:
+            first_token_at = time.perf_counter() - start
+        print(text, end="", flush=True)
+    total = time.perf_counter() - start
+    print()
+    if first_token_at is not None:
+        print(f"（首字 {first_token_at:.2f}s，总耗时 {total:.2f}s）")
+
+
+def run_cli():
     print("=== SmartAssistantAgent 已启动 ===")
     print("1. 天气查询 Agent")
     print("2. 理财小助手 Agent")
-    print("输入数字选择 Agent，输入 exit 退出。")
+    print("3. 自动模式（根据问题自动选择 Agent）")
+    print("输入数字选择 Agent（直接回车为自动模式），输入 exit 退出。")
 
     while True:
-        mode = input("\n请选择 Agent（1/2 或 exit）：").strip().lower()
+        mode = input("\n请选择 Agent（1/2/3 或 exit）：").strip().lower() or "3"
 
         if mode in {"exit", "quit"}:
             print("再见～")
             break
 
-        if mode not in {"1", "2"}:
-            print("请输入 1 / 2 或 exit。")
+        if mode not in {"1", "2", "3"}:
+            print("请输入 1 / 2 / 3 或 exit。")
             continue
 
+        # Agent（以及 LLM 客户端）在第一次选择时才导入，启动更快
         if mode == "1":
+            from agents.weather.core import stream_weather_agent
+
             print("\n【天气 Agent】已启动，输入城市相关问题，back 返回主菜单。")
             while True:
                 user_input = input("你：")
                 if user_input.strip().lower() in {"back", "exit", "quit"}:
                     print("返回主菜单。")
                     break
-                reply = call_weather_agent(user_input)
-                print("天气Agent：", reply)
+                _print_stream("天气Agent： ", stream_weather_agent(user_input))
 
         if mode == "2":
+            from agents.finance.core import stream_finance_agent
+
             print("\n【理财 Agent】已启动，可以跟我聊你的收入、风险偏好等，back 返回主菜单。")
             while True:
                 user_input = input("你：")
                 if user_input.strip().lower() in {"back", "exit", "quit"}:
                     print("返回主菜单。")
                     break
-                reply = call_finance_agent(user_input)
-                print("理财Agent：", reply)
+                _print_stream("理财Agent： ", stream_finance_agent(user_input))
+
+        if mode == "3":
+            from agents.router import FINANCE, stream_assistant
+
+            print("\n【自动模式】已启动，天气和理财问题都可以直接问，back 返回主菜单。")
+            while True:
+                user_input = input("你：")
+                if user_input.strip().lower() in {"back", "exit", "quit"}:
+                    print("返回主菜单。")
+                    break
+                intent, chunks = stream_assistant(user_input)
+                _print_stream("理财Agent： " if intent == FINANCE else "天气Agent： ", chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartAssistantAgent")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("chat", help="交互式命令行（默认）")
+
+    serve_parser = subparsers.add_parser("serve", help="启动 HTTP 服务")
+    serve_parser.add_argument("--host", help="监听地址（默认 SERVER_HOST）")
+    serve_parser.add_argument("--port", type=int, help="监听端口（默认 SERVER_PORT）")
+    serve_parser.add_argument("--max-concurrency", type=int, help="同时执行的请求数上限")
+    serve_parser.add_argument("--max-queue", type=int, help="排队请求数上限，超出返回 503")
+
+    batch_parser = subparsers.add_parser("batch", help="批量处理 JSONL 文件中的问题")
+    batch_parser.add_argument("input", help="输入 JSONL，每行 {agent, session, input}")
+    batch_parser.add_argument("-o", "--output", required=True, help="输出 JSONL，已存在时跳过已完成的行")
+    batch_parser.add_argument("--workers", type=int, default=8, help="并发数（默认 8）")
+    batch_parser.add_argument("--order", choices=["completion", "input"], default="completion",
+                              help="结果写出顺序：completion 完成即写出（默认），input 按输入顺序")
+    batch_parser.add_argument("--retry-errors", action="store_true", help="续跑时重新处理之前失败的行")
+
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        from batch import print_summary, run_batch
+
+        stats = run_batch(args.input, args.output, workers=args.workers,
+                          order=args.order, retry_errors=args.retry_errors)
+        print_summary(stats)
+    elif args.command == "serve":
+        from server import run_server
+
+        options = {
+            "host": args.host,
+            "port": args.port,
+            "max_concurrency": args.max_concurrency,
+            "max_queue": args.max_queue,
+        }
+        run_server(**{k: v for k, v in options.items() if v is not None})
+    else:
+        run_cli()
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,311 @@
+"""
+基于 asyncio 的 JSON/HTTP 服务入口，可以放在负载均衡后面同时服务多个用户。
+
+接口：
+    POST /v1/weather   {"session": "可选", "input": "北京"}
+    POST /v1/finance   {"session": "user-1", "input": "我今年27岁"}
+    POST /v1/chat      {"session": "user-1", "input": "北京和上海哪个热"}   自动判断交给哪个 Agent
+    GET  /healthz      健康检查（停机排空期间返回 503）
+    GET  /metrics      每个接口的延迟直方图、并发和拒绝计数、LLM 端点健康状况、前缀缓存命中率、意图路由统计、
+                       天气 API 连接池的复用率、热门城市预取统计
+    GET  /metrics?format=prometheus   追踪汇总指标（需要开启 TRACE_EXPORT）
+"""
+
+import asyncio
+import json
+import signal
+import time
+import uuid
+
+from agents.shared.http_pool import get_pool_stats
+from agents.shared.llm_client import get_completion_cache_stats, get_endpoint_stats
+from agents.shared.messages import get_prompt_cache_stats
+from agents.shared.metrics import LatencyHistogram
+from agents.shared.response_mode import get_response_stats
+from agents.shared import tracing
+from agents.router import acall_assistant, get_router_stats
+from agents.weather.core import acall_weather_agent
+from agents.weather.handlers import get_weather_prefetch_stats
+from agents.finance.core import acall_finance_agent, get_session_stats
+from config.settings import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_MAX_CONCURRENCY,
+    SERVER_MAX_QUEUE,
+    SERVER_REQUEST_TIMEOUT,
+    SERVER_SHUTDOWN_TIMEOUT,
+)
+
+_MAX_BODY_BYTES = 1024 * 1024
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+async def _weather_route(session_id: str, user_input: str) -> str:
+    # 天气 Agent 无状态，session 只用于回显
+    return await acall_weather_agent(user_input)
+
+
+async def _finance_route(session_id: str, user_input: str) -> str:
+    return await acall_finance_agent(user_input, session_id=session_id)
+
+
+async def _chat_route(session_id: str, user_input: str) -> str:
+    return await acall_assistant(user_input, session_id=session_id)
+
+
+AGENT_ROUTES = {
+    "/v1/weather": _weather_route,
+    "/v1/finance": _finance_route,
+    "/v1/chat": _chat_route,
+}
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AgentServer:
+    """
+    asyncio HTTP 服务：并发上限由信号量控制，排队数超过上限时直接返回 503；
+    收到 SIGINT/SIGTERM 后停止接收新连接，等待进行中的请求完成再退出。
+    """
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 max_concurrency: int = SERVER_MAX_CONCURRENCY,
+                 max_queue: int = SERVER_MAX_QUEUE,
+                 request_timeout: float = SERVER_REQUEST_TIMEOUT,
+                 shutdown_timeout: float = SERVER_SHUTDOWN_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.latency = {path: LatencyHistogram() for path in AGENT_ROUTES}
+        self.requests_total = 0
+        self.rejected_total = 0
+        self.timeouts_total = 0
+        self.errors_total = 0
+        self._semaphore = None
+        self._pending = 0  # 排队中 + 执行中的请求数
+        self._in_flight = set()
+        self._connections = set()
+        self._draining = False
+        self._server = None
+        self._stopped = None
+
+    async def start(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self._server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """启动服务并阻塞到收到停止信号"""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: asyncio.ensure_future(self.shutdown()))
+            except (NotImplementedError, RuntimeError):
+                # Windows 不支持 add_signal_handler，Ctrl+C 会以 KeyboardInterrupt 结束
+                pass
+        print(f"=== SmartAssistantAgent 服务已启动：http://{self.host}:{self.port} ===")
+        await self._stopped.wait()
+
+    async def shutdown(self) -> None:
+        """优雅停机：停止接收新连接，等待进行中的请求完成（最多 shutdown_timeout 秒）"""
+        if self._draining:
+            return
+        self._draining = True
+        print("⚠️  正在停止服务，等待进行中的请求完成...")
+        self._server.close()
+        if self._in_flight:
+            await asyncio.wait(set(self._in_flight), timeout=self.shutdown_timeout)
+        for task in list(self._connections):
+            task.cancel()
+        await self._server.wait_closed()
+        print("✅ 服务已停止")
+        self._stopped.set()
+
+    def metrics(self) -> dict:
+        return {
+            "requests_total": self.requests_total,
+            "rejected_total": self.rejected_total,
+            "timeouts_total": self.timeouts_total,
+            "errors_total": self.errors_total,
+            "in_flight": len(self._in_flight),
+            "pending": self._pending,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "latency_seconds": {path: h.snapshot() for path, h in self.latency.items()},
+            "finance_sessions": get_session_stats(),
+            "llm_endpoints": get_endpoint_stats(),
+            "llm_cache": get_completion_cache_stats(),
+            "prompt_cache": get_prompt_cache_stats(),
+            "responses": get_response_stats(),
+            "router": get_router_stats(),
+            "http_pools": get_pool_stats(),
+            "weather_prefetch": get_weather_prefetch_stats(),
+            "tracing": tracing.get_trace_stats() if tracing.enabled() else None,
+        }
+
+    async def _handle_connection(self, reader, writer) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while not self._draining:
+                try:
+                    request = await self._read_request(reader)
+                except _HttpError as e:
+                    await self._write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                if path == "/metrics" and "format=prometheus" in query:
+                    status, content_type = 200, "text/plain; version=0.0.4; charset=utf-8"
+                    response_body = tracing.render_prometheus().encode("utf-8")
+                else:
+                    status, payload = await self._dispatch(method, path, body)
+                    content_type = "application/json; charset=utf-8"
+                    response_body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = keep_alive and not self._draining
+                await self._write(writer, status, response_body, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.CancelledError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """解析一个 HTTP/1.1 请求，连接关闭时返回 None"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise _HttpError(400, "请求行格式错误")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise _HttpError(400, "Content-Length 格式错误")
+        if length < 0:
+            raise _HttpError(400, "Content-Length 格式错误")
+        if length > _MAX_BODY_BYTES:
+            raise _HttpError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        return method.upper(), path, query, headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes):
+        if path == "/healthz":
+            if self._draining:
+                return 503, {"status": "draining"}
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.metrics()
+
+        route = AGENT_ROUTES.get(path)
+        if route is None:
+            return 404, {"error": f"未知接口 {path}"}
+        if method != "POST":
+            return 405, {"error": "只支持 POST"}
+
+        try:
+            data = json.loads(body or b"{}")
+            user_input = data["input"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "请求体需要是包含 input 字段的 JSON"}
+        if not isinstance(user_input, str) or not user_input.strip():
+            return 400, {"error": "input 不能为空"}
+        session_id = str(data.get("session") or uuid.uuid4().hex)
+
+        if self._draining:
+            return 503, {"error": "服务正在停止"}
+        if self._pending >= self.max_concurrency + self.max_queue:
+            self.rejected_total += 1
+            return 503, {"error": "服务繁忙，请稍后重试"}
+
+        self.requests_total += 1
+        self._pending += 1
+        start = time.perf_counter()
+        task = asyncio.ensure_future(self._run_agent(route, session_id, user_input))
+        self._in_flight.add(task)
+        try:
+            reply = await asyncio.shield(task)
+        except asyncio.TimeoutError:
+            self.timeouts_total += 1
+            return 504, {"session": session_id, "error": "处理超时"}
+        except Exception as e:
+            self.errors_total += 1
+            return 500, {"session": session_id, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self._in_flight.discard(task)
+            self._pending -= 1
+            self.latency[path].observe(time.perf_counter() - start)
+
+        return 200, {
+            "session": session_id,
+            "reply": reply,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def _run_agent(self, route, session_id: str, user_input: str) -> str:
+        # 排队等并发名额的时间也计入请求超时
+        return await asyncio.wait_for(self._guarded(route, session_id, user_input), self.request_timeout)
+
+    async def _guarded(self, route, session_id: str, user_input: str) -> str:
+        async with self._semaphore:
+            return await route(session_id, user_input)
+
+    async def _write_json(self, writer, status: int, payload: dict, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self._write(writer, status, body, "application/json; charset=utf-8", keep_alive)
+
+    async def _write(self, writer, status: int, body: bytes, content_type: str, keep_alive: bool) -> None:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def run_server(**kwargs) -> None:
+    """阻塞运行 HTTP 服务，参数见 AgentServer"""
+    server = AgentServer(**kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass